@@ -0,0 +1,172 @@
+"""Alertas de bajada de precio evaluadas al escribir.
+
+Cada usuario guarda reglas sobre un producto (y opcionalmente un supermercado):
+"precio_base <= precio_max" y/o "es oferta". precio_base es el precio por kg, L o ud
+(ver unidades.py), así el umbral vale igual para un paquete de 500 g que para uno
+de 1 kg; las filas sin normalizar caen a precio_unidad y las que no tienen precio
+positivo no se evalúan.
+
+Las reglas saltan por flanco: solo cuando el precio cruza el umbral (o pasa a oferta)
+respecto al anterior del mismo (producto, supermercado), que se lee de
+precios_ultimos. Por eso se evalúa antes de cesta.registrar; dentro de un lote cada
+fila es la anterior de la siguiente. Seguir por debajo no vuelve a avisar.
+
+Las reglas viven en memoria en un índice por producto_id, así cada precio nuevo solo
+mira las reglas de su producto. Como el índice de búsqueda, se etiqueta con la
+versión de la tabla alertas y se recarga cuando otro worker (o este) las cambia.
+
+Los handlers evalúan las filas dentro de su transacción y, tras el commit, pasan las
+notificaciones a un sink intercambiable: en memoria por defecto (tests, o para que
+otro proceso las consuma) o un fichero JSONL con ALERTAS_SINK=file:///ruta.jsonl.
+"""
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from typing import NamedTuple, Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from . import models, versiones
+
+
+class Regla(NamedTuple):
+    id: int
+    user_id: int
+    producto_id: int
+    supermercado_id: Optional[int]
+    precio_max: Optional[float]
+    oferta: bool
+
+    def motivo(self, precio: float, es_oferta: bool, anterior: Optional[tuple] = None) -> Optional[str]:
+        """anterior: (precio, es_oferta) del último precio de la clave, o None si no lo hay."""
+        if self.precio_max is not None and precio <= self.precio_max:
+            if anterior is None or anterior[0] > self.precio_max:
+                return "precio"
+        if self.oferta and es_oferta and (anterior is None or not anterior[1]):
+            return "oferta"
+        return None
+
+
+class IndiceReglas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_producto = {}
+        self.version = None
+
+    def construir(self, reglas, version):
+        por_producto = defaultdict(list)
+        for r in reglas:
+            por_producto[r.producto_id].append(r)
+        with self._lock:
+            self._por_producto = {p: tuple(rs) for p, rs in por_producto.items()}
+            self.version = version
+
+    def actualizar(self, db: Session):
+        version = versiones.leida(db, "alertas")
+        if version != self.version:
+            filas = db.query(*(getattr(models.AlertaRegla, c) for c in Regla._fields)).all()
+            self.construir((Regla(*f) for f in filas), version)
+
+    def reglas(self, producto_id: int) -> tuple:
+        return self._por_producto.get(producto_id, ())
+
+    def __len__(self):
+        return sum(len(rs) for rs in self._por_producto.values())
+
+
+indice_reglas = IndiceReglas()
+
+
+def _anteriores(db: Session, claves) -> dict:
+    """(producto, supermercado) -> (precio_base, es_oferta) vigente en precios_ultimos."""
+    if not claves:
+        return {}
+    u = models.PrecioUltimo
+    filas = (db.query(u.producto_id, u.supermercado_id, u.precio_base, u.es_oferta)
+             .filter(tuple_(u.producto_id, u.supermercado_id).in_(claves)).all())
+    return {(f.producto_id, f.supermercado_id): (f.precio_base, bool(f.es_oferta)) for f in filas}
+
+
+def evaluar(db: Session, filas) -> list:
+    """Notificaciones que disparan las filas (dicts o models.Precio) a escribir.
+
+    Se llama antes de actualizar precios_ultimos, que guarda el precio anterior de cada clave.
+    """
+    indice_reglas.actualizar(db)
+    filas = [
+        {c: getattr(f, c) for c in ("id", "producto_id", "supermercado_id", "precio_unidad",
+                                    "unidad_base", "precio_base", "es_oferta", "fecha")}
+        if isinstance(f, models.Precio) else f
+        for f in filas
+    ]
+    # Solo se lee el precio anterior de las claves con reglas: sin alertas no hay consulta
+    anteriores = _anteriores(db, list({(f["producto_id"], f["supermercado_id"]) for f in filas
+                                       if indice_reglas.reglas(f["producto_id"])}))
+    notificaciones = []
+    for f in filas:
+        precio = f["precio_base"] if f.get("precio_base") is not None else f["precio_unidad"]
+        if not precio or precio <= 0:
+            continue
+        clave = (f["producto_id"], f["supermercado_id"])
+        anterior = anteriores.get(clave)
+        anteriores[clave] = (precio, bool(f.get("es_oferta")))
+        for regla in indice_reglas.reglas(f["producto_id"]):
+            if regla.supermercado_id is not None and regla.supermercado_id != f["supermercado_id"]:
+                continue
+            motivo = regla.motivo(precio, f.get("es_oferta"), anterior)
+            if motivo:
+                notificaciones.append({
+                    "regla_id": regla.id, "user_id": regla.user_id, "motivo": motivo,
+                    "precio_id": f.get("id"), "producto_id": f["producto_id"],
+                    "supermercado_id": f["supermercado_id"], "precio_unidad": f["precio_unidad"],
+                    "unidad_base": f.get("unidad_base"), "precio_base": f.get("precio_base"),
+                    "es_oferta": bool(f.get("es_oferta")), "fecha": f["fecha"].isoformat(),
+                })
+    return notificaciones
+
+
+# --- Sinks ---
+class MemorySink:
+    """Cola acotada en memoria; consumir() saca las pendientes."""
+
+    def __init__(self, maxlen: int = 10000):
+        self._cola = deque(maxlen=maxlen)
+
+    def enviar(self, notificaciones: list):
+        self._cola.extend(notificaciones)
+
+    def consumir(self) -> list:
+        items = []
+        while self._cola:
+            items.append(self._cola.popleft())
+        return items
+
+
+class FileSink:
+    """Añade cada notificación como una línea JSON; lo recoge un proceso aparte."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def enviar(self, notificaciones: list):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(n, ensure_ascii=False) + "\n" for n in notificaciones)
+
+
+def from_env():
+    url = os.getenv("ALERTAS_SINK", "memory")
+    if url.startswith("file:///"):
+        return FileSink(url[len("file://"):])
+    return MemorySink()
+
+
+sink = from_env()
+
+
+def notificar(notificaciones: list):
+    # Se llama tras el commit: no se avisa de precios que no llegaron a guardarse
+    if notificaciones:
+        sink.enviar(notificaciones)
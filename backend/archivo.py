@@ -0,0 +1,136 @@
+"""Archivo de precios históricos y enrutado de consultas entre tabla caliente y archivo.
+
+precios guarda solo los últimos PRECIOS_HOT_DIAS días; el job
+
+    python -m backend.archivo [--dias 90] [--compactar-dias 730]
+
+mueve por lotes las filas más antiguas a precios_archivo (particionada por mes en
+Postgres, creando las particiones que falten) y, con --compactar-dias, borra del
+archivo las filas en bruto más antiguas: su historia sigue en precios_diarios, que
+se mantiene al insertar y no depende de dónde viva la fila.
+
+Como los id crecen con la fecha, todo lo archivado tiene id menor que lo caliente:
+los listados por cursor leen primero precios y solo bajan al archivo si la página
+no se llena y el rango de fechas lo alcanza.
+"""
+import argparse
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models, versiones
+
+PRECIOS_HOT_DIAS = int(os.getenv("PRECIOS_HOT_DIAS", "90"))
+ARCHIVO_LOTE = 10000
+
+COLUMNAS = [
+    "id", "producto_id", "marca_id", "supermercado_id", "cantidad", "unidad",
+    "precio_total", "precio_unidad", "tamano_pack", "unidad_base", "precio_base", "es_oferta", "tipo_oferta", "fecha",
+]
+
+# Fecha máxima archivada por versión de "precios_archivo": cambia solo cuando corre el job
+_fecha_maxima = {}
+
+
+def fecha_maxima(db: Session) -> Optional[datetime]:
+    version = versiones.leida(db, "precios_archivo")
+    if version == 0:
+        return None
+    if version not in _fecha_maxima:
+        _fecha_maxima.clear()
+        _fecha_maxima[version] = db.query(func.max(models.PrecioArchivo.fecha)).scalar()
+    return _fecha_maxima[version]
+
+
+def modelos(db: Session, desde: Optional[datetime] = None) -> list:
+    """Tablas a consultar, de la más reciente a la más antigua."""
+    maxima = fecha_maxima(db)
+    if maxima is None or (desde is not None and desde > maxima):
+        return [models.Precio]
+    return [models.Precio, models.PrecioArchivo]
+
+
+# --- Job de retención ---
+def _meses(desde: date, hasta: date):
+    mes = desde.replace(day=1)
+    while mes <= hasta:
+        siguiente = (mes + timedelta(days=32)).replace(day=1)
+        yield mes, siguiente
+        mes = siguiente
+
+
+def crear_particiones(db: Session, desde: date, hasta: date):
+    # Una partición por mes: las consultas con rango de fechas solo abren las que cortan
+    for mes, siguiente in _meses(desde, hasta):
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS precios_archivo_{mes:%Y_%m} PARTITION OF precios_archivo "
+            f"FOR VALUES FROM ('{mes}') TO ('{siguiente}')"
+        ))
+
+
+def archivar(engine: Engine, dias: int = PRECIOS_HOT_DIAS, lote: int = ARCHIVO_LOTE, ahora: datetime = None) -> int:
+    """Mueve a precios_archivo las filas anteriores a hoy - dias. Devuelve cuántas."""
+    corte = datetime.combine((ahora or datetime.now()).date() - timedelta(days=dias), time())
+    p = models.Precio
+    movidas = 0
+    with Session(engine) as db:
+        if engine.dialect.name == "postgresql":
+            primera = db.scalar(select(func.min(p.fecha)).where(p.fecha < corte))
+            if primera is not None:
+                crear_particiones(db, primera.date(), corte.date())
+                db.commit()
+        while True:
+            ids = db.scalars(select(p.id).where(p.fecha < corte).order_by(p.id).limit(lote)).all()
+            if not ids:
+                break
+            # Cada lote es atómico: la fila está en precios o en el archivo, nunca en ambos, y
+            # la nueva versión de precios_archivo hace que la API empiece a mirar el archivo
+            db.execute(insert(models.PrecioArchivo).from_select(
+                COLUMNAS, select(*(getattr(p, c) for c in COLUMNAS)).where(p.id.in_(ids))
+            ))
+            db.execute(delete(p).where(p.id.in_(ids)))
+            versiones.bump(db, "precios_archivo")
+            db.commit()
+            movidas += len(ids)
+    return movidas
+
+
+def compactar(engine: Engine, dias: int, ahora: datetime = None) -> int:
+    """Borra del archivo las filas en bruto anteriores a hoy - dias; quedan en precios_diarios."""
+    corte = datetime.combine((ahora or datetime.now()).date() - timedelta(days=dias), time())
+    archivo = models.PrecioArchivo
+    with Session(engine) as db:
+        borradas = db.scalar(select(func.count()).select_from(archivo).where(archivo.fecha < corte))
+        if not borradas:
+            return 0
+        if engine.dialect.name == "postgresql":
+            # Los meses enteros por debajo del corte se sueltan sin borrar fila a fila
+            for nombre in db.scalars(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'precios_archivo'"
+            )):
+                mes = datetime.strptime(nombre.removeprefix("precios_archivo_"), "%Y_%m")
+                if (mes + timedelta(days=32)).replace(day=1) <= corte:
+                    db.execute(text(f"DROP TABLE {nombre}"))
+        db.execute(delete(archivo).where(archivo.fecha < corte))
+        versiones.bump(db, "precios_archivo")
+        db.commit()
+    return borradas
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dias", type=int, default=PRECIOS_HOT_DIAS, help="Días que se quedan en precios")
+    parser.add_argument("--compactar-dias", type=int,
+                        help="Borra del archivo las filas en bruto más antiguas que esto")
+    args = parser.parse_args()
+
+    print(f"precios_archivo: {archivar(engine, args.dias)} filas archivadas")
+    if args.compactar_dias:
+        print(f"precios_archivo: {compactar(engine, args.compactar_dias)} filas compactadas")
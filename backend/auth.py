@@ -0,0 +1,132 @@
+"""Autenticación por JWT sin consultar la base de datos en cada petición.
+
+El token lleva en sus claims lo que la API necesita del usuario (email, id, rol,
+nombre, foto). Se verifica una vez y los claims se guardan en una LRU acotada
+indexada por el token, que respeta su `exp`: las siguientes peticiones con el
+mismo token no vuelven a verificar la firma ni tocan la tabla users.
+
+Las rutas de escritura del catálogo y de precios usan `requiere_escritura`; solo
+exigen token con AUTH_WRITES=1 (la demo sin login del frontend escribe sin él).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+SECRET_KEY = os.getenv("SESSION_SECRET", "super_secret_dev_key")
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 1 week
+
+AUTH_WRITES = os.getenv("AUTH_WRITES", "0") == "1"
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+# Tokens sin exp: como mucho este tiempo en caché antes de volver a verificarlos
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "300"))
+
+
+def create_access_token(data: dict):
+    import jwt
+
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def decode_token(token: str) -> Optional[dict]:
+    import jwt
+
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+
+
+class ClaimsCache:
+    """LRU token -> claims ya verificados, con caducidad por entrada."""
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            item = self._data.get(token)
+            if item is None:
+                return None
+            claims, expires = item
+            if expires <= time.time():
+                del self._data[token]
+                return None
+            self._data.move_to_end(token)
+            return claims
+
+    def set(self, token: str, claims: dict):
+        # Nunca más allá del exp del token: caducado en la caché es caducado para la API
+        expires = time.time() + self.ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires = min(expires, claims["exp"])
+        with self._lock:
+            self._data[token] = (claims, expires)
+            self._data.move_to_end(token)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+claims_cache = ClaimsCache()
+
+
+def claims(token: str) -> Optional[dict]:
+    """Claims del token verificado, o None si no es válido. Solo decodifica en el primer uso."""
+    cached = claims_cache.get(token)
+    if cached is not None:
+        return cached
+    payload = decode_token(token)
+    if payload is not None:
+        claims_cache.set(token, payload)
+    return payload
+
+
+def _token(request: Request) -> Optional[str]:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    return auth_header.split(" ", 1)[1]
+
+
+# --- Dependencias ---
+def requiere_usuario(request: Request) -> dict:
+    token = _token(request)
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    payload = claims(token)
+    if payload is None or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+
+def requiere_admin(request: Request) -> dict:
+    payload = requiere_usuario(request)
+    if payload.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return payload
+
+
+def requiere_escritura(request: Request) -> Optional[dict]:
+    # Con AUTH_WRITES=1 toda escritura necesita token válido; si no, es opcional
+    if AUTH_WRITES or _token(request) is not None:
+        return requiere_usuario(request)
+    return None
@@ -0,0 +1,141 @@
+"""Caché de respuestas del catálogo.
+
+Guarda el JSON ya serializado de los GET /catalog/* y se invalida desde los
+handlers de escritura del catálogo. Por defecto vive en memoria del proceso;
+con CATALOG_CACHE_BACKEND=sqlite:///ruta.db se comparte entre workers.
+
+Las claves llevan el ETag, así que cada escritura hecha en otro worker deja atrás
+entradas que nadie volverá a pedir: cada set barre las caducadas y la memoria se
+limita a CATALOG_CACHE_SIZE entradas (se descartan las menos usadas).
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.time():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float):
+        ahora = time.time()
+        with self._lock:
+            for k in [k for k, (_, expires) in self._data.items() if expires < ahora]:
+                del self._data[k]
+            self._data[key] = (value, ahora + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [k for k in self._data if k == prefix or k.startswith(prefix + ":")]:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBackend:
+    """Almacén compartido entre procesos sobre un fichero SQLite local."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS catalog_cache (key TEXT PRIMARY KEY, value BLOB, expires REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, expires FROM catalog_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM catalog_cache WHERE expires < ?", (time.time(),))
+            conn.execute(
+                "INSERT OR REPLACE INTO catalog_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+
+    def delete_prefix(self, prefix: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM catalog_cache WHERE key = ? OR key LIKE ?", (prefix, prefix + ":%"))
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM catalog_cache")
+
+
+class CatalogCache:
+    def __init__(self, backend=None, ttl: float = 300):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_set(self, key: str, loader: Callable[[], bytes]) -> bytes:
+        if self.ttl <= 0:
+            return loader()
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, *namespaces: str):
+        # Borra cada espacio de nombres y todas sus variantes ("productos", "productos:...")
+        for ns in namespaces:
+            self.backend.delete_prefix(ns)
+
+    def clear(self):
+        self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def from_env() -> CatalogCache:
+    url = os.getenv("CATALOG_CACHE_BACKEND", "memory")
+    ttl = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+    if url.startswith("sqlite:///"):
+        return CatalogCache(SQLiteBackend(url[len("sqlite:///"):]), ttl)
+    return CatalogCache(MemoryBackend(int(os.getenv("CATALOG_CACHE_SIZE", "1024"))), ttl)
+
+
+catalog_cache = from_env()
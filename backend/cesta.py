@@ -0,0 +1,219 @@
+"""Optimizador de la cesta de la compra sobre el último precio de cada producto.
+
+precios_ultimos guarda, por (producto, supermercado), el registro más reciente de
+precios o, si ya se archivó, de precios_archivo, entre los que tienen precio_base
+positivo: un 0 (filas antiguas sin cantidad) ganaría todas las cestas. Se mantiene
+como precios_diarios: las altas hacen un UPSERT y las modificaciones y borrados
+recalculan solo sus claves. Así optimizar una cesta es
+una única consulta por clave primaria (producto_id IN ...), sin recorrer el
+histórico.
+
+El coste de cada línea es cantidad x precio_base, con la cantidad en la unidad
+base del producto (kg, L o ud; ver unidades.py). Se calculan dos opciones:
+
+- el supermercado único más barato (entre los que tienen más productos de la cesta);
+- el reparto entre como mucho N supermercados, comprando cada producto donde sea más
+  barato dentro del grupo elegido. Se prueban todos los grupos si son pocos
+  (REPARTO_EXHAUSTIVO); si no, selección voraz seguida de intercambios.
+"""
+import math
+
+from sqlalchemy import delete, func, insert, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from . import archivo, models
+
+COLUMNAS = ["producto_id", "supermercado_id", "marca_id", "cantidad", "unidad", "precio_total",
+            "unidad_base", "precio_base", "es_oferta", "fecha"]
+# Grupos de supermercados evaluados como máximo con búsqueda exhaustiva
+REPARTO_EXHAUSTIVO = 5000
+# Coste de un producto que no se vende en el supermercado. Mucho mayor que cualquier
+# cesta real: un solo número ordena primero por productos cubiertos y luego por precio
+FALTA = 1e9
+
+
+# --- Mantenimiento de precios_ultimos ---
+def registrar(db: Session, filas):
+    """Altas de precio (dicts o models.Precio) en la transacción actual: la última de cada clave gana."""
+    ultimas = {}
+    for f in filas:
+        if isinstance(f, models.Precio):
+            f = {c: getattr(f, c) for c in COLUMNAS}
+        if not f.get("precio_base") or f["precio_base"] <= 0:
+            continue
+        ultimas[(f["producto_id"], f["supermercado_id"])] = {c: f.get(c) for c in COLUMNAS}
+    if not ultimas:
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    tabla = models.PrecioUltimo.__table__
+    stmt = upsert(tabla)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["producto_id", "supermercado_id"],
+        set_={c: stmt.excluded[c] for c in COLUMNAS[2:]},
+        # Un registro con fecha anterior no pisa al vigente
+        where=tabla.c.fecha <= stmt.excluded.fecha,
+    )
+    db.execute(stmt, list(ultimas.values()))
+
+
+def _mas_recientes(db: Session, claves=None):
+    # El último precio de una clave puede estar ya archivado (p. ej. al borrar el más reciente)
+    fuentes = []
+    for m in archivo.modelos(db):
+        fuente = select(*(getattr(m, c) for c in COLUMNAS), m.id).where(m.fecha.isnot(None), m.precio_base > 0)
+        if claves is not None:
+            fuente = fuente.where(tuple_(m.producto_id, m.supermercado_id).in_(claves))
+        fuentes.append(fuente)
+    base = (fuentes[0] if len(fuentes) == 1 else union_all(*fuentes)).subquery()
+    numerados = select(
+        *(base.c[c] for c in COLUMNAS),
+        func.row_number().over(
+            partition_by=(base.c.producto_id, base.c.supermercado_id), order_by=(base.c.fecha.desc(), base.c.id.desc())
+        ).label("rn"),
+    ).subquery()
+    return select(*(numerados.c[c] for c in COLUMNAS)).where(numerados.c.rn == 1)
+
+
+def recalcular(db: Session, claves):
+    """Recalcula desde precios (y el archivo) las claves (producto, supermercado) indicadas."""
+    claves = list(set(claves))
+    if not claves:
+        return
+    tabla = models.PrecioUltimo.__table__
+    db.execute(delete(tabla).where(tuple_(tabla.c.producto_id, tabla.c.supermercado_id).in_(claves)))
+    db.execute(insert(tabla).from_select(COLUMNAS, _mas_recientes(db, claves)))
+
+
+def reconstruir(db: Session) -> int:
+    """Regenera precios_ultimos desde precios y el archivo. Devuelve las filas resultantes."""
+    tabla = models.PrecioUltimo.__table__
+    db.execute(delete(tabla))
+    db.execute(insert(tabla).from_select(COLUMNAS, _mas_recientes(db)))
+    db.commit()
+    return db.scalar(select(func.count()).select_from(tabla))
+
+
+# --- Optimización ---
+# costes[supermercado] = {posición del producto en la cesta: cantidad x precio_base}, solo
+# con lo que vende: un supermercado suele tener una parte pequeña de la cesta y puntuar
+# un grupo cuesta lo que suman sus precios, no el tamaño de la cesta por supermercado
+def _minimos(grupo, costes, n_items: int) -> list:
+    minimos = [FALTA] * n_items
+    for s in grupo:
+        for i, c in costes[s].items():
+            if c < minimos[i]:
+                minimos[i] = c
+    return minimos
+
+
+def _ahorro(s, costes, minimos) -> float:
+    """Cuánto baja el total al añadir s a un grupo con esos mínimos (<= 0)."""
+    return sum(c - minimos[i] for i, c in costes[s].items() if c < minimos[i])
+
+
+def _exhaustivo(supermercados, costes, n_items: int, n: int):
+    # Recorre en profundidad todos los grupos de hasta n: cada prefijo guarda sus mínimos
+    # y extenderlo solo mira los precios del supermercado añadido
+    mejor = [math.inf, None]
+
+    def explorar(desde, grupo, minimos, total):
+        for j in range(desde, len(supermercados)):
+            s = supermercados[j]
+            nuevo = total + _ahorro(s, costes, minimos)
+            if nuevo < mejor[0]:
+                mejor[:] = [nuevo, (*grupo, s)]
+            if len(grupo) + 1 < n:
+                siguientes = minimos[:]
+                for i, c in costes[s].items():
+                    if c < siguientes[i]:
+                        siguientes[i] = c
+                explorar(j + 1, (*grupo, s), siguientes, nuevo)
+
+    explorar(0, (), [FALTA] * n_items, FALTA * n_items)
+    return mejor[1]
+
+
+def _voraz(supermercados, costes, n_items: int, n: int):
+    # Añade el supermercado que más ahorra y luego intercambia mientras mejore
+    grupo, minimos = [], [FALTA] * n_items
+    for _ in range(n):
+        s = min((s for s in supermercados if s not in grupo), key=lambda s: _ahorro(s, costes, minimos))
+        grupo.append(s)
+        minimos = _minimos(grupo, costes, n_items)
+    mejor = sum(minimos)
+    mejorado = True
+    while mejorado:
+        mejorado = False
+        for k in range(len(grupo)):
+            resto = grupo[:k] + grupo[k + 1:]
+            minimos_resto = _minimos(resto, costes, n_items)
+            base = sum(minimos_resto)
+            s = min((s for s in supermercados if s not in grupo), key=lambda s: _ahorro(s, costes, minimos_resto))
+            total = base + _ahorro(s, costes, minimos_resto)
+            if total < mejor:
+                grupo, mejor, mejorado = resto[:k] + [s] + resto[k:], total, True
+    return tuple(grupo)
+
+
+def _mejor_grupo(supermercados, costes, n_items: int, n: int):
+    grupos = sum(math.comb(len(supermercados), k) for k in range(1, n + 1))
+    if grupos <= REPARTO_EXHAUSTIVO:
+        return _exhaustivo(supermercados, costes, n_items, n), True
+    return _voraz(supermercados, costes, n_items, n), False
+
+
+def _opcion(supermercados, costes, productos, cantidades, precios):
+    """Compra cada producto en el más barato de `supermercados`."""
+    lineas, faltan, total = [], [], 0.0
+    for i, producto_id in enumerate(productos):
+        coste, s = min((costes[s].get(i, FALTA), s) for s in supermercados)
+        if coste >= FALTA:
+            faltan.append(producto_id)
+            continue
+        ultimo = precios[(producto_id, s)]
+        lineas.append({
+            "producto_id": producto_id, "supermercado_id": s, "cantidad": cantidades[i],
+            "unidad_base": ultimo.unidad_base, "precio_base": ultimo.precio_base, "subtotal": round(coste, 2),
+        })
+        total += coste
+    usados = sorted({l["supermercado_id"] for l in lineas}) or sorted(supermercados)
+    return {"supermercado_ids": usados, "total": round(total, 2), "lineas": lineas, "faltan": faltan}
+
+
+def optimizar(db: Session, items, max_supermercados: int = 2) -> dict:
+    """items: [(producto_id, cantidad)]. Devuelve la mejor opción en un supermercado y repartida."""
+    cantidades_por_producto = {}
+    for producto_id, cantidad in items:
+        cantidades_por_producto[producto_id] = cantidades_por_producto.get(producto_id, 0) + cantidad
+    productos = list(cantidades_por_producto)
+    cantidades = [cantidades_por_producto[p] for p in productos]
+
+    u = models.PrecioUltimo
+    filas = (db.query(u.producto_id, u.supermercado_id, u.unidad_base, u.precio_base)
+             .filter(u.producto_id.in_(productos), u.precio_base > 0).all())
+    precios = {(f.producto_id, f.supermercado_id): f for f in filas}
+    supermercados = sorted({f.supermercado_id for f in filas})
+    if not supermercados:
+        return {"un_supermercado": None, "reparto": None, "exacto": True, "faltan": productos}
+
+    posicion = {p: i for i, p in enumerate(productos)}
+    costes = {s: {} for s in supermercados}
+    for (producto_id, s), f in precios.items():
+        i = posicion[producto_id]
+        costes[s][i] = cantidades[i] * f.precio_base
+
+    n_items = len(productos)
+    unico = _exhaustivo(supermercados, costes, n_items, 1)
+    grupo, exacto = _mejor_grupo(supermercados, costes, n_items, min(max_supermercados, len(supermercados)))
+    con_precio = {p for p, _ in precios}
+    return {
+        "un_supermercado": _opcion(unico, costes, productos, cantidades, precios),
+        "reparto": _opcion(grupo, costes, productos, cantidades, precios),
+        "exacto": exacto,
+        # Productos sin ningún precio conocido
+        "faltan": [p for p in productos if p not in con_precio],
+    }
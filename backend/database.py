@@ -19,12 +19,71 @@ else:
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
+def _env_bool(nombre: str, defecto: str) -> bool:
+    return os.getenv(nombre, defecto).lower() in ("1", "true", "yes")
+
+# Pool de conexiones configurable. Conexiones máximas por worker = DB_POOL_SIZE + DB_MAX_OVERFLOW
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "1")
+
 engine_args = {}
 # SQLite necesita este argumento específico para hilos, Postgres no
 if DATABASE_URL.startswith("sqlite"):
     engine_args["connect_args"] = {"check_same_thread": False}
+else:
+    engine_args.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
 
 engine = create_engine(DATABASE_URL, **engine_args)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# Modo asíncrono opcional (DB_ASYNC=1): asyncpg para Postgres, aiosqlite para SQLite.
+# El engine síncrono se mantiene para tareas de arranque y la exportación en streaming
+DB_ASYNC = _env_bool("DB_ASYNC", "0")
+
+def async_url(url: str) -> str:
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine_args = {k: v for k, v in engine_args.items() if k != "connect_args"}
+    async_engine = create_async_engine(async_url(DATABASE_URL), **async_engine_args)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
+# Registro de consultas lentas (opt-in): umbral en ms y fichero JSONL opcional
+DB_SLOW_QUERY_MS = os.getenv("DB_SLOW_QUERY_MS")
+if DB_SLOW_QUERY_MS:
+    from .slowlog import slow_queries
+
+    slow_queries.umbral_ms = float(DB_SLOW_QUERY_MS)
+    slow_queries.fichero = os.getenv("DB_SLOW_QUERY_FILE")
+    slow_queries.activar(engine)
+    if async_engine is not None:
+        slow_queries.activar(async_engine.sync_engine)
+
+def reiniciar_pools():
+    """Descarta las conexiones heredadas del proceso padre tras un fork.
+
+    close=False evita cerrar sockets que el padre sigue usando; cada worker abre
+    las suyas bajo demanda. Se llama desde el hook post_fork de gunicorn.
+    """
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
@@ -0,0 +1,131 @@
+"""Canal push de cambios en precios (SSE y WebSocket).
+
+Los handlers de escritura publican un evento compacto tras el commit y el hub lo
+reparte a los suscriptores del proceso. Cada suscriptor es una cola acotada en el
+event loop que atiende su conexión; publicar no bloquea y se puede llamar desde el
+threadpool: se programa un único reparto por loop con call_soon_threadsafe.
+
+Los filtros por producto y supermercado se indexan, así un evento solo recorre a
+quien puede interesarle y miles de suscriptores ociosos no cuestan nada. El hub es
+por worker: con varios workers cada cliente recibe lo que escribe el suyo.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+FEED_COLA = 256
+FEED_HEARTBEAT = 15.0
+
+# Evento que recibe el cliente cuando se ha quedado atrás: debe volver a pedir GET /precios
+RESYNC = {"op": "resync"}
+
+
+class Suscriptor:
+    __slots__ = ("cola", "loop", "productos", "supermercados")
+
+    def __init__(self, loop, productos: Iterable[int] = (), supermercados: Iterable[int] = (), maxsize: int = FEED_COLA):
+        self.cola = asyncio.Queue(maxsize=maxsize)
+        self.loop = loop
+        self.productos = frozenset(productos)
+        self.supermercados = frozenset(supermercados)
+
+    def acepta(self, evento: dict) -> bool:
+        return ((not self.productos or evento.get("producto_id") in self.productos)
+                and (not self.supermercados or evento.get("supermercado_id") in self.supermercados))
+
+    async def siguiente(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Próximo evento, o None si pasa `timeout` sin ninguno."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Cada suscriptor cuelga de un solo índice: productos si filtra por ellos, si no
+        # supermercados, si no de la lista de "todos"
+        self._todos = {}
+        self._por_producto = defaultdict(dict)
+        self._por_supermercado = defaultdict(dict)
+
+    def _indices(self, s: Suscriptor):
+        if s.productos:
+            return [self._por_producto[p] for p in s.productos]
+        if s.supermercados:
+            return [self._por_supermercado[m] for m in s.supermercados]
+        return [self._todos]
+
+    def suscribir(self, productos: Iterable[int] = (), supermercados: Iterable[int] = ()) -> Suscriptor:
+        s = Suscriptor(asyncio.get_running_loop(), productos, supermercados)
+        with self._lock:
+            for indice in self._indices(s):
+                indice[s] = None
+        return s
+
+    def cancelar(self, s: Suscriptor):
+        with self._lock:
+            for indice in self._indices(s):
+                indice.pop(s, None)
+            for clave in [p for p in s.productos if not self._por_producto[p]]:
+                del self._por_producto[clave]
+            for clave in [m for m in s.supermercados if not self._por_supermercado[m]]:
+                del self._por_supermercado[clave]
+
+    def __len__(self):
+        with self._lock:
+            return len({s for indice in (self._todos, *self._por_producto.values(), *self._por_supermercado.values())
+                        for s in indice})
+
+    def publicar(self, evento: dict):
+        with self._lock:
+            candidatos = [*self._todos, *self._por_producto.get(evento.get("producto_id"), ()),
+                          *self._por_supermercado.get(evento.get("supermercado_id"), ())]
+        por_loop = defaultdict(list)
+        for s in candidatos:
+            if s.acepta(evento):
+                por_loop[s.loop].append(s)
+        for loop, suscriptores in por_loop.items():
+            try:
+                loop.call_soon_threadsafe(_repartir, suscriptores, evento)
+            except RuntimeError:
+                # Loop ya cerrado: sus conexiones se darán de baja al terminar
+                pass
+
+
+def _repartir(suscriptores, evento: dict):
+    for s in suscriptores:
+        try:
+            s.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se vacía su cola y se le pide que resincronice
+            while not s.cola.empty():
+                s.cola.get_nowait()
+            s.cola.put_nowait(RESYNC)
+
+
+hub = Hub()
+
+
+# --- Eventos ---
+CAMPOS = ("id", "producto_id", "marca_id", "supermercado_id", "cantidad", "unidad", "tamano_pack",
+          "precio_total", "precio_unidad", "unidad_base", "precio_base", "es_oferta", "tipo_oferta")
+
+
+def evento(op: str, precio) -> dict:
+    """Delta compacto: "c" creado, "u" actualizado (fila completa), "d" borrado (solo claves)."""
+    if op == "d":
+        return {"op": op, "id": precio.id, "producto_id": precio.producto_id,
+                "supermercado_id": precio.supermercado_id}
+    datos = {c: getattr(precio, c) for c in CAMPOS}
+    return {"op": op, **datos, "fecha": precio.fecha.isoformat() if precio.fecha else None}
+
+
+def sse(evento: dict) -> str:
+    return f"data: {json.dumps(evento, separators=(',', ':'))}\n\n"
@@ -0,0 +1,38 @@
+"""Logging estructurado de la app (logger "backend").
+
+Cada registro sale como una línea JSON con nivel, logger, mensaje y los campos
+pasados en extra=. El nivel se toma de LOG_LEVEL (INFO por defecto): los
+logger.debug del camino caliente no formatean nada salvo con LOG_LEVEL=DEBUG.
+"""
+import json
+import logging
+import os
+import sys
+
+# Atributos estándar de LogRecord: todo lo demás viene de extra=
+_ESTANDAR = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        datos.update({k: v for k, v in vars(record).items() if k not in _ESTANDAR})
+        if record.exc_info:
+            datos["exc"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar(nivel: str = None):
+    logger = logging.getLogger("backend")
+    logger.setLevel((nivel or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if not any(getattr(h, "_backend_json", False) for h in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        handler._backend_json = True
+        logger.addHandler(handler)
+        logger.propagate = False
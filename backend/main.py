@@ -1,28 +1,39 @@
-from typing import List
-from fastapi import FastAPI, Depends, HTTPException, Response, Request
-from fastapi.responses import RedirectResponse
+from typing import List, Literal, Optional, Union
+from fastapi import FastAPI, Depends, HTTPException, Response, Request, Query, WebSocket
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import jwt
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import case, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime
 
+import asyncio
 import os
+import io
+import functools
+import csv
 import json
+import logging
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
-# OAuth Imports
 from starlette.middleware.sessions import SessionMiddleware
-from authlib.integrations.starlette_client import OAuth
 
-from . import models, schemas
-from .database import engine, SessionLocal
+from . import models, schemas, rollup, versiones, metrics, logs, archivo, feed, alertas, unidades, cesta
+from .slowlog import slow_queries
+from .cache import catalog_cache
+from .search import indice_productos
+from .database import SessionLocal, DB_ASYNC, AsyncSessionLocal
 
-# Re-crear tablas (Nota: SQLAlchemy no migra automáticamente cambios en tablas existentes)
-models.Base.metadata.create_all(bind=engine)
+# El esquema y las semillas se crean fuera del arranque: python -m backend.migrate
+
+logs.configurar()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="PriceTracker Pro API")
 
@@ -35,46 +46,61 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # --- OAuth Config ---
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=os.getenv('GOOGLE_CLIENT_ID'),
-    client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'}
-)
+# authlib es pesado de importar y solo lo usan las rutas de login: se configura en
+# la primera petición para no penalizar el arranque en frío
+@functools.cache
+def get_oauth():
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth()
+    oauth.register(
+        name='google',
+        client_id=os.getenv('GOOGLE_CLIENT_ID'),
+        client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
+        server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+        client_kwargs={'scope': 'openid email profile'}
+    )
+    return oauth
 
 # --- JWT Configuration ---
-SECRET_KEY = os.getenv("SESSION_SECRET", "super_secret_dev_key")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 1 week
-
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def get_current_user_email(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-        return email
-    except jwt.PyJWTError:
-        return None
+# Verificación y caché de claims en backend/auth.py. SECRET_KEY y ALGORITHM no se usan
+# aquí: se reexportan porque se importaban de backend.main antes de existir auth.py
+from .auth import (
+    SECRET_KEY, ALGORITHM, create_access_token,
+    requiere_usuario, requiere_admin, requiere_escritura,
+)
 
 
 # --- Dependency ---
-def get_db():
-    db = SessionLocal()
-    try: yield db
-    finally: db.close()
+if DB_ASYNC:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try: yield db
+        finally: db.close()
+
+async def ejecutar(db, fn, *args, **kwargs):
+    # Ejecuta código síncrono de SQLAlchemy sin bloquear el event loop: con AsyncSession
+    # mediante run_sync (la E/S va por el driver asíncrono), si no en el threadpool
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+def con_sesion(handler):
+    # Convierte un handler síncrono que recibe `db` en uno asíncrono que funciona con
+    # ambos modos de base de datos. FastAPI sigue viendo la firma original (__wrapped__)
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        db = kwargs.pop("db")
+        return await ejecutar(db, lambda session: handler(*args, db=session, **kwargs))
+    return wrapper
 
 # --- Auth Routes ---
 @app.get('/login/google')
@@ -84,43 +110,48 @@ async def login_google(request: Request):
     if base_url.endswith('/'): base_url = base_url[:-1]
     redirect_uri = f"{base_url}/auth/google/callback"
     
-    print(f"DEBUG: Initiating Google Login with redirect_uri={redirect_uri}")
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    logger.debug("Iniciando login con Google", extra={"redirect_uri": redirect_uri})
+    return await get_oauth().google.authorize_redirect(request, redirect_uri)
+
+def _registrar_usuario(db: Session, email: str, name: str, picture: str) -> dict:
+    # Check if user exists
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if not user:
+        # Create new user
+        user = models.User(email=email, name=name, picture=picture, role="user")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        logger.info("Usuario creado", extra={"user_id": user.id})
+    else:
+        # Update info if needed
+        if user.name != name or user.picture != picture:
+            user.name = name
+            user.picture = picture
+            db.commit()
+    # Todo lo que devuelve /users/me va en el token: así no necesita consultar users
+    return {"sub": user.email, "role": user.role, "id": user.id, "name": user.name, "picture": user.picture}
 
 @app.get('/auth/google/callback')
 async def auth_google(request: Request, db: Session = Depends(get_db)):
     try:
-        token = await oauth.google.authorize_access_token(request)
+        token = await get_oauth().google.authorize_access_token(request)
         user_info = token.get('userinfo')
         if not user_info:
              # Fallback if userinfo not in token
-             print("DEBUG: Fetching userinfo manually")
-             user_info = await oauth.google.userinfo(token=token)
+             logger.debug("userinfo no incluido en el token, se pide aparte")
+             user_info = await get_oauth().google.userinfo(token=token)
         
         email = user_info.get('email')
         name = user_info.get('name')
         picture = user_info.get('picture')
 
-        print(f"DEBUG: Authenticated user: {email}")
+        logger.debug("Usuario autenticado", extra={"email": email})
         
-        # Check if user exists
-        user = db.query(models.User).filter(models.User.email == email).first()
-        if not user:
-            # Create new user
-            user = models.User(email=email, name=name, picture=picture, role="user")
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-            print("DEBUG: Created new user in DB")
-        else:
-            # Update info if needed
-            if user.name != name or user.picture != picture:
-                user.name = name
-                user.picture = picture
-                db.commit()
+        user_data = await ejecutar(db, _registrar_usuario, email, name, picture)
         
         # Create JWT Token
-        access_token = create_access_token(data={"sub": user.email, "role": user.role, "id": user.id})
+        access_token = create_access_token(data=user_data)
         
         # Redirect to Frontend Home with Token
         base_url = os.getenv('API_URL') or os.getenv('BACKEND_URL') or 'http://127.0.0.1:8000'
@@ -133,20 +164,18 @@ async def auth_google(request: Request, db: Session = Depends(get_db)):
         return RedirectResponse(url=f'/home.html?token={access_token}')
         
     except Exception as e:
-        print(f"Auth Error: {e}")
+        logger.warning("Error de autenticación", exc_info=True)
         return Response(f"Authentication Failed: {str(e)}", status_code=400)
 
 @app.get("/users/me")
-def read_users_me(request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    token = auth_header.split(" ")[1]
-    email = get_current_user_email(token)
-    if not email:
-         raise HTTPException(status_code=401, detail="Invalid token")
-         
+async def read_users_me(claims: dict = Depends(requiere_usuario), db: Session = Depends(get_db)):
+    if all(k in claims for k in ("id", "name", "role")):
+        return {"id": claims["id"], "email": claims["sub"], "name": claims["name"],
+                "picture": claims.get("picture"), "role": claims["role"]}
+    # Tokens emitidos antes de llevar el perfil en los claims
+    return await ejecutar(db, _perfil_usuario, claims["sub"])
+
+def _perfil_usuario(db: Session, email: str) -> dict:
     user = db.query(models.User).filter(models.User.email == email).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -165,7 +194,6 @@ def read_users_me(request: Request, db: Session = Depends(get_db)):
 def get_config():
     backend_url = os.getenv("API_URL") or os.getenv("BACKEND_URL") or ""
     if backend_url.endswith('/'): backend_url = backend_url[:-1]
-    print(f"DEBUG: Serving config.js with BACKEND_URL='{backend_url}'")
     content = f"window.BACKEND_URL = '{backend_url}';"
     return Response(
         content=content,
@@ -177,97 +205,286 @@ def get_config():
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Formato de texto de Prometheus; cada worker expone sus propias series
+    return PlainTextResponse(metrics.exponer(), media_type="text/plain; version=0.0.4")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# El más externo: mide también el resto de middlewares y añade Server-Timing
+app.add_middleware(metrics.MetricsMiddleware)
+
+# --- Paginación ---
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+
+# --- GET condicionales (ETag / Last-Modified) ---
+def condicional(*tablas: str):
+    # Responde 304 antes de ejecutar el handler si el cliente ya tiene la versión actual
+    async def dependencia(request: Request, response: Response, db: Session = Depends(get_db)) -> dict:
+        headers = await ejecutar(db, versiones.cabeceras, tablas)
+        if versiones.no_modificado(request, headers):
+            raise HTTPException(304, headers=headers)
+        response.headers.update(headers)
+        return headers
+    return dependencia
+
+TABLAS_PRECIOS = ("precios", "precios_archivo", "productos", "marcas", "supermercados", "categorias")
+
+# --- Caché del catálogo ---
+def _catalog_response(key: str, tipo, loader, headers: dict):
+    # Sirve el JSON ya serializado desde la caché; loader solo se ejecuta en un fallo.
+    # La clave incluye el ETag, así que un worker nunca sirve una versión anterior
+    # a la que anuncia aunque su caché en memoria no haya recibido la invalidación
+    def serializar():
+        adapter = TypeAdapter(tipo)
+        return adapter.dump_json(adapter.validate_python(loader(), from_attributes=True))
+    return Response(content=catalog_cache.get_or_set(f"{key}:{headers['ETag']}", serializar), media_type="application/json", headers=headers)
+
+@app.get("/catalog/cache/stats")
+def get_catalog_cache_stats():
+    return catalog_cache.stats()
+
+# --- Consultas lentas (DB_SLOW_QUERY_MS) ---
+@app.get("/admin/slow-queries", dependencies=[Depends(requiere_admin)])
+def get_slow_queries(route: Optional[str] = None, limit: int = Query(50, ge=1, le=1000)):
+    return {"umbral_ms": slow_queries.umbral_ms, "entradas": slow_queries.entradas(route)[:limit]}
+
+@app.post("/admin/slow-queries/dump", dependencies=[Depends(requiere_admin)])
+def dump_slow_queries():
+    # Siempre un fichero nuevo, junto a DB_SLOW_QUERY_FILE si está configurado
+    carpeta = os.path.dirname(os.getenv("DB_SLOW_QUERY_FILE") or "")
+    path = os.path.join(carpeta, f"slow-queries-{datetime.now():%Y%m%d-%H%M%S}.jsonl")
+    return {"fichero": path, "entradas": slow_queries.volcar(path)}
+
+@app.delete("/admin/slow-queries", dependencies=[Depends(requiere_admin)])
+def clear_slow_queries():
+    slow_queries.limpiar()
+    return {"status": "ok"}
+
+# Relaciones de los productos como listas de ids, leídas de las tres tablas
+# intermedias con una única consulta UNION ALL
+def _enlaces_productos(db: Session, producto_ids=None) -> dict:
+    tablas = (
+        ("categoria_ids", models.producto_categoria, models.producto_categoria.c.categoria_id),
+        ("unidad_ids", models.producto_unidad, models.producto_unidad.c.unidad_id),
+        ("marca_ids", models.producto_marca, models.producto_marca.c.marca_id),
+    )
+    selects = []
+    for campo, tabla, col in tablas:
+        sel = select(tabla.c.producto_id, literal(campo).label("campo"), col.label("ref_id"))
+        if producto_ids is not None:
+            sel = sel.where(tabla.c.producto_id.in_(producto_ids))
+        selects.append(sel)
+    enlaces = {}
+    for producto_id, campo, ref_id in db.execute(union_all(*selects)):
+        enlaces.setdefault(producto_id, {"categoria_ids": [], "unidad_ids": [], "marca_ids": []})[campo].append(ref_id)
+    return enlaces
+
+def _productos_compactos(db: Session, productos, todos: bool = False) -> list:
+    # productos: filas con id y nombre. Con todos=True se leen las relaciones sin filtrar por id
+    productos = list(productos)
+    enlaces = _enlaces_productos(db, None if todos else [p.id for p in productos])
+    vacio = {"categoria_ids": [], "unidad_ids": [], "marca_ids": []}
+    return [{"id": p.id, "nombre": p.nombre, **enlaces.get(p.id, vacio)} for p in productos]
+
+@app.get("/catalog/bootstrap", response_model=schemas.CatalogBootstrap)
+@con_sesion
+def get_catalog_bootstrap(
+    db: Session = Depends(get_db),
+    cache_headers: dict = Depends(condicional("categorias", "marcas", "unidades", "supermercados", "productos")),
+):
+    def cargar():
+        return {
+            "categorias": db.query(models.Categoria).order_by(models.Categoria.nombre).all(),
+            "marcas": db.query(models.Marca).order_by(models.Marca.nombre).all(),
+            "unidades": db.query(models.Unidad).order_by(models.Unidad.nombre).all(),
+            "supermercados": db.query(models.Supermercado).order_by(models.Supermercado.nombre).all(),
+            "productos": _productos_compactos(
+                db, db.query(models.Producto.id, models.Producto.nombre).order_by(models.Producto.nombre), todos=True
+            ),
+        }
+    return _catalog_response("bootstrap", schemas.CatalogBootstrap, cargar, cache_headers)
 
 # --- Catálogo: Categorías ---
 @app.get("/catalog/categorias", response_model=List[schemas.Categoria])
-def get_categorias(db: Session = Depends(get_db)):
-    return db.query(models.Categoria).order_by(models.Categoria.nombre).all()
+@con_sesion
+def get_categorias(db: Session = Depends(get_db), cache_headers: dict = Depends(condicional("categorias"))):
+    return _catalog_response("categorias", List[schemas.Categoria], lambda: db.query(models.Categoria).order_by(models.Categoria.nombre).all(), cache_headers)
 
-@app.post("/catalog/categorias", response_model=schemas.Categoria)
+@app.post("/catalog/categorias", response_model=schemas.Categoria, dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def create_categoria(cat: schemas.CategoriaCreate, db: Session = Depends(get_db)):
     nueva = models.Categoria(nombre=cat.nombre)
     db.add(nueva)
+    versiones.bump(db, "categorias", "productos")
     db.commit()
+    catalog_cache.invalidate("categorias", "productos", "bootstrap")
     db.refresh(nueva)
     return nueva
 
-@app.delete("/catalog/categorias/{id}")
+@app.delete("/catalog/categorias/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def delete_categoria(id: int, db: Session = Depends(get_db)):
     db.query(models.Categoria).filter(models.Categoria.id == id).delete()
+    versiones.bump(db, "categorias", "productos")
     db.commit()
+    catalog_cache.invalidate("categorias", "productos", "bootstrap")
     return {"status": "ok"}
 
 # --- Catálogo: Marcas ---
 @app.get("/catalog/marcas", response_model=List[schemas.Marca])
-def get_marcas(db: Session = Depends(get_db)):
-    return db.query(models.Marca).order_by(models.Marca.nombre).all()
+@con_sesion
+def get_marcas(db: Session = Depends(get_db), cache_headers: dict = Depends(condicional("marcas"))):
+    return _catalog_response("marcas", List[schemas.Marca], lambda: db.query(models.Marca).order_by(models.Marca.nombre).all(), cache_headers)
 
-@app.post("/catalog/marcas", response_model=schemas.Marca)
+@app.post("/catalog/marcas", response_model=schemas.Marca, dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def create_marca(marca: schemas.MarcaCreate, db: Session = Depends(get_db)):
     nueva = models.Marca(nombre=marca.nombre)
     db.add(nueva)
+    versiones.bump(db, "marcas", "productos")
     db.commit()
+    catalog_cache.invalidate("marcas", "productos", "bootstrap")
     db.refresh(nueva)
     return nueva
 
-@app.delete("/catalog/marcas/{id}")
+@app.delete("/catalog/marcas/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def delete_marca(id: int, db: Session = Depends(get_db)):
     db.query(models.Marca).filter(models.Marca.id == id).delete()
+    versiones.bump(db, "marcas", "productos")
     db.commit()
+    catalog_cache.invalidate("marcas", "productos", "bootstrap")
     return {"status": "ok"}
 
 # --- Catálogo: Unidades ---
 @app.get("/catalog/unidades", response_model=List[schemas.Unidad])
-def get_unidades(db: Session = Depends(get_db)):
-    return db.query(models.Unidad).order_by(models.Unidad.nombre).all()
+@con_sesion
+def get_unidades(db: Session = Depends(get_db), cache_headers: dict = Depends(condicional("unidades"))):
+    return _catalog_response("unidades", List[schemas.Unidad], lambda: db.query(models.Unidad).order_by(models.Unidad.nombre).all(), cache_headers)
 
-@app.post("/catalog/unidades", response_model=schemas.Unidad)
+@app.post("/catalog/unidades", response_model=schemas.Unidad, dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def create_unidad(uni: schemas.UnidadCreate, db: Session = Depends(get_db)):
-    nueva = models.Unidad(nombre=uni.nombre)
+    base, factor = (uni.base, uni.factor or 1.0) if uni.base else unidades.por_defecto(uni.nombre)
+    nueva = models.Unidad(nombre=uni.nombre, base=base, factor=factor)
     db.add(nueva)
+    versiones.bump(db, "unidades", "productos")
     db.commit()
+    catalog_cache.invalidate("unidades", "productos", "bootstrap")
     db.refresh(nueva)
     return nueva
 
-@app.delete("/catalog/unidades/{id}")
+@app.delete("/catalog/unidades/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def delete_unidad(id: int, db: Session = Depends(get_db)):
     db.query(models.Unidad).filter(models.Unidad.id == id).delete()
+    versiones.bump(db, "unidades", "productos")
     db.commit()
+    catalog_cache.invalidate("unidades", "productos", "bootstrap")
     return {"status": "ok"}
 
 # --- Catálogo: Supermercados ---
 @app.get("/catalog/supermercados", response_model=List[schemas.Supermercado])
-def get_supermercados(db: Session = Depends(get_db)):
-    return db.query(models.Supermercado).order_by(models.Supermercado.nombre).all()
+@con_sesion
+def get_supermercados(db: Session = Depends(get_db), cache_headers: dict = Depends(condicional("supermercados"))):
+    return _catalog_response("supermercados", List[schemas.Supermercado], lambda: db.query(models.Supermercado).order_by(models.Supermercado.nombre).all(), cache_headers)
 
-@app.post("/catalog/supermercados", response_model=schemas.Supermercado)
+@app.post("/catalog/supermercados", response_model=schemas.Supermercado, dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def create_super(sup: schemas.SupermercadoCreate, db: Session = Depends(get_db)):
     nuevo = models.Supermercado(nombre=sup.nombre)
     db.add(nuevo)
+    versiones.bump(db, "supermercados")
     db.commit()
+    catalog_cache.invalidate("supermercados", "bootstrap")
     db.refresh(nuevo)
     return nuevo
 
-@app.delete("/catalog/supermercados/{id}")
+@app.delete("/catalog/supermercados/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def delete_super(id: int, db: Session = Depends(get_db)):
     db.query(models.Supermercado).filter(models.Supermercado.id == id).delete()
+    versiones.bump(db, "supermercados")
     db.commit()
+    catalog_cache.invalidate("supermercados", "bootstrap")
     return {"status": "ok"}
 
 # --- Catálogo: Productos ---
-@app.get("/catalog/productos", response_model=List[schemas.Producto])
-def get_productos(db: Session = Depends(get_db)):
-    return db.query(models.Producto).all()
+# --- Búsqueda de productos ---
+def _indice_al_dia(db: Session):
+    # La versión se lee antes que los nombres: si alguien escribe entre medias,
+    # la próxima búsqueda vuelve a reconstruir
+    version = versiones.version(db, "productos")
+    if indice_productos.version != version:
+        indice_productos.construir(db.query(models.Producto.id, models.Producto.nombre), version)
+
+@app.get("/catalog/productos/search", response_model=List[schemas.ProductoBusqueda])
+@con_sesion
+def search_productos(q: str, k: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    _indice_al_dia(db)
+    return [{"id": i, "nombre": nombre, "score": score} for i, nombre, score in indice_productos.buscar(q, k)]
+
+def _like_prefijo(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+@app.get("/catalog/productos", response_model=Union[List[schemas.Producto], List[schemas.ProductoCompacto]])
+@con_sesion
+def get_productos(
+    q: Optional[str] = None,
+    compact: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db),
+    cache_headers: dict = Depends(condicional("productos", "categorias", "unidades", "marcas")),
+):
+    # compact=true devuelve las relaciones como listas de ids (ver /catalog/bootstrap)
+    tipo = List[schemas.ProductoCompacto] if compact else List[schemas.Producto]
+
+    def cargar(limite=None):
+        if compact:
+            query = db.query(models.Producto.id, models.Producto.nombre)
+        else:
+            # selectinload: una consulta por relación para toda la página, no una por producto
+            query = db.query(models.Producto).options(
+                selectinload(models.Producto.categorias),
+                selectinload(models.Producto.unidades),
+                selectinload(models.Producto.marcas),
+            )
+        if q:
+            query = query.filter(models.Producto.nombre.ilike(_like_prefijo(q), escape="\\"))
+        if cursor is not None:
+            query = query.filter(models.Producto.id > cursor)
+        query = query.order_by(models.Producto.id)
+        return query.limit(limite).all() if limite else query.all()
+
+    def serializar(rows, todos=False):
+        return _productos_compactos(db, rows, todos=todos) if compact else rows
 
-@app.post("/catalog/productos", response_model=schemas.Producto)
+    # Solo el listado completo pasa por la caché; búsquedas y páginas se calculan al vuelo
+    if q is None and limit is None and cursor is None:
+        key = "productos:compact" if compact else "productos"
+        return _catalog_response(key, tipo, lambda: serializar(cargar(), todos=True), cache_headers)
+
+    rows = cargar(limit + 1 if limit else None)
+    headers = dict(cache_headers)
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+    adapter = TypeAdapter(tipo)
+    body = adapter.dump_json(adapter.validate_python(serializar(rows), from_attributes=True))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.post("/catalog/productos", response_model=schemas.Producto, dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def create_producto(prod: schemas.ProductoCreate, db: Session = Depends(get_db)):
-    print(f"DEBUG: Creating product with name='{prod.nombre}', categoria_ids={prod.categoria_ids}, unidad_ids={prod.unidad_ids}, marca_ids={prod.marca_ids}")
     
     if not prod.nombre or not prod.nombre.strip():
         raise HTTPException(400, "El nombre del producto es obligatorio")
@@ -278,94 +495,160 @@ def create_producto(prod: schemas.ProductoCreate, db: Session = Depends(get_db))
     if prod.categoria_ids:
         cats = db.query(models.Categoria).filter(models.Categoria.id.in_(prod.categoria_ids)).all()
         nuevo.categorias = cats
-        print(f"DEBUG: Linked {len(cats)} categories")
     
     # Vinculamos Unidades
     if prod.unidad_ids:
         unis = db.query(models.Unidad).filter(models.Unidad.id.in_(prod.unidad_ids)).all()
         nuevo.unidades = unis
-        print(f"DEBUG: Linked {len(unis)} units")
     
     # Vinculamos Marcas
     if prod.marca_ids:
         marcas = db.query(models.Marca).filter(models.Marca.id.in_(prod.marca_ids)).all()
         nuevo.marcas = marcas
-        print(f"DEBUG: Linked {len(marcas)} brands")
 
     db.add(nuevo)
+    version = versiones.bump(db, "productos")["productos"]
     db.commit()
+    catalog_cache.invalidate("productos", "bootstrap")
     db.refresh(nuevo)
-    print(f"DEBUG: Product created successfully with id={nuevo.id}")
-    return nuevo
+    indice_productos.aplicar(version, add=[(nuevo.id, nuevo.nombre)])
+    logger.debug("Producto creado", extra={
+        "producto_id": nuevo.id, "categoria_ids": prod.categoria_ids,
+        "unidad_ids": prod.unidad_ids, "marca_ids": prod.marca_ids,
+    })
+    return schemas.Producto.model_validate(nuevo)
 
-@app.delete("/catalog/productos/{id}")
+@app.delete("/catalog/productos/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def delete_producto(id: int, db: Session = Depends(get_db)):
     db.query(models.Producto).filter(models.Producto.id == id).delete()
+    version = versiones.bump(db, "productos")["productos"]
     db.commit()
+    catalog_cache.invalidate("productos", "bootstrap")
+    indice_productos.aplicar(version, remove=[id])
     return {"status": "ok"}
 
 # --- Relaciones Producto-Categoria ---
-@app.post("/catalog/productos/{producto_id}/categorias/{categoria_id}")
+@app.post("/catalog/productos/{producto_id}/categorias/{categoria_id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def link_producto_categoria(producto_id: int, categoria_id: int, db: Session = Depends(get_db)):
     prod = db.query(models.Producto).filter(models.Producto.id == producto_id).first()
     cat = db.query(models.Categoria).filter(models.Categoria.id == categoria_id).first()
     if not prod or not cat: raise HTTPException(404, "No existe producto o categoría")
     if cat not in prod.categorias:
         prod.categorias.append(cat)
+        versiones.bump(db, "productos")
         db.commit()
+        catalog_cache.invalidate("productos", "bootstrap")
     return {"status": "ok"}
 
-@app.delete("/catalog/productos/{producto_id}/categorias/{categoria_id}")
+@app.delete("/catalog/productos/{producto_id}/categorias/{categoria_id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def unlink_producto_categoria(producto_id: int, categoria_id: int, db: Session = Depends(get_db)):
     prod = db.query(models.Producto).filter(models.Producto.id == producto_id).first()
     cat = db.query(models.Categoria).filter(models.Categoria.id == categoria_id).first()
     if prod and cat and cat in prod.categorias:
         prod.categorias.remove(cat)
+        versiones.bump(db, "productos")
         db.commit()
+        catalog_cache.invalidate("productos", "bootstrap")
     return {"status": "ok"}
 
 # --- Relaciones Producto-Unidad ---
-@app.post("/catalog/productos/{producto_id}/unidades/{unidad_id}")
+@app.post("/catalog/productos/{producto_id}/unidades/{unidad_id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def link_producto_unidad(producto_id: int, unidad_id: int, db: Session = Depends(get_db)):
     prod = db.query(models.Producto).filter(models.Producto.id == producto_id).first()
     unit = db.query(models.Unidad).filter(models.Unidad.id == unidad_id).first()
     if not prod or not unit: raise HTTPException(404, "No existe producto o unidad")
     if unit not in prod.unidades:
         prod.unidades.append(unit)
+        versiones.bump(db, "productos")
         db.commit()
+        catalog_cache.invalidate("productos", "bootstrap")
     return {"status": "ok"}
 
-@app.delete("/catalog/productos/{producto_id}/unidades/{unidad_id}")
+@app.delete("/catalog/productos/{producto_id}/unidades/{unidad_id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def unlink_producto_unidad(producto_id: int, unidad_id: int, db: Session = Depends(get_db)):
     prod = db.query(models.Producto).filter(models.Producto.id == producto_id).first()
     unit = db.query(models.Unidad).filter(models.Unidad.id == unidad_id).first()
     if prod and unit and unit in prod.unidades:
         prod.unidades.remove(unit)
+        versiones.bump(db, "productos")
         db.commit()
+        catalog_cache.invalidate("productos", "bootstrap")
     return {"status": "ok"}
 
 # --- Relaciones Producto-Marca ---
-@app.post("/catalog/productos/{producto_id}/marcas/{marca_id}")
+@app.post("/catalog/productos/{producto_id}/marcas/{marca_id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def link_producto_marca(producto_id: int, marca_id: int, db: Session = Depends(get_db)):
     prod = db.query(models.Producto).filter(models.Producto.id == producto_id).first()
     marca = db.query(models.Marca).filter(models.Marca.id == marca_id).first()
     if not prod or not marca: raise HTTPException(404, "No existe producto o marca")
     if marca not in prod.marcas:
         prod.marcas.append(marca)
+        versiones.bump(db, "productos")
         db.commit()
+        catalog_cache.invalidate("productos", "bootstrap")
     return {"status": "ok"}
 
-@app.delete("/catalog/productos/{producto_id}/marcas/{marca_id}")
+@app.delete("/catalog/productos/{producto_id}/marcas/{marca_id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def unlink_producto_marca(producto_id: int, marca_id: int, db: Session = Depends(get_db)):
     prod = db.query(models.Producto).filter(models.Producto.id == producto_id).first()
     marca = db.query(models.Marca).filter(models.Marca.id == marca_id).first()
     if prod and marca and marca in prod.marcas:
         prod.marcas.remove(marca)
+        versiones.bump(db, "productos")
         db.commit()
+        catalog_cache.invalidate("productos", "bootstrap")
+    return {"status": "ok"}
+
+# --- Alertas de precio ---
+def _usuario_id(db: Session, claims: dict) -> int:
+    # Los tokens actuales llevan el id; los antiguos solo el email
+    if "id" in claims:
+        return claims["id"]
+    user_id = db.query(models.User.id).filter(models.User.email == claims["sub"]).scalar()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user_id
+
+@app.get("/alertas", response_model=List[schemas.Alerta])
+@con_sesion
+def listar_alertas(claims: dict = Depends(requiere_usuario), db: Session = Depends(get_db)):
+    return (db.query(models.AlertaRegla).filter(models.AlertaRegla.user_id == _usuario_id(db, claims))
+            .order_by(models.AlertaRegla.id).all())
+
+@app.post("/alertas", response_model=schemas.Alerta, status_code=201)
+@con_sesion
+def crear_alerta(alerta: schemas.AlertaCreate, claims: dict = Depends(requiere_usuario), db: Session = Depends(get_db)):
+    if not db.query(models.Producto.id).filter(models.Producto.id == alerta.producto_id).first():
+        raise HTTPException(404, "Producto no encontrado")
+    nueva = models.AlertaRegla(user_id=_usuario_id(db, claims), **alerta.model_dump())
+    db.add(nueva)
+    versiones.bump(db, "alertas")
+    db.commit()
+    db.refresh(nueva)
+    return nueva
+
+@app.delete("/alertas/{id}")
+@con_sesion
+def delete_alerta(id: int, claims: dict = Depends(requiere_usuario), db: Session = Depends(get_db)):
+    borradas = (db.query(models.AlertaRegla)
+                .filter(models.AlertaRegla.id == id, models.AlertaRegla.user_id == _usuario_id(db, claims))
+                .delete(synchronize_session=False))
+    if not borradas:
+        raise HTTPException(404, "No existe")
+    versiones.bump(db, "alertas")
+    db.commit()
     return {"status": "ok"}
 
 # --- Registros de Precios ---
-@app.post("/precios", status_code=201)
+@app.post("/precios", status_code=201, dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def crear_precio(precio: schemas.PrecioCreate, db: Session = Depends(get_db)):
     p_unidad = precio.precio_total / precio.cantidad if precio.cantidad > 0 else 0
     nuevo = models.Precio(
@@ -376,73 +659,394 @@ def crear_precio(precio: schemas.PrecioCreate, db: Session = Depends(get_db)):
         unidad=precio.unidad,
         precio_total=precio.precio_total,
         precio_unidad=p_unidad,
+        tamano_pack=precio.tamano_pack,
         es_oferta=precio.es_oferta,
         tipo_oferta=precio.tipo_oferta,
-        fecha=datetime.now().isoformat()
+        fecha=datetime.now()
     )
+    unidades.normalizar(db, [nuevo])
     db.add(nuevo)
+    db.flush()
+    # Las alertas comparan con el último precio de la clave: antes de actualizar precios_ultimos
+    notificaciones = alertas.evaluar(db, [nuevo])
+    rollup.registrar(db, [nuevo])
+    cesta.registrar(db, [nuevo])
+    versiones.bump(db, "precios")
+    # El evento se arma antes del commit (que expira la instancia) y sale solo si este va bien
+    evento = feed.evento("c", nuevo)
     db.commit()
+    feed.hub.publicar(evento)
+    alertas.notificar(notificaciones)
     return {"status": "ok"}
 
-@app.get("/precios", response_model=List[schemas.PrecioDisplay])
-def listar_precios(db: Session = Depends(get_db)):
-    precios = db.query(models.Precio).order_by(models.Precio.id.desc()).all()
-    res = []
-    for p in precios:
-        # Skip if product was deleted
-        if not p.producto_rel or not p.marca_rel or not p.supermercado_rel:
+# --- Carga masiva de precios ---
+BULK_CHUNK_SIZE = 1000
+
+async def _leer_filas_bulk(request: Request):
+    # Produce (número de fila, dict | error) desde un array JSON o un cuerpo NDJSON en streaming
+    if request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl")):
+        n, pendiente = 0, b""
+        async for chunk in request.stream():
+            pendiente += chunk
+            *lineas, pendiente = pendiente.split(b"\n")
+            for linea in lineas:
+                if linea.strip():
+                    yield n, linea
+                    n += 1
+        if pendiente.strip():
+            yield n, pendiente
+        return
+
+    try:
+        data = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(400, "El cuerpo debe ser un array JSON o NDJSON")
+    if not isinstance(data, list):
+        raise HTTPException(400, "El cuerpo debe ser un array JSON o NDJSON")
+    for n, item in enumerate(data):
+        yield n, item
+
+def _validar_fila_bulk(raw):
+    try:
+        if isinstance(raw, bytes):
+            return schemas.PrecioCreate.model_validate_json(raw), None
+        return schemas.PrecioCreate.model_validate(raw), None
+    except ValidationError as e:
+        return None, "; ".join(f"{'.'.join(str(x) for x in err['loc']) or 'fila'}: {err['msg']}" for err in e.errors())
+
+def _insertar_lote(db: Session, lote, fecha: datetime):
+    # Valida contra el catálogo con una consulta por tabla e inserta el lote con executemany
+    existentes = {}
+    for modelo, campo in ((models.Producto, "producto_id"), (models.Marca, "marca_id"), (models.Supermercado, "supermercado_id")):
+        ids = {getattr(p, campo) for _, p in lote}
+        existentes[campo] = {r[0] for r in db.query(modelo.id).filter(modelo.id.in_(ids))}
+
+    filas, errores = [], []
+    for n, p in lote:
+        faltan = [campo for campo, ids in existentes.items() if getattr(p, campo) not in ids]
+        if faltan:
+            errores.append({"fila": n, "error": f"No existe {', '.join(faltan)}"})
+            continue
+        filas.append({**p.model_dump(), "fecha": fecha})
+
+    notificaciones = []
+    if filas:
+        for f in filas:
+            f["precio_unidad"] = f["precio_total"] / f["cantidad"] if f["cantidad"] > 0 else 0
+        unidades.normalizar(db, filas)
+        db.execute(insert(models.Precio), filas)
+        # Antes de cesta.registrar: las alertas comparan con el último precio de cada clave
+        notificaciones = alertas.evaluar(db, filas)
+        rollup.registrar(db, filas)
+        cesta.registrar(db, filas)
+        versiones.bump(db, "precios")
+    db.commit()
+    alertas.notificar(notificaciones)
+    return len(filas), errores
+
+@app.post("/precios/bulk", response_model=schemas.BulkResultado, dependencies=[Depends(requiere_escritura)])
+async def crear_precios_bulk(request: Request, db: Session = Depends(get_db)):
+    fecha = datetime.now()
+    insertados, errores, lote = 0, [], []
+    async for n, raw in _leer_filas_bulk(request):
+        precio, error = _validar_fila_bulk(raw)
+        if error:
+            errores.append({"fila": n, "error": error})
             continue
-            
-        cats_str = ", ".join([c.nombre for c in p.producto_rel.categorias]) if p.producto_rel.categorias else "Sin categoría"
-        res.append({
-            "id": p.id,
-            "producto_id": p.producto_id,
-            "marca_id": p.marca_id,
-            "supermercado_id": p.supermercado_id,
-            "producto": p.producto_rel.nombre,
-            "marca": p.marca_rel.nombre,
-            "categoria": cats_str,
-            "supermercado": p.supermercado_rel.nombre,
-            "cantidad": p.cantidad,
-            "unidad": p.unidad,
-            "precio_total": p.precio_total,
-            "precio_unidad": p.precio_unidad,
-            "es_oferta": p.es_oferta,
-            "tipo_oferta": p.tipo_oferta,
-            "fecha": p.fecha
-        })
-    return res
+        lote.append((n, precio))
+        if len(lote) >= BULK_CHUNK_SIZE:
+            ok, errs = await ejecutar(db, _insertar_lote, lote, fecha)
+            insertados += ok
+            errores += errs
+            lote = []
+    if lote:
+        ok, errs = await ejecutar(db, _insertar_lote, lote, fecha)
+        insertados += ok
+        errores += errs
+    return {"insertados": insertados, "errores": sorted(errores, key=lambda e: e["fila"])}
+
+# Construye las filas de PrecioDisplay en una sola consulta: JOIN con producto, marca y
+# supermercado (los INNER JOIN descartan registros cuyo relacionado fue eliminado) y las
+# categorías del producto agregadas en una subconsulta correlacionada.
+def _precios_display_query(db: Session, modelo=models.Precio):
+    categorias = (
+        db.query(func.aggregate_strings(models.Categoria.nombre, ", "))
+        .join(models.producto_categoria, models.producto_categoria.c.categoria_id == models.Categoria.id)
+        .filter(models.producto_categoria.c.producto_id == modelo.producto_id)
+        .correlate(modelo)
+        .scalar_subquery()
+    )
+    return (
+        db.query(
+            modelo.id,
+            modelo.producto_id,
+            modelo.marca_id,
+            modelo.supermercado_id,
+            models.Producto.nombre.label("producto"),
+            models.Marca.nombre.label("marca"),
+            func.coalesce(categorias, "Sin categoría").label("categoria"),
+            models.Supermercado.nombre.label("supermercado"),
+            modelo.cantidad,
+            modelo.unidad,
+            modelo.precio_total,
+            modelo.precio_unidad,
+            modelo.tamano_pack,
+            modelo.unidad_base,
+            modelo.precio_base,
+            modelo.es_oferta,
+            modelo.tipo_oferta,
+            modelo.fecha,
+        )
+        .join(models.Producto, modelo.producto_id == models.Producto.id)
+        .join(models.Marca, modelo.marca_id == models.Marca.id)
+        .join(models.Supermercado, modelo.supermercado_id == models.Supermercado.id)
+    )
+
+# --- Paginación por cursor y filtros ---
+def _sin_zona(fecha: Optional[datetime]) -> Optional[datetime]:
+    # precios.fecha se guarda sin zona con datetime.now(): "...Z" o "+02:00" se pasan a esa hora
+    if fecha is None or fecha.tzinfo is None:
+        return fecha
+    return fecha.astimezone().replace(tzinfo=None)
+
+def get_filtros_precios(
+    supermercado_id: Optional[int] = None,
+    marca_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    es_oferta: Optional[bool] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> schemas.PrecioFiltros:
+    return schemas.PrecioFiltros(
+        supermercado_id=supermercado_id, marca_id=marca_id, categoria_id=categoria_id,
+        es_oferta=es_oferta, desde=_sin_zona(desde), hasta=_sin_zona(hasta),
+    )
+
+def _filtrar_precios(query, filtros: schemas.PrecioFiltros, modelo=models.Precio):
+    if filtros.supermercado_id is not None:
+        query = query.filter(modelo.supermercado_id == filtros.supermercado_id)
+    if filtros.marca_id is not None:
+        query = query.filter(modelo.marca_id == filtros.marca_id)
+    if filtros.categoria_id is not None:
+        query = query.filter(
+            modelo.producto_id.in_(
+                select(models.producto_categoria.c.producto_id)
+                .where(models.producto_categoria.c.categoria_id == filtros.categoria_id)
+            )
+        )
+    if filtros.es_oferta is not None:
+        query = query.filter(modelo.es_oferta == filtros.es_oferta)
+    if filtros.desde is not None:
+        query = query.filter(modelo.fecha >= filtros.desde)
+    if filtros.hasta is not None:
+        query = query.filter(modelo.fecha <= filtros.hasta)
+    return query
+
+def _paginar_precios(db: Session, response: Response, limit: int, cursor: Optional[int],
+                     filtros: schemas.PrecioFiltros, producto_id: Optional[int] = None):
+    # Keyset sobre id descendente: el cursor es el id del último registro devuelto.
+    # Primero la tabla caliente; el archivo (ids menores) solo si la página no se llena
+    rows = []
+    for modelo in archivo.modelos(db, filtros.desde):
+        query = _filtrar_precios(_precios_display_query(db, modelo), filtros, modelo)
+        if producto_id is not None:
+            query = query.filter(modelo.producto_id == producto_id)
+        if cursor is not None:
+            query = query.filter(modelo.id < cursor)
+        rows += query.order_by(modelo.id.desc()).limit(limit + 1 - len(rows)).all()
+        if len(rows) > limit:
+            break
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return [r._asdict() for r in rows]
+
+@app.get("/precios", response_model=List[schemas.PrecioDisplay])
+@con_sesion
+def listar_precios(
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[int] = None,
+    filtros: schemas.PrecioFiltros = Depends(get_filtros_precios),
+    cache_headers: dict = Depends(condicional(*TABLAS_PRECIOS)),
+    db: Session = Depends(get_db),
+):
+    return _paginar_precios(db, response, limit, cursor, filtros)
+
+# --- Exportación en streaming ---
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_COLUMNAS = list(schemas.PrecioDisplay.model_fields)
+EXPORT_FECHA = EXPORT_COLUMNAS.index("fecha")
+
+class _CsvEncoder:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(EXPORT_COLUMNAS)
+
+    def encode(self, bloque) -> str:
+        # fecha en ISO 8601, igual que en las respuestas JSON
+        i = EXPORT_FECHA
+        self.writer.writerows((*r[:i], r[i] and r[i].isoformat(), *r[i + 1:]) for r in bloque)
+        data = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def close(self) -> str:
+        return self.encode([])
+
+class _ParquetEncoder:
+    # Cada bloque se escribe como un row group y se envía al cliente
+    def __init__(self, pa, pq):
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.int64()), ("producto_id", pa.int64()), ("marca_id", pa.int64()), ("supermercado_id", pa.int64()),
+            ("producto", pa.string()), ("marca", pa.string()), ("categoria", pa.string()), ("supermercado", pa.string()),
+            ("cantidad", pa.float64()), ("unidad", pa.string()), ("precio_total", pa.float64()),
+            ("precio_unidad", pa.float64()), ("tamano_pack", pa.int64()), ("unidad_base", pa.string()),
+            ("precio_base", pa.float64()), ("es_oferta", pa.bool_()), ("tipo_oferta", pa.string()), ("fecha", pa.timestamp("us")),
+        ])
+        self.sink = io.BytesIO()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+
+    def _vaciar(self) -> bytes:
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def encode(self, bloque) -> bytes:
+        self.writer.write_table(self.pa.Table.from_pylist([r._asdict() for r in bloque], schema=self.schema))
+        return self._vaciar()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self._vaciar()
+
+@app.get("/precios/export")
+async def exportar_precios(
+    formato: Literal["csv", "parquet"] = "csv",
+    producto_id: Optional[int] = None,
+    filtros: schemas.PrecioFiltros = Depends(get_filtros_precios),
+    db: Session = Depends(get_db),
+):
+    if formato == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise HTTPException(501, "La exportación a Parquet requiere instalar pyarrow")
+        encoder = _ParquetEncoder(pa, pq)
+    else:
+        encoder = _CsvEncoder()
+
+    # Orden por id ascendente: primero el archivo (ids menores) y luego la tabla caliente
+    modelos = reversed(await ejecutar(db, archivo.modelos, filtros.desde))
+    # Construir la consulta no hace E/S, así que vale la sesión síncrona interna de AsyncSession
+    sesion = db.sync_session if isinstance(db, AsyncSession) else db
+    stmts = []
+    for modelo in modelos:
+        query = _filtrar_precios(_precios_display_query(sesion, modelo), filtros, modelo)
+        if producto_id is not None:
+            query = query.filter(modelo.producto_id == producto_id)
+        # yield_per usa un cursor de servidor en Postgres: las filas llegan por bloques
+        stmts.append(query.order_by(modelo.id).statement.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+
+    if isinstance(db, AsyncSession):
+        async def generar():
+            try:
+                for stmt in stmts:
+                    result = await db.stream(stmt)
+                    async for bloque in result.partitions():
+                        yield encoder.encode(bloque)
+                yield encoder.close()
+            finally:
+                await db.close()
+    else:
+        def generar():
+            try:
+                for stmt in stmts:
+                    for bloque in db.execute(stmt).partitions():
+                        yield encoder.encode(bloque)
+                yield encoder.close()
+            finally:
+                db.close()
+
+    return StreamingResponse(
+        generar(),
+        media_type="application/vnd.apache.parquet" if formato == "parquet" else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="precios.{formato}"'},
+    )
+
+# --- Feed en vivo de precios ---
+# Deltas tras cada alta, modificación o borrado; ?producto_id=&supermercado_id= (repetibles) filtran
+@app.get("/precios/stream")
+async def stream_precios(producto_id: List[int] = Query([]), supermercado_id: List[int] = Query([])):
+    async def eventos():
+        # Suscripción al empezar a enviar: si la respuesta no llega a arrancar, no queda
+        # ninguna cola huérfana en el hub (el finally solo corre si el generador empezó)
+        suscriptor = feed.hub.suscribir(producto_id, supermercado_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                evento = await suscriptor.siguiente(feed.FEED_HEARTBEAT)
+                # El comentario mantiene viva la conexión en proxies y detecta clientes caídos
+                yield feed.sse(evento) if evento else ": ping\n\n"
+        finally:
+            feed.hub.cancelar(suscriptor)
+
+    return StreamingResponse(eventos(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/precios/ws")
+async def ws_precios(websocket: WebSocket, producto_id: List[int] = Query([]), supermercado_id: List[int] = Query([])):
+    await websocket.accept()
+    suscriptor = feed.hub.suscribir(producto_id, supermercado_id)
+
+    async def enviar():
+        while True:
+            await websocket.send_json(await suscriptor.siguiente())
+
+    async def escuchar():
+        # El cliente no manda nada útil: se lee solo para enterarse de que se ha ido
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tareas = [asyncio.create_task(enviar()), asyncio.create_task(escuchar())]
+    try:
+        await asyncio.wait(tareas, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        feed.hub.cancelar(suscriptor)
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
 
 @app.get("/precios/{id}", response_model=schemas.PrecioDisplay)
-def get_precio(id: int, db: Session = Depends(get_db)):
-    p = db.query(models.Precio).filter(models.Precio.id == id).first()
-    if not p: raise HTTPException(404, "No existe")
-    if not p.producto_rel or not p.marca_rel or not p.supermercado_rel:
-        raise HTTPException(404, "Producto, marca o supermercado relacionado fue eliminado")
-        
-    cats_str = ", ".join([c.nombre for c in p.producto_rel.categorias]) if p.producto_rel.categorias else "Sin categoría"
-    return {
-        "id": p.id,
-        "producto_id": p.producto_id,
-        "marca_id": p.marca_id,
-        "supermercado_id": p.supermercado_id,
-        "producto": p.producto_rel.nombre,
-        "marca": p.marca_rel.nombre,
-        "categoria": cats_str,
-        "supermercado": p.supermercado_rel.nombre,
-        "cantidad": p.cantidad,
-        "unidad": p.unidad,
-        "precio_total": p.precio_total,
-        "precio_unidad": p.precio_unidad,
-        "es_oferta": p.es_oferta,
-        "tipo_oferta": p.tipo_oferta,
-        "fecha": p.fecha
-    }
+@con_sesion
+def get_precio(id: int, db: Session = Depends(get_db), cache_headers: dict = Depends(condicional(*TABLAS_PRECIOS))):
+    for modelo in archivo.modelos(db):
+        row = _precios_display_query(db, modelo).filter(modelo.id == id).first()
+        if row:
+            return row._asdict()
+        if db.query(modelo.id).filter(modelo.id == id).first():
+            raise HTTPException(404, "Producto, marca o supermercado relacionado fue eliminado")
+    raise HTTPException(404, "No existe")
 
-@app.put("/precios/{id}")
+def _comprobar_no_archivado(db: Session, id: int):
+    # El archivo es de solo lectura: su historia ya está consolidada en precios_diarios
+    if models.PrecioArchivo in archivo.modelos(db) and db.query(models.PrecioArchivo.id).filter(models.PrecioArchivo.id == id).first():
+        raise HTTPException(409, "El precio está archivado y no se puede modificar")
+
+@app.put("/precios/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def update_precio(id: int, data: schemas.PrecioUpdate, db: Session = Depends(get_db)):
     p = db.query(models.Precio).filter(models.Precio.id == id).first()
-    if not p: raise HTTPException(404, "No existe")
+    if not p:
+        _comprobar_no_archivado(db, id)
+        raise HTTPException(404, "No existe")
+    clave_anterior = rollup.clave(p)
+    anterior = feed.evento("d", p)
     
     update_data = data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
@@ -450,78 +1054,140 @@ def update_precio(id: int, data: schemas.PrecioUpdate, db: Session = Depends(get
     
     # Recalcular precio unidad
     p.precio_unidad = p.precio_total / p.cantidad if p.cantidad > 0 else 0
+    unidades.normalizar(db, [p])
+    db.flush()
+    rollup.recalcular(db, [clave_anterior, rollup.clave(p)])
+    cesta.recalcular(db, [(anterior["producto_id"], anterior["supermercado_id"]), (p.producto_id, p.supermercado_id)])
+    versiones.bump(db, "precios")
+    eventos = [feed.evento("u", p)]
+    if (anterior["producto_id"], anterior["supermercado_id"]) != (p.producto_id, p.supermercado_id):
+        # Quien filtra por el producto o supermercado de antes lo ve desaparecer
+        eventos.insert(0, anterior)
     db.commit()
+    for evento in eventos:
+        feed.hub.publicar(evento)
     return {"status": "ok"}
 
-@app.delete("/precios/{id}")
+@app.delete("/precios/{id}", dependencies=[Depends(requiere_escritura)])
+@con_sesion
 def delete_precio(id: int, db: Session = Depends(get_db)):
-    db.query(models.Precio).filter(models.Precio.id == id).delete()
-    db.commit()
+    p = db.query(models.Precio).filter(models.Precio.id == id).first()
+    if not p:
+        _comprobar_no_archivado(db, id)
+    else:
+        db.delete(p)
+        db.flush()
+        rollup.recalcular(db, [rollup.clave(p)])
+        cesta.recalcular(db, [(p.producto_id, p.supermercado_id)])
+        versiones.bump(db, "precios")
+        evento = feed.evento("d", p)
+        db.commit()
+        feed.hub.publicar(evento)
     return {"status": "ok"}
 
 @app.get("/precios/producto/{prod_id}", response_model=List[schemas.PrecioDisplay])
-def historial_producto(prod_id: int, db: Session = Depends(get_db)):
-    precios = db.query(models.Precio).filter(models.Precio.producto_id == prod_id).order_by(models.Precio.id.desc()).all()
-    res = []
-    for p in precios:
-        # Skip if related objects were deleted
-        if not p.producto_rel or not p.marca_rel or not p.supermercado_rel:
-            continue
-            
-        cats_str = ", ".join([c.nombre for c in p.producto_rel.categorias]) if p.producto_rel.categorias else "Sin categoría"
-        res.append({
-            "id": p.id,
-            "producto_id": p.producto_id,
-            "marca_id": p.marca_id,
-            "supermercado_id": p.supermercado_id,
-            "producto": p.producto_rel.nombre,
-            "marca": p.marca_rel.nombre,
-            "categoria": cats_str,
-            "supermercado": p.supermercado_rel.nombre,
-            "cantidad": p.cantidad,
-            "unidad": p.unidad,
-            "precio_total": p.precio_total,
-            "precio_unidad": p.precio_unidad,
-            "es_oferta": p.es_oferta,
-            "tipo_oferta": p.tipo_oferta,
-            "fecha": p.fecha
-        })
-    return res
-
-@app.on_event("startup")
-def seed_data():
-    db = SessionLocal()
-    try:
-        # Semilla de Unidades
-        if not db.query(models.Unidad).first():
-            units = ["kg", "g", "L", "ml", "ud", "pack"]
-            for u in units:
-                db.add(models.Unidad(nombre=u))
-            db.commit()
+@con_sesion
+def historial_producto(
+    prod_id: int,
+    response: Response,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    cursor: Optional[int] = None,
+    filtros: schemas.PrecioFiltros = Depends(get_filtros_precios),
+    cache_headers: dict = Depends(condicional(*TABLAS_PRECIOS)),
+    db: Session = Depends(get_db),
+):
+    return _paginar_precios(db, response, limit, cursor, filtros, producto_id=prod_id)
 
-        # Semilla de Categorías
-        if not db.query(models.Categoria).first():
-            cats = ["Bebidas", "Lácteos", "Despensa", "Carnicería", "Frutería", "Limpieza", "Higiene", "Ofertas", "Bio"]
-            for c in cats:
-                db.add(models.Categoria(nombre=c))
-            db.commit()
+@app.get("/precios/producto/{prod_id}/serie", response_model=List[schemas.SeriePunto])
+@con_sesion
+def serie_producto(
+    prod_id: int,
+    agrupacion: Literal["dia", "semana", "mes"] = "dia",
+    supermercado_id: Optional[int] = None,
+    marca_id: Optional[int] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    cache_headers: dict = Depends(condicional(*TABLAS_PRECIOS)),
+    db: Session = Depends(get_db),
+):
+    # Servida desde precios_diarios: nunca toca las filas de precios
+    return rollup.serie(db, prod_id, agrupacion, supermercado_id, marca_id, desde, hasta)
 
-        # Semilla de Supermercados
-        if not db.query(models.Supermercado).first():
-            supers = ["Mercadona", "Carrefour", "Lidl", "Aldi", "Dia", "Eroski", "Alcampo", "Hipercor"]
-            for s in supers:
-                db.add(models.Supermercado(nombre=s))
-            db.commit()
+@app.get("/precios/producto/{prod_id}/stats", response_model=schemas.PrecioStats)
+@con_sesion
+def stats_producto(prod_id: int, db: Session = Depends(get_db), cache_headers: dict = Depends(condicional(*TABLAS_PRECIOS))):
+    # Registros del producto en la tabla caliente y, si hay, en el archivo, en precio por unidad base.
+    # Las filas sin precio_base (anteriores a la normalización, sin rellenar) no son comparables
+    fuentes = [
+        select(m.id, m.supermercado_id, m.precio_base)
+        .join(models.Marca, m.marca_id == models.Marca.id)
+        .where(m.producto_id == prod_id, m.precio_base.isnot(None))
+        for m in archivo.modelos(db)
+    ]
+    base = (fuentes[0] if len(fuentes) == 1 else union_all(*fuentes)).subquery()
+    # Numeramos los registros de cada supermercado del más reciente al más antiguo
+    ranked = (
+        db.query(
+            base.c.id,
+            base.c.supermercado_id,
+            base.c.precio_base,
+            func.row_number().over(
+                partition_by=base.c.supermercado_id,
+                order_by=base.c.id.desc(),
+            ).label("rn"),
+        )
+        .subquery()
+    )
+    rows = (
+        db.query(
+            ranked.c.supermercado_id,
+            models.Supermercado.nombre,
+            func.count(ranked.c.precio_base).label("count"),
+            func.min(ranked.c.precio_base).label("min"),
+            func.max(ranked.c.precio_base).label("max"),
+            func.avg(ranked.c.precio_base).label("avg"),
+            func.max(case((ranked.c.rn == 1, ranked.c.precio_base))).label("last"),
+            func.max(ranked.c.id).label("last_id"),
+        )
+        .join(models.Supermercado, ranked.c.supermercado_id == models.Supermercado.id)
+        .group_by(ranked.c.supermercado_id, models.Supermercado.nombre)
+        .order_by(func.avg(ranked.c.precio_base))
+        .all()
+    )
+    if not rows:
+        return {"producto_id": prod_id}
 
-        # Semilla de Marcas
-        if not db.query(models.Marca).first():
-            marcas = ["Hacendado", "Carrefour", "Nestlé", "Coca-Cola", "Danone", "Pascual", "Fairy", "Ariel"]
-            for m in marcas:
-                db.add(models.Marca(nombre=m))
-            db.commit()
-    except Exception as e:
-        print(f"Error seeding data: {e}")
-    finally:
-        db.close()
+    total = sum(r.count for r in rows)
+    mas_barato = min(rows, key=lambda r: r.min)
+    ultimo = max(rows, key=lambda r: r.last_id)
+    return {
+        "producto_id": prod_id,
+        "count": total,
+        "min": mas_barato.min,
+        "min_supermercado": mas_barato.nombre,
+        "avg": sum(r.avg * r.count for r in rows) / total,
+        "last": ultimo.last,
+        "last_supermercado": ultimo.nombre,
+        "mejor_opcion": rows[0].nombre,
+        "supermercados": [
+            {
+                "supermercado_id": r.supermercado_id,
+                "supermercado": r.nombre,
+                "count": r.count,
+                "min": r.min,
+                "max": r.max,
+                "avg": r.avg,
+                "last": r.last,
+            }
+            for r in rows
+        ],
+    }
+
+# --- Cesta de la compra ---
+@app.post("/baskets/optimize", response_model=schemas.CestaResultado)
+@con_sesion
+def optimizar_cesta(cesta_req: schemas.CestaRequest, db: Session = Depends(get_db)):
+    # Una consulta a precios_ultimos; el resto se resuelve en memoria
+    return cesta.optimizar(db, [(i.producto_id, i.cantidad) for i in cesta_req.items], cesta_req.max_supermercados)
 
 app.mount("/", StaticFiles(directory="frontend", html=True), name="frontend")
@@ -0,0 +1,175 @@
+"""Métricas por petición: latencia por ruta, número de consultas SQL y tiempo en BD.
+
+MetricsMiddleware abre un contador por petición (en un ContextVar, que se propaga
+al threadpool y a run_sync) y los eventos de SQLAlchemy le suman cada consulta.
+Al enviar las cabeceras se añade Server-Timing y se registran los histogramas,
+que GET /metrics expone en formato de texto de Prometheus.
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Mount
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class EstadisticasPeticion:
+    __slots__ = ("consultas", "tiempo_db", "scope")
+
+    def __init__(self, scope=None):
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.scope = scope
+
+    @property
+    def ruta(self) -> Optional[str]:
+        return _ruta(self.scope) if self.scope is not None else None
+
+
+_peticion: ContextVar[Optional[EstadisticasPeticion]] = ContextVar("peticion_metricas", default=None)
+
+
+def peticion_actual() -> Optional[EstadisticasPeticion]:
+    return _peticion.get()
+
+
+# --- Eventos de SQLAlchemy (todos los engines, síncronos y asíncronos) ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metricas_inicio"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info.pop("metricas_inicio", None)
+    stats = _peticion.get()
+    if stats is not None and inicio is not None:
+        stats.consultas += 1
+        stats.tiempo_db += time.perf_counter() - inicio
+
+
+# --- Histogramas ---
+class Histograma:
+    def __init__(self, nombre: str, ayuda: str, buckets, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self.etiquetas = etiquetas
+        self._series = {}  # valores de etiquetas -> [cuentas por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *etiquetas: str):
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def exponer(self) -> list:
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for valores, serie in series:
+            base = ",".join(f'{e}="{_escapar(v)}"' for e, v in zip(self.etiquetas, valores))
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, serie):
+                acumulado += cuenta
+                lineas.append(f'{self.nombre}_bucket{{{base},le="{limite}"}} {acumulado}')
+            lineas.append(f'{self.nombre}_bucket{{{base},le="+Inf"}} {serie[-1]}')
+            lineas.append(f"{self.nombre}_sum{{{base}}} {serie[-2]}")
+            lineas.append(f"{self.nombre}_count{{{base}}} {serie[-1]}")
+        return lineas
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+latencia = Histograma(
+    "http_request_duration_seconds", "Latencia de las peticiones HTTP hasta enviar las cabeceras.",
+    BUCKETS_LATENCIA, ("method", "route", "status"),
+)
+consultas = Histograma(
+    "db_queries_per_request", "Consultas SQL emitidas por petición.",
+    BUCKETS_CONSULTAS, ("method", "route"),
+)
+tiempo_db = Histograma(
+    "db_time_per_request_seconds", "Tiempo en la base de datos por petición.",
+    BUCKETS_LATENCIA, ("method", "route"),
+)
+HISTOGRAMAS = (latencia, consultas, tiempo_db)
+
+
+def exponer() -> str:
+    return "\n".join(linea for h in HISTOGRAMAS for linea in h.exponer()) + "\n"
+
+
+def reiniciar():
+    for h in HISTOGRAMAS:
+        h.reiniciar()
+
+
+def _ruta(scope) -> str:
+    # Plantilla de la ruta (/precios/{precio_id}), no la URL: mantiene acotadas las series
+    route = scope.get("route")
+    if route is None:
+        return "<sin ruta>"
+    if isinstance(route, Mount):
+        return f"{route.path}/*"
+    return route.path
+
+
+# --- Middleware ---
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = EstadisticasPeticion(scope)
+        token = _peticion.set(stats)
+        inicio = time.perf_counter()
+
+        async def send_con_metricas(message):
+            if message["type"] == "http.response.start":
+                duracion = time.perf_counter() - inicio
+                ruta, metodo, status = _ruta(scope), scope["method"], message["status"]
+                latencia.observar(duracion, metodo, ruta, str(status))
+                consultas.observar(stats.consultas, metodo, ruta)
+                tiempo_db.observar(stats.tiempo_db, metodo, ruta)
+                cabecera = (
+                    f"app;dur={duracion * 1000:.1f}, "
+                    f'db;dur={stats.tiempo_db * 1000:.1f};desc="{stats.consultas} queries"'
+                )
+                message["headers"] = [*message.get("headers", []), (b"server-timing", cabecera.encode())]
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("petición", extra={
+                        "method": metodo, "route": ruta, "status": status,
+                        "ms": round(duracion * 1000, 1), "queries": stats.consultas,
+                        "db_ms": round(stats.tiempo_db * 1000, 1),
+                    })
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_con_metricas)
+        finally:
+            _peticion.reset(token)
@@ -0,0 +1,115 @@
+"""Creación del esquema y datos semilla, fuera del arranque de la app.
+
+Se ejecuta una sola vez por despliegue (start.sh o un release command):
+
+    python -m backend.migrate
+
+Es idempotente: create_all solo crea las tablas que faltan, las columnas e índices
+nuevos se añaden a las tablas existentes (las columnas, siempre anulables), las migraciones de datos solo tocan
+las filas pendientes y cada catálogo se siembra con un único INSERT multi-fila
+únicamente si está vacío. Así los workers de la API arrancan sin DDL ni escrituras
+y no compiten entre sí.
+"""
+from sqlalchemy import DateTime, inspect, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import cesta, models, unidades, versiones
+
+SEMILLAS = {
+    models.Unidad: ["kg", "g", "L", "ml", "ud", "pack"],
+    models.Categoria: ["Bebidas", "Lácteos", "Despensa", "Carnicería", "Frutería", "Limpieza", "Higiene", "Ofertas", "Bio"],
+    models.Supermercado: ["Mercadona", "Carrefour", "Lidl", "Aldi", "Dia", "Eroski", "Alcampo", "Hipercor"],
+    models.Marca: ["Hacendado", "Carrefour", "Nestlé", "Coca-Cola", "Danone", "Pascual", "Fairy", "Ariel"],
+}
+
+
+def crear_esquema(engine: Engine):
+    # Nota: create_all no migra cambios en tablas existentes, solo crea las que faltan
+    models.Base.metadata.create_all(bind=engine)
+
+
+def crear_columnas(engine: Engine) -> list:
+    """Añade a las tablas existentes las columnas nuevas del modelo. Devuelve "tabla.columna"."""
+    nuevas = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for tabla in models.Base.metadata.sorted_tables:
+            existentes = {c["name"] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                tipo = columna.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {columna.name} {tipo}"))
+                nuevas.append(f"{tabla.name}.{columna.name}")
+    return nuevas
+
+
+# Índices que ya no están en el modelo: cubiertos por otros, solo encarecían las altas
+INDICES_OBSOLETOS = ("ix_precios_producto_fecha", "ix_precios_supermercado_fecha", "ix_precios_producto_precio_base")
+
+
+def crear_indices(engine: Engine):
+    # create_all no añade índices a tablas que ya existían
+    with engine.begin() as conn:
+        for tabla in models.Base.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.create(conn, checkfirst=True)
+        for nombre in INDICES_OBSOLETOS:
+            conn.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
+
+
+def migrar_fecha(engine: Engine) -> int:
+    """precios.fecha pasa de texto ISO 8601 (con 'T') a timestamp. Devuelve las filas convertidas."""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # SQLite no cambia el tipo declarado (afinidad de texto), pero DateTime guarda
+            # 'YYYY-MM-DD HH:MM:SS.ffffff' y no sabe leer el separador 'T'
+            return conn.execute(text(
+                "UPDATE precios SET fecha = replace(fecha, 'T', ' ') WHERE fecha LIKE '%T%'"
+            )).rowcount
+        columna = next(c for c in inspect(conn).get_columns("precios") if c["name"] == "fecha")
+        if isinstance(columna["type"], DateTime):
+            return 0
+        filas = conn.scalar(text("SELECT count(*) FROM precios"))
+        conn.execute(text(
+            "ALTER TABLE precios ALTER COLUMN fecha TYPE TIMESTAMP USING NULLIF(fecha, '')::timestamp"
+        ))
+        return filas
+
+
+def sembrar(db: Session) -> dict:
+    """Inserta los catálogos base en las tablas vacías. Devuelve {tabla: filas insertadas}."""
+    insertadas = {}
+    for modelo, nombres in SEMILLAS.items():
+        if db.scalar(select(modelo.id).limit(1)) is not None:
+            continue
+        db.execute(insert(modelo), [{"nombre": n} for n in nombres])
+        insertadas[modelo.__tablename__] = len(nombres)
+    if insertadas:
+        versiones.bump(db, *insertadas)
+    db.commit()
+    return insertadas
+
+
+def migrar(engine: Engine) -> dict:
+    crear_esquema(engine)
+    crear_columnas(engine)
+    migrar_fecha(engine)
+    crear_indices(engine)
+    with Session(engine) as db:
+        insertadas = sembrar(db)
+    # precio_base de las filas anteriores a la columna; sin pendientes es una consulta por tabla
+    unidades.rellenar(engine)
+    with Session(engine) as db:
+        # Tabla nueva sobre datos existentes: se llena una vez desde precios
+        if db.scalar(select(models.PrecioUltimo.producto_id).limit(1)) is None:
+            cesta.reconstruir(db)
+        return insertadas
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    insertadas = migrar(engine)
+    print(f"Esquema al día; semillas: {insertadas or 'nada que insertar'}")
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, Table
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Boolean, Table, Index, Date, DateTime, UniqueConstraint
 from datetime import datetime
 
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateTable
 from .database import Base
 
 # Tabla de relación muchos-a-muchos entre Productos y Marcas
@@ -52,6 +54,9 @@ class Unidad(Base):
     __tablename__ = "unidades"
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String, unique=True, index=True) # kg, g, L, ml, ud, etc.
+    # Equivalencia con la unidad base comparable: 1 g = 0.001 kg (ver unidades.py)
+    base = Column(String, nullable=True)
+    factor = Column(Float, nullable=True)
     productos = relationship("Producto", secondary=producto_unidad, back_populates="unidades")
 
 class Producto(Base):
@@ -75,15 +80,114 @@ class Precio(Base):
     unidad = Column(String) # Mantenemos el string por ahora para evitar romper histórico de precios si no queremos migrar todo, o podríamos usar FK a Unidad. Dada la petición, parece que Unidad es más una restricción para Producto.
     precio_total = Column(Float)
     precio_unidad = Column(Float)
+    # Unidades por pack (6 x 330 ml) y precio por unidad base (kg, L, ud) para comparar
+    tamano_pack = Column(Integer, nullable=True)
+    unidad_base = Column(String, nullable=True)
+    precio_base = Column(Float, nullable=True)
     
     es_oferta = Column(Boolean, default=False)
     tipo_oferta = Column(String, nullable=True)
-    fecha = Column(String)
+    fecha = Column(DateTime)
 
     producto_rel = relationship("Producto", back_populates="precios")
     marca_rel = relationship("Marca", back_populates="precios")
     supermercado_rel = relationship("Supermercado", back_populates="precios")
 
+    # Cada alta mantiene todos estos índices: solo los que sirven a alguna consulta
+    __table_args__ = (
+        # Paginación por cursor (id desc) con cada filtro; el de producto sirve también el
+        # histórico, las estadísticas y la exportación de un producto
+        Index("ix_precios_producto_id_id", "producto_id", "id"),
+        Index("ix_precios_supermercado_id_id", "supermercado_id", "id"),
+        Index("ix_precios_marca_id_id", "marca_id", "id"),
+        Index("ix_precios_es_oferta_id", "es_oferta", "id"),
+        # Rangos de fechas sin otro filtro y corte del job de archivo
+        Index("ix_precios_fecha", "fecha"),
+        # Producto + supermercado (+ fechas): histórico filtrado, rollup.recalcular y precios_ultimos
+        Index("ix_precios_producto_supermercado_fecha", "producto_id", "supermercado_id", "fecha"),
+    )
+
+# Registros en bruto antiguos, movidos desde precios por el job de archivo.py.
+# En Postgres es una tabla particionada por mes de fecha (la PK debe incluir la
+# clave de partición); en SQLite es una tabla normal con los mismos índices.
+class PrecioArchivo(Base):
+    __tablename__ = "precios_archivo"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    fecha = Column(DateTime, primary_key=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"))
+    marca_id = Column(Integer, ForeignKey("marcas.id"))
+    supermercado_id = Column(Integer, ForeignKey("supermercados.id"))
+
+    cantidad = Column(Float)
+    unidad = Column(String)
+    precio_total = Column(Float)
+    precio_unidad = Column(Float)
+    tamano_pack = Column(Integer, nullable=True)
+    unidad_base = Column(String, nullable=True)
+    precio_base = Column(Float, nullable=True)
+
+    es_oferta = Column(Boolean, default=False)
+    tipo_oferta = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_precios_archivo_producto_id_id", "producto_id", "id"),
+        Index("ix_precios_archivo_supermercado_id_id", "supermercado_id", "id"),
+        Index("ix_precios_archivo_producto_fecha", "producto_id", "fecha"),
+        Index("ix_precios_archivo_fecha", "fecha"),
+        {"info": {"particion": "RANGE (fecha)"}},
+    )
+
+# PARTITION BY solo en Postgres. Se añade al compilar el CREATE TABLE en vez de usar
+# postgresql_partition_by, que obligaría a importar el dialecto de Postgres al arrancar
+@compiles(CreateTable, "postgresql")
+def _create_table_particionada(element, compiler, **kw):
+    sql = compiler.visit_create_table(element, **kw)
+    particion = element.element.info.get("particion")
+    return f"{sql.rstrip()} PARTITION BY {particion}\n\n" if particion else sql
+
+# Agregado diario de precio_unidad por producto x marca x supermercado.
+# Se mantiene incrementalmente desde los endpoints de escritura (ver rollup.py)
+class PrecioDiario(Base):
+    __tablename__ = "precios_diarios"
+    id = Column(Integer, primary_key=True, index=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    marca_id = Column(Integer, ForeignKey("marcas.id"), nullable=False)
+    supermercado_id = Column(Integer, ForeignKey("supermercados.id"), nullable=False)
+    dia = Column(Date, nullable=False)
+
+    precio_min = Column(Float, nullable=False)
+    precio_max = Column(Float, nullable=False)
+    precio_sum = Column(Float, nullable=False)
+    num_registros = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("producto_id", "marca_id", "supermercado_id", "dia", name="uq_precios_diarios_clave"),
+        Index("ix_precios_diarios_producto_dia", "producto_id", "dia"),
+    )
+
+# Último precio conocido de cada producto en cada supermercado (ver cesta.py).
+# Se mantiene desde los endpoints de escritura, como precios_diarios
+class PrecioUltimo(Base):
+    __tablename__ = "precios_ultimos"
+    producto_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    supermercado_id = Column(Integer, ForeignKey("supermercados.id"), primary_key=True)
+    marca_id = Column(Integer, ForeignKey("marcas.id"))
+    cantidad = Column(Float)
+    unidad = Column(String)
+    precio_total = Column(Float)
+    unidad_base = Column(String)
+    precio_base = Column(Float)
+    es_oferta = Column(Boolean, default=False)
+    fecha = Column(DateTime)
+
+# Contador de versión por tabla, incrementado en cada escritura (ver versiones.py).
+# Sirve para generar ETag/Last-Modified sin ejecutar la consulta del listado
+class TablaVersion(Base):
+    __tablename__ = "tabla_versiones"
+    tabla = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    actualizado = Column(String, nullable=False)
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -93,3 +197,15 @@ class User(Base):
     role = Column(String, default="user")
     created_at = Column(String, default=lambda: datetime.now().isoformat())
 
+
+# Regla de alerta de un usuario sobre un producto (opcionalmente en un supermercado):
+# salta cuando precio_base cruza a <= precio_max o, con oferta, cuando el precio pasa a ser oferta
+class AlertaRegla(Base):
+    __tablename__ = "alertas"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False, index=True)
+    supermercado_id = Column(Integer, ForeignKey("supermercados.id"), nullable=True)
+    precio_max = Column(Float, nullable=True)
+    oferta = Column(Boolean, default=False, nullable=False)
+    creada = Column(DateTime, default=datetime.now)
@@ -0,0 +1,212 @@
+"""Mantenimiento del agregado diario de precios (tabla precios_diarios).
+
+Se agrega precio_base (precio por kg, L o ud, ver unidades.py), comparable entre
+formatos del mismo producto.
+
+Las altas se suman incrementalmente con un UPSERT; las modificaciones y borrados
+recalculan solo la clave (producto, marca, supermercado, día) afectada, ya que el
+mínimo y el máximo no se pueden "restar".
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Date, func, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models, versiones
+
+AGRUPACIONES = ("dia", "semana", "mes")
+
+
+def dia_de(fecha: datetime) -> date:
+    return fecha.date()
+
+
+def clave(precio: models.Precio):
+    return (precio.producto_id, precio.marca_id, precio.supermercado_id, dia_de(precio.fecha))
+
+
+def _es_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def registrar(db: Session, filas):
+    """Suma al agregado una o varias altas de precio (dicts o models.Precio) en la transacción actual.
+
+    Las filas se agregan primero por clave, de modo que un lote grande se traduce en un
+    único UPSERT ejecutado con executemany.
+    """
+    agregados = {}
+    for f in filas:
+        if isinstance(f, models.Precio):
+            f = {c: getattr(f, c) for c in ("producto_id", "marca_id", "supermercado_id", "precio_base", "fecha")}
+        v = f["precio_base"]
+        if v is None:
+            # Sin precio comparable (cantidad no positiva): fuera del agregado, como en reconstruir
+            continue
+        k = (f["producto_id"], f["marca_id"], f["supermercado_id"], dia_de(f["fecha"]))
+        a = agregados.get(k)
+        if a is None:
+            agregados[k] = [v, v, v, 1]
+        else:
+            a[0] = min(a[0], v)
+            a[1] = max(a[1], v)
+            a[2] += v
+            a[3] += 1
+    if not agregados:
+        return
+
+    if _es_postgres(db):
+        from sqlalchemy.dialects.postgresql import insert
+        menor, mayor = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        menor, mayor = func.min, func.max
+    tabla = models.PrecioDiario.__table__
+    stmt = insert(tabla)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["producto_id", "marca_id", "supermercado_id", "dia"],
+        set_={
+            "precio_min": menor(tabla.c.precio_min, stmt.excluded.precio_min),
+            "precio_max": mayor(tabla.c.precio_max, stmt.excluded.precio_max),
+            "precio_sum": tabla.c.precio_sum + stmt.excluded.precio_sum,
+            "num_registros": tabla.c.num_registros + stmt.excluded.num_registros,
+        },
+    )
+    db.execute(stmt, [
+        {
+            "producto_id": k[0], "marca_id": k[1], "supermercado_id": k[2], "dia": k[3],
+            "precio_min": a[0], "precio_max": a[1], "precio_sum": a[2], "num_registros": a[3],
+        }
+        for k, a in agregados.items()
+    ])
+
+
+def recalcular(db: Session, claves):
+    """Recalcula desde precios las claves (producto, marca, supermercado, día) indicadas."""
+    for producto_id, marca_id, supermercado_id, dia in set(claves):
+        filtro_clave = (
+            models.PrecioDiario.producto_id == producto_id,
+            models.PrecioDiario.marca_id == marca_id,
+            models.PrecioDiario.supermercado_id == supermercado_id,
+            models.PrecioDiario.dia == dia,
+        )
+        db.query(models.PrecioDiario).filter(*filtro_clave).delete(synchronize_session=False)
+        agg = (
+            db.query(
+                func.min(models.Precio.precio_base),
+                func.max(models.Precio.precio_base),
+                func.sum(models.Precio.precio_base),
+                func.count(models.Precio.precio_base),
+            )
+            .filter(
+                models.Precio.producto_id == producto_id,
+                models.Precio.marca_id == marca_id,
+                models.Precio.supermercado_id == supermercado_id,
+                models.Precio.fecha >= datetime.combine(dia, time()),
+                models.Precio.fecha < datetime.combine(dia + timedelta(days=1), time()),
+            )
+            .one()
+        )
+        if agg[3]:
+            db.add(models.PrecioDiario(
+                producto_id=producto_id, marca_id=marca_id, supermercado_id=supermercado_id, dia=dia,
+                precio_min=agg[0], precio_max=agg[1], precio_sum=agg[2], num_registros=agg[3],
+            ))
+
+
+def reconstruir(db: Session):
+    """Regenera el agregado a partir de los registros en bruto (precios y precios_archivo).
+
+    Los días anteriores a la fila en bruto más antigua ya fueron compactados por
+    archivo.compactar y solo existen en el agregado: se conservan.
+    """
+    fuente = union_all(*(
+        select(m.id, m.producto_id, m.marca_id, m.supermercado_id, m.precio_base, m.fecha)
+        .where(m.fecha.isnot(None), m.precio_base.isnot(None))
+        for m in (models.Precio, models.PrecioArchivo)
+    )).subquery()
+    primera = db.scalar(select(func.min(fuente.c.fecha)))
+    if primera is None:
+        return 0
+    db.query(models.PrecioDiario).filter(models.PrecioDiario.dia >= primera.date()).delete(synchronize_session=False)
+    # date() existe en SQLite y Postgres; type_ convierte el resultado a date en ambos
+    dia = func.date(fuente.c.fecha, type_=Date)
+    rows = (
+        db.query(
+            fuente.c.producto_id,
+            fuente.c.marca_id,
+            fuente.c.supermercado_id,
+            dia,
+            func.min(fuente.c.precio_base),
+            func.max(fuente.c.precio_base),
+            func.sum(fuente.c.precio_base),
+            func.count(fuente.c.id),
+        )
+        .group_by(fuente.c.producto_id, fuente.c.marca_id, fuente.c.supermercado_id, dia)
+        .all()
+    )
+    db.bulk_insert_mappings(models.PrecioDiario, [
+        {
+            "producto_id": r[0], "marca_id": r[1], "supermercado_id": r[2], "dia": r[3],
+            "precio_min": r[4], "precio_max": r[5], "precio_sum": r[6], "num_registros": r[7],
+        }
+        for r in rows
+    ])
+    # Las series se sirven con ETag de la versión de precios: sin esto seguirían dando 304
+    versiones.bump(db, "precios")
+    db.commit()
+    return len(rows)
+
+
+def _bucket(db: Session, agrupacion: str):
+    dia = models.PrecioDiario.dia
+    if agrupacion == "dia":
+        return dia
+    if _es_postgres(db):
+        return func.date(func.date_trunc("week" if agrupacion == "semana" else "month", dia))
+    if agrupacion == "semana":
+        # Lunes de la semana que contiene el día
+        return func.date(dia, "-6 days", "weekday 1")
+    return func.date(dia, "start of month")
+
+
+def serie(db: Session, producto_id: int, agrupacion: str = "dia", supermercado_id=None, marca_id=None, desde=None, hasta=None):
+    """Serie temporal min/max/media por supermercado servida desde el agregado diario."""
+    bucket = _bucket(db, agrupacion).label("fecha")
+    query = (
+        db.query(
+            bucket,
+            models.PrecioDiario.supermercado_id,
+            models.Supermercado.nombre.label("supermercado"),
+            func.min(models.PrecioDiario.precio_min).label("min"),
+            func.max(models.PrecioDiario.precio_max).label("max"),
+            (func.sum(models.PrecioDiario.precio_sum) / func.sum(models.PrecioDiario.num_registros)).label("avg"),
+            func.sum(models.PrecioDiario.num_registros).label("count"),
+        )
+        .join(models.Supermercado, models.PrecioDiario.supermercado_id == models.Supermercado.id)
+        .filter(models.PrecioDiario.producto_id == producto_id)
+    )
+    if supermercado_id is not None:
+        query = query.filter(models.PrecioDiario.supermercado_id == supermercado_id)
+    if marca_id is not None:
+        query = query.filter(models.PrecioDiario.marca_id == marca_id)
+    if desde is not None:
+        query = query.filter(models.PrecioDiario.dia >= desde)
+    if hasta is not None:
+        query = query.filter(models.PrecioDiario.dia <= hasta)
+    rows = (
+        query.group_by(bucket, models.PrecioDiario.supermercado_id, models.Supermercado.nombre)
+        .order_by(bucket, models.PrecioDiario.supermercado_id)
+        .all()
+    )
+    return [{**r._asdict(), "fecha": str(r.fecha)} for r in rows]
+
+
+if __name__ == "__main__":
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"precios_diarios: {reconstruir(db)} filas")
+    finally:
+        db.close()
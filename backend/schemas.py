@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
+from datetime import datetime
 
 # --- Categoria ---
 class CategoriaBase(BaseModel):
@@ -25,10 +26,15 @@ class Marca(MarcaBase):
 class UnidadBase(BaseModel):
     nombre: str
 
-class UnidadCreate(UnidadBase): pass
+class UnidadCreate(UnidadBase):
+    # Sin base se deduce del nombre (g -> kg, ml -> L...); ver unidades.py
+    base: Optional[str] = None
+    factor: Optional[float] = Field(None, gt=0)
 
 class Unidad(UnidadBase):
     id: int
+    base: Optional[str] = None
+    factor: Optional[float] = None
     class Config: from_attributes = True
 
 # --- Producto ---
@@ -47,6 +53,17 @@ class Producto(ProductoBase):
     marcas: List[Marca] = []
     class Config: from_attributes = True
 
+# Producto con referencias por id en lugar de objetos anidados
+class ProductoCompacto(ProductoBase):
+    id: int
+    categoria_ids: List[int] = []
+    unidad_ids: List[int] = []
+    marca_ids: List[int] = []
+
+class ProductoBusqueda(ProductoBase):
+    id: int
+    score: float
+
 # --- Supermercado ---
 class SupermercadoBase(BaseModel):
     nombre: str
@@ -57,14 +74,23 @@ class Supermercado(SupermercadoBase):
     id: int
     class Config: from_attributes = True
 
+# --- Catálogo completo en una sola respuesta ---
+class CatalogBootstrap(BaseModel):
+    categorias: List[Categoria]
+    marcas: List[Marca]
+    unidades: List[Unidad]
+    supermercados: List[Supermercado]
+    productos: List[ProductoCompacto]
+
 # --- Precio ---
 class PrecioCreate(BaseModel):
     producto_id: int
     marca_id: int
     supermercado_id: int
-    cantidad: float
+    cantidad: float = Field(..., gt=0)
     unidad: str
     precio_total: float
+    tamano_pack: Optional[int] = Field(None, gt=0) # Unidades por pack: 6 x 0.33 L
     es_oferta: bool = False
     tipo_oferta: Optional[str] = None
 
@@ -72,9 +98,10 @@ class PrecioUpdate(BaseModel):
     producto_id: Optional[int] = None
     marca_id: Optional[int] = None
     supermercado_id: Optional[int] = None
-    cantidad: Optional[float] = None
+    cantidad: Optional[float] = Field(None, gt=0)
     unidad: Optional[str] = None
     precio_total: Optional[float] = None
+    tamano_pack: Optional[int] = Field(None, gt=0)
     es_oferta: Optional[bool] = None
     tipo_oferta: Optional[str] = None
 
@@ -91,9 +118,105 @@ class PrecioDisplay(BaseModel):
     unidad: str
     precio_total: float
     precio_unidad: float
+    tamano_pack: Optional[int] = None
+    unidad_base: Optional[str] = None
+    precio_base: Optional[float] = None # precio_total por unidad base (kg, L, ud)
     es_oferta: bool
     tipo_oferta: Optional[str] = None
-    fecha: str
+    fecha: datetime
+
+class BulkError(BaseModel):
+    fila: int # Posición (desde 0) en el array o línea NDJSON
+    error: str
+
+class BulkResultado(BaseModel):
+    insertados: int
+    errores: List[BulkError] = []
+
+class PrecioFiltros(BaseModel):
+    supermercado_id: Optional[int] = None
+    marca_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+    es_oferta: Optional[bool] = None
+    desde: Optional[datetime] = None
+    hasta: Optional[datetime] = None
+
+class PrecioStatsSupermercado(BaseModel):
+    supermercado_id: int
+    supermercado: str
+    count: int
+    min: float
+    max: float
+    avg: float
+    last: float
+
+class PrecioStats(BaseModel):
+    producto_id: int
+    count: int = 0
+    min: Optional[float] = None
+    min_supermercado: Optional[str] = None
+    avg: Optional[float] = None
+    last: Optional[float] = None
+    last_supermercado: Optional[str] = None
+    mejor_opcion: Optional[str] = None # Supermercado con menor precio medio
+    supermercados: List[PrecioStatsSupermercado] = []
+
+class SeriePunto(BaseModel):
+    fecha: str # Inicio del intervalo (día, lunes de la semana o día 1 del mes)
+    supermercado_id: int
+    supermercado: str
+    min: float
+    max: float
+    avg: float
+    count: int
+
+# --- Alertas ---
+class AlertaCreate(BaseModel):
+    producto_id: int
+    supermercado_id: Optional[int] = None # None: cualquier supermercado
+    precio_max: Optional[float] = None # Salta si precio_base (por kg, L o ud) <= precio_max
+    oferta: bool = False # Salta si el precio es oferta
+
+    @model_validator(mode="after")
+    def con_condicion(self):
+        if self.precio_max is None and not self.oferta:
+            raise ValueError("Indica precio_max, oferta o ambos")
+        return self
+
+class Alerta(AlertaCreate):
+    id: int
+    user_id: int
+    creada: datetime
+    class Config: from_attributes = True
+
+# --- Cesta ---
+class CestaItem(BaseModel):
+    producto_id: int
+    cantidad: float = Field(1, gt=0) # En la unidad base del producto: kg, L o ud
+
+class CestaRequest(BaseModel):
+    items: List[CestaItem] = Field(min_length=1, max_length=500)
+    max_supermercados: int = Field(2, ge=1, le=5)
+
+class CestaLinea(BaseModel):
+    producto_id: int
+    supermercado_id: int
+    cantidad: float
+    unidad_base: Optional[str] = None
+    precio_base: float
+    subtotal: float
+
+class CestaOpcion(BaseModel):
+    supermercado_ids: List[int]
+    total: float
+    lineas: List[CestaLinea]
+    faltan: List[int] = [] # Productos sin precio en estos supermercados
+
+class CestaResultado(BaseModel):
+    un_supermercado: Optional[CestaOpcion] = None
+    reparto: Optional[CestaOpcion] = None
+    exacto: bool # False si el reparto se buscó de forma aproximada
+    faltan: List[int] = [] # Productos sin precio en ningún supermercado
 
 # Relaciones (obsoletas si usamos ProductoCreate con IDs, pero las mantengo por si acaso)
 class LinkProductoMarca(BaseModel):
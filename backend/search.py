@@ -0,0 +1,176 @@
+"""Índice de búsqueda de productos en memoria.
+
+Normaliza los nombres (minúsculas, sin acentos) y mantiene tres estructuras:
+
+- una lista ordenada de nombres, para coincidencias por prefijo con bisect;
+- una lista ordenada de los sufijos que empiezan en cada palabra, para
+  coincidencias al inicio de cualquier palabra;
+- un índice invertido de trigramas, para "contiene" en mitad de palabra y para la
+  búsqueda aproximada (tolera erratas) cuando no hay coincidencia literal.
+
+Los resultados se ordenan por nivel (prefijo, palabra, contiene, aproximado) y
+alfabéticamente dentro de cada nivel, de modo que los dos primeros niveles se
+resuelven en O(log n + k).
+
+El índice guarda la versión de la tabla productos (ver versiones.py) con la que
+está construido. Si otro worker modifica productos, la versión deja de coincidir
+y el índice se reconstruye en la siguiente búsqueda.
+"""
+import bisect
+import heapq
+import math
+import threading
+import unicodedata
+from collections import Counter
+from typing import Optional
+
+N = 3
+# Fracción mínima de trigramas de la consulta presentes en el nombre (búsqueda aproximada)
+SIMILITUD_MINIMA = 0.5
+SCORES = (1.0, 0.9, 0.8)
+
+
+def normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.split())
+
+
+def trigramas(texto: str, relleno: bool = True) -> set:
+    if relleno:
+        texto = f"  {texto} "
+    return {texto[i:i + N] for i in range(len(texto) - N + 1)}
+
+
+def _palabras(norm: str):
+    # Sufijos que empiezan en la segunda palabra y siguientes
+    return [norm[i + 1:] for i, c in enumerate(norm) if c == " "]
+
+
+def _con_prefijo(lista, prefijo: str):
+    i = bisect.bisect_left(lista, (prefijo,))
+    while i < len(lista) and lista[i][0].startswith(prefijo):
+        yield lista[i][1]
+        i += 1
+
+
+class ProductoIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nombres = {}      # id -> nombre original
+        self._normal = {}       # id -> nombre normalizado
+        self._postings = {}     # trigrama -> set(ids)
+        self._orden = []        # [(nombre normalizado, id)] ordenada
+        self._orden_palabras = []  # [(sufijo desde una palabra, id)] ordenada
+        self.version: Optional[int] = None
+
+    def __len__(self):
+        return len(self._nombres)
+
+    def construir(self, productos, version: Optional[int]):
+        with self._lock:
+            self._nombres, self._normal, self._postings = {}, {}, {}
+            self._orden, self._orden_palabras = [], []
+            for producto_id, nombre in productos:
+                norm = self._registrar(producto_id, nombre)
+                self._orden.append((norm, producto_id))
+                self._orden_palabras.extend((p, producto_id) for p in _palabras(norm))
+            self._orden.sort()
+            self._orden_palabras.sort()
+            self.version = version
+
+    def _registrar(self, producto_id: int, nombre: str) -> str:
+        norm = normalizar(nombre)
+        self._nombres[producto_id] = nombre
+        self._normal[producto_id] = norm
+        for g in trigramas(norm):
+            self._postings.setdefault(g, set()).add(producto_id)
+        return norm
+
+    def _add(self, producto_id: int, nombre: str):
+        norm = self._registrar(producto_id, nombre)
+        bisect.insort(self._orden, (norm, producto_id))
+        for p in _palabras(norm):
+            bisect.insort(self._orden_palabras, (p, producto_id))
+
+    def _remove(self, producto_id: int):
+        norm = self._normal.pop(producto_id, None)
+        self._nombres.pop(producto_id, None)
+        if norm is None:
+            return
+        for g in trigramas(norm):
+            ids = self._postings.get(g)
+            if ids is not None:
+                ids.discard(producto_id)
+                if not ids:
+                    del self._postings[g]
+        for lista, clave in [(self._orden, norm)] + [(self._orden_palabras, p) for p in _palabras(norm)]:
+            i = bisect.bisect_left(lista, (clave, producto_id))
+            if i < len(lista) and lista[i] == (clave, producto_id):
+                del lista[i]
+
+    def aplicar(self, version_nueva: int, add=(), remove=()):
+        """Aplica un cambio local si el índice estaba al día con la versión anterior."""
+        with self._lock:
+            if self.version != version_nueva - 1:
+                # Nos perdimos cambios de otro worker: reconstruir en la próxima búsqueda
+                self.version = None
+                return
+            for producto_id in remove:
+                self._remove(producto_id)
+            for producto_id, nombre in add:
+                self._add(producto_id, nombre)
+            self.version = version_nueva
+
+    def _contiene(self, consulta: str, excluir: set):
+        # Las consultas de 1-2 caracteres solo buscan por prefijo de nombre o palabra
+        if len(consulta) < N:
+            return []
+        listas = sorted((self._postings.get(g, set()) for g in trigramas(consulta, relleno=False)), key=len)
+        candidatos = set(listas[0])
+        for ids in listas[1:]:
+            if not candidatos:
+                break
+            candidatos &= ids
+        return [i for i in candidatos if i not in excluir and consulta in self._normal[i]]
+
+    def _aproximada(self, consulta: str, k: int):
+        grams = trigramas(consulta)
+        minimo = math.ceil(len(grams) * SIMILITUD_MINIMA)
+        # Filtro por prefijo: quien comparta >= minimo trigramas comparte al menos
+        # uno de los (len - minimo + 1) más raros, así que solo miramos esas listas
+        raros = sorted(grams, key=lambda g: len(self._postings.get(g, ())))[: len(grams) - minimo + 1]
+        candidatos = set()
+        for g in raros:
+            candidatos.update(self._postings.get(g, ()))
+        comunes = Counter()
+        for g in grams:
+            comunes.update(candidatos & self._postings.get(g, set()))
+        puntuados = [(-c, self._normal[i], i) for i, c in comunes.items() if c >= minimo]
+        mejores = heapq.nsmallest(k, puntuados)
+        return [(i, self._nombres[i], round(-c / len(grams), 3)) for c, _, i in mejores]
+
+    def buscar(self, texto: str, k: int = 10):
+        """Devuelve hasta k tuplas (id, nombre, score) ordenadas por relevancia."""
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+        with self._lock:
+            resultados, vistos = [], set()
+            for nivel, lista in enumerate((self._orden, self._orden_palabras)):
+                for i in _con_prefijo(lista, consulta):
+                    if i in vistos:
+                        continue
+                    vistos.add(i)
+                    resultados.append((i, self._nombres[i], SCORES[nivel]))
+                    if len(resultados) == k:
+                        return resultados
+
+            resto = heapq.nsmallest(k - len(resultados), self._contiene(consulta, vistos), key=self._normal.__getitem__)
+            resultados += [(i, self._nombres[i], SCORES[2]) for i in resto]
+            if resultados:
+                return resultados
+            return self._aproximada(consulta, k)
+
+
+indice_productos = ProductoIndex()
@@ -0,0 +1,135 @@
+"""Registro de consultas lentas (opt-in con DB_SLOW_QUERY_MS).
+
+Se engancha a los eventos de cursor del engine: cada sentencia que supera el
+umbral se guarda con sus parámetros, la ruta que la emitió y su plan (EXPLAIN
+QUERY PLAN en SQLite, EXPLAIN en Postgres, sin ejecutar de nuevo la consulta).
+Las últimas entradas se consultan en GET /admin/slow-queries y, con
+DB_SLOW_QUERY_FILE, se añaden además a un fichero JSONL para analizarlas offline.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+MAX_PARAMETROS = 500
+EXPLICABLES = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+def _plan(conn, statement: str, parameters) -> list:
+    dialecto = conn.dialect.name
+    if dialecto == "sqlite":
+        prefijo = "EXPLAIN QUERY PLAN "
+    elif dialecto == "postgresql":
+        prefijo = "EXPLAIN "
+    else:
+        return []
+    # Cursor DBAPI aparte: no pasa por los eventos ni altera el resultado en curso
+    cursor = conn.connection.cursor()
+    # En Postgres un EXPLAIN fallido aborta la transacción de la petición: se aísla en un
+    # SAVEPOINT y, si falla, se vuelve a él para que las sentencias siguientes sigan valiendo
+    savepoint = dialecto == "postgresql"
+    try:
+        if savepoint:
+            cursor.execute("SAVEPOINT slowlog_explain")
+        try:
+            cursor.execute(prefijo + statement, parameters)
+            # SQLite devuelve (id, parent, notused, detalle); Postgres una sola columna de texto
+            plan = [str(fila[-1]) for fila in cursor.fetchall()]
+        except Exception:
+            if savepoint:
+                cursor.execute("ROLLBACK TO SAVEPOINT slowlog_explain")
+            raise
+        if savepoint:
+            cursor.execute("RELEASE SAVEPOINT slowlog_explain")
+        return plan
+    finally:
+        cursor.close()
+
+
+class SlowQueryLog:
+    def __init__(self, umbral_ms: float = 100, max_entradas: int = 200, fichero: Optional[str] = None):
+        self.umbral_ms = umbral_ms
+        self.fichero = fichero
+        self._entradas = deque(maxlen=max_entradas)
+        self._lock = threading.Lock()
+
+    # --- Enganche al engine ---
+    def activar(self, engine: Engine):
+        event.listen(engine, "before_cursor_execute", self._antes)
+        event.listen(engine, "after_cursor_execute", self._despues)
+
+    def desactivar(self, engine: Engine):
+        event.remove(engine, "before_cursor_execute", self._antes)
+        event.remove(engine, "after_cursor_execute", self._despues)
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["slowlog_inicio"] = time.perf_counter()
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info.pop("slowlog_inicio", None)
+        if inicio is None:
+            return
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        if duracion_ms < self.umbral_ms:
+            return
+
+        stats = metrics.peticion_actual()
+        entrada = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "ms": round(duracion_ms, 2),
+            "route": stats.ruta if stats else None,
+            "statement": statement,
+            "parameters": repr(parameters)[:MAX_PARAMETROS],
+            "executemany": executemany,
+            "plan": [],
+        }
+        if not executemany and statement.lstrip().upper().startswith(EXPLICABLES):
+            try:
+                entrada["plan"] = _plan(conn, statement, parameters)
+            except Exception as e:
+                entrada["plan_error"] = str(e)
+        self._registrar(entrada)
+
+    def _registrar(self, entrada: dict):
+        with self._lock:
+            self._entradas.append(entrada)
+            if self.fichero:
+                try:
+                    with open(self.fichero, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entrada, ensure_ascii=False, default=str) + "\n")
+                except OSError:
+                    logger.warning("No se pudo escribir el log de consultas lentas", exc_info=True)
+        logger.info("Consulta lenta", extra={"ms": entrada["ms"], "route": entrada["route"]})
+
+    # --- Consulta ---
+    def entradas(self, route: Optional[str] = None) -> list:
+        with self._lock:
+            entradas = list(self._entradas)
+        if route:
+            entradas = [e for e in entradas if e["route"] == route]
+        return sorted(entradas, key=lambda e: e["ms"], reverse=True)
+
+    def volcar(self, path: str) -> int:
+        entradas = self.entradas()
+        with open(path, "w", encoding="utf-8") as f:
+            for e in entradas:
+                f.write(json.dumps(e, ensure_ascii=False, default=str) + "\n")
+        return len(entradas)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+# Instancia del proceso; solo se engancha al engine si DB_SLOW_QUERY_MS está definido
+slow_queries = SlowQueryLog()
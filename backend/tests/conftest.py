@@ -1,20 +1,18 @@
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 
 from backend.database import Base
 from backend.main import app, get_db
+from backend.cache import catalog_cache
+from backend.search import indice_productos
+from backend import alertas, archivo, models, unidades
+from backend.auth import claims_cache
+from backend.tests.helpers import engine
 
-# Use an in-memory SQLite database for testing
-SQLALCHEMY_DATABASE_URL = "sqlite://"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
-)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 @pytest.fixture(scope="function")
@@ -30,7 +28,17 @@ def db_session():
         Base.metadata.drop_all(bind=engine)
 
 @pytest.fixture(scope="function")
-def client(db_session):
+def estado_limpio():
+    # Cachés e índices en memoria son globales al proceso: cada test (síncrono o async) parte de cero
+    catalog_cache.clear()
+    indice_productos.construir([], version=None)
+    archivo._fecha_maxima.clear()
+    claims_cache.clear()
+    alertas.indice_reglas.construir([], version=None)
+    unidades.conversor.construir([], version=None)
+
+@pytest.fixture(scope="function")
+def client(db_session, estado_limpio):
     def override_get_db():
         try:
             yield db_session
@@ -41,3 +49,29 @@ def client(db_session):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+@pytest.fixture(scope="function")
+def query_counter():
+    # Cuenta las sentencias SQL emitidas contra el engine de test
+    counter = {"count": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+@pytest.fixture(scope="function")
+def catalogo(db_session):
+    # Catálogo mínimo para tests de precios: tres productos, una marca, tres supermercados
+    productos = [models.Producto(nombre=n) for n in ("Leche", "Pan", "Café")]
+    marca = models.Marca(nombre="Pascual")
+    supermercados = [models.Supermercado(nombre=n) for n in ("Mercadona", "Lidl", "Dia")]
+    db_session.add_all([*productos, marca, *supermercados])
+    db_session.commit()
+    return SimpleNamespace(
+        productos=[p.id for p in productos], marca=marca.id, supermercados=[s.id for s in supermercados],
+    )
@@ -0,0 +1,20 @@
+"""Utilidades comunes de los tests; los fixtures están en conftest.py."""
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+# Use an in-memory SQLite database for testing
+SQLALCHEMY_DATABASE_URL = "sqlite://"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+
+
+def precio(producto_id=1, supermercado_id=1, total=1.0, cantidad=1, unidad="L", marca_id=1, **extra):
+    """Cuerpo de POST /precios sobre el catálogo del fixture `catalogo`."""
+    return {
+        "producto_id": producto_id, "marca_id": marca_id, "supermercado_id": supermercado_id,
+        "cantidad": cantidad, "unidad": unidad, "precio_total": total, **extra,
+    }
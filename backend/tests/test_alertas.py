@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from backend import alertas, models
+from backend.auth import create_access_token
+from backend.tests.helpers import precio
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = alertas.MemorySink()
+    monkeypatch.setattr(alertas, "sink", sink)
+    return sink
+
+
+@pytest.fixture
+def headers(db_session, catalogo):
+    user = models.User(email="ana@example.com", name="Ana", role="user")
+    db_session.add(user)
+    db_session.commit()
+    token = create_access_token({"sub": user.email, "id": user.id, "name": "Ana", "role": "user"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_crud_alertas(client, headers):
+    assert client.post("/alertas", json={"producto_id": 1}).status_code == 401
+    assert client.post("/alertas", json={"producto_id": 1}, headers=headers).status_code == 422
+    assert client.post("/alertas", json={"producto_id": 99, "oferta": True}, headers=headers).status_code == 404
+
+    creada = client.post("/alertas", json={"producto_id": 1, "precio_max": 0.9}, headers=headers)
+    assert creada.status_code == 201
+    assert [a["id"] for a in client.get("/alertas", headers=headers).json()] == [creada.json()["id"]]
+
+    assert client.delete(f"/alertas/{creada.json()['id']}", headers=headers).status_code == 200
+    assert client.get("/alertas", headers=headers).json() == []
+
+
+def test_alertas_al_crearprecio(client, headers, sink):
+    client.post("/alertas", json={"producto_id": 1, "precio_max": 0.9}, headers=headers)
+    client.post("/alertas", json={"producto_id": 1, "supermercado_id": 2, "oferta": True}, headers=headers)
+    client.post("/alertas", json={"producto_id": 2, "precio_max": 100}, headers=headers)
+
+    client.post("/precios", json=precio(total=1.0))
+    assert sink.consumir() == []
+    client.post("/precios", json=precio(total=0.8))
+    [n] = sink.consumir()
+    assert (n["motivo"], n["producto_id"], n["precio_unidad"], n["precio_id"]) == ("precio", 1, 0.8, 2)
+    client.post("/precios", json=precio(supermercado_id=1, total=1.0, es_oferta=True))
+    assert sink.consumir() == []
+    client.post("/precios", json=precio(supermercado_id=2, total=1.0, es_oferta=True))
+    assert [n["motivo"] for n in sink.consumir()] == ["oferta"]
+
+    # Borrar la regla cambia la versión y el índice se recarga
+    alerta_id = client.get("/alertas", headers=headers).json()[0]["id"]
+    client.delete(f"/alertas/{alerta_id}", headers=headers)
+    client.post("/precios", json=precio(total=0.5))
+    assert sink.consumir() == []
+
+
+def test_alertas_en_bulk(client, headers, sink):
+    client.post("/alertas", json={"producto_id": 2, "precio_max": 1.5}, headers=headers)
+    filas = [precio(producto_id=1, total=0.1), precio(producto_id=2, total=2.0), precio(producto_id=2, total=1.2)]
+    assert client.post("/precios/bulk", json=filas).json()["insertados"] == 3
+    assert [(n["producto_id"], n["precio_unidad"]) for n in sink.consumir()] == [(2, 1.2)]
+
+
+def test_alertas_por_precio_base(client, headers, sink):
+    # 1,80 €/kg: el paquete de 500 g a 1 € (2 €/kg) no salta aunque su precio_unidad sea 0,002
+    client.post("/alertas", json={"producto_id": 1, "precio_max": 1.8}, headers=headers)
+    client.post("/precios", json=precio(cantidad=500, unidad="g", total=1.0))
+    assert sink.consumir() == []
+    client.post("/precios", json=precio(cantidad=1, unidad="kg", total=1.7))
+    [n] = sink.consumir()
+    assert (n["unidad_base"], n["precio_base"]) == ("kg", 1.7)
+
+
+def test_alertas_solo_al_cruzar_el_umbral(client, headers, sink):
+    client.post("/alertas", json={"producto_id": 1, "precio_max": 1.0, "oferta": True}, headers=headers)
+    client.post("/precios", json=precio(total=0.9))
+    assert [n["motivo"] for n in sink.consumir()] == ["precio"]
+    # Sigue por debajo: no vuelve a avisar, ni en un lote del mismo producto
+    client.post("/precios", json=precio(total=0.8))
+    client.post("/precios/bulk", json=[precio(total=0.7), precio(total=0.6)])
+    assert sink.consumir() == []
+    # Sube y vuelve a bajar: avisa una vez dentro del lote; en otro supermercado es otra clave
+    client.post("/precios/bulk", json=[precio(total=1.5), precio(total=0.9), precio(total=0.8),
+                                       precio(supermercado_id=2, total=0.5)])
+    assert [(n["supermercado_id"], n["precio_unidad"]) for n in sink.consumir()] == [(1, 0.9), (2, 0.5)]
+    # Pasar a oferta avisa una vez
+    client.post("/precios", json=precio(total=2.0, es_oferta=True))
+    client.post("/precios", json=precio(total=2.0, es_oferta=True))
+    assert [n["motivo"] for n in sink.consumir()] == ["oferta"]
+
+
+def test_indice_solo_mira_reglas_del_producto():
+    indice = alertas.IndiceReglas()
+    indice.construir([alertas.Regla(i, 1, i % 100, None, 1.0, False) for i in range(1000)], version=1)
+    assert len(indice) == 1000
+    assert {r.producto_id for r in indice.reglas(7)} == {7} and len(indice.reglas(7)) == 10
+    assert indice.reglas(1000) == ()
+
+
+def test_file_sink(tmp_path):
+    path = tmp_path / "alertas.jsonl"
+    sink = alertas.FileSink(str(path))
+    sink.enviar([{"regla_id": 1}, {"regla_id": 2}])
+    assert [json.loads(l)["regla_id"] for l in path.read_text().splitlines()] == [1, 2]
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, update
+
+from backend import archivo, models, rollup
+from backend.tests.helpers import engine, precio
+
+
+def _crear_precios(client, db_session, dias_antiguedad):
+    for total in (1.0, 2.0, 3.0):
+        client.post("/precios", json=precio(total=total))
+    # Los dos primeros pasan a ser antiguos (también en el agregado diario)
+    antigua = datetime.now() - timedelta(days=dias_antiguedad)
+    db_session.execute(update(models.Precio).where(models.Precio.id <= 2).values(fecha=antigua))
+    db_session.commit()
+    rollup.reconstruir(db_session)
+
+def test_archivar_y_enrutar(client, db_session, catalogo):
+    _crear_precios(client, db_session, 200)
+    assert archivo.archivar(engine, dias=90) == 2
+    assert db_session.query(models.Precio).count() == 1
+
+    sentencias = []
+
+    def registrar(conn, cursor, statement, *args):
+        sentencias.append(statement)
+
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        # Sin filtro de fecha la página se completa con el archivo, en orden de id
+        assert [p["id"] for p in client.get("/precios").json()] == [3, 2, 1]
+        assert [p["id"] for p in client.get("/precios/producto/1", params={"limit": 2}).json()] == [3, 2]
+
+        # Un rango reciente solo toca la tabla caliente
+        sentencias.clear()
+        desde = (datetime.now() - timedelta(days=7)).isoformat()
+        assert [p["id"] for p in client.get("/precios", params={"desde": desde}).json()] == [3]
+        assert not any("precios_archivo" in s for s in sentencias)
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+
+    assert client.get("/precios/1").json()["precio_total"] == 1.0
+    assert client.put("/precios/1", json={"precio_total": 9.0}).status_code == 409
+    assert client.get("/precios/producto/1/stats").json()["count"] == 3
+    assert len(client.get("/precios/export").text.splitlines()) == 4
+
+def test_filtro_fecha_con_zona(client, db_session, catalogo):
+    _crear_precios(client, db_session, 200)
+    archivo.archivar(engine, dias=90)
+    # Fechas con zona (Z, +02:00) frente a la fecha máxima del archivo, guardada sin zona
+    for desde in ("2024-01-01T00:00:00Z", (datetime.now() - timedelta(days=7)).astimezone().isoformat()):
+        for ruta in ("/precios", "/precios/producto/1", "/precios/export"):
+            assert client.get(ruta, params={"desde": desde}).status_code == 200
+    assert [p["id"] for p in client.get("/precios", params={"desde": "2024-01-01T00:00:00Z"}).json()] == [3, 2, 1]
+    hasta = (datetime.now() - timedelta(days=7)).astimezone().isoformat()
+    assert [p["id"] for p in client.get("/precios", params={"hasta": hasta}).json()] == [2, 1]
+
+def test_compactar_conserva_agregados(client, db_session, catalogo):
+    _crear_precios(client, db_session, 400)
+    archivo.archivar(engine, dias=90)
+    assert archivo.compactar(engine, dias=365) == 2
+    assert db_session.query(models.PrecioArchivo).count() == 0
+
+    # Sin filas en bruto, la serie sigue saliendo del agregado, también tras reconstruirlo
+    rollup.reconstruir(db_session)
+    serie = client.get("/precios/producto/1/serie").json()
+    assert [p["count"] for p in serie] == [2, 1]
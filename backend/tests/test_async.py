@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from backend.database import Base, async_url
+from backend.main import app, get_db
+
+pytest.importorskip("aiosqlite")
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+@pytest.fixture
+def async_client(tmp_path, estado_limpio):
+    # Mismo esquema que en modo síncrono, pero las peticiones usan AsyncSession (aiosqlite)
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    Base.metadata.create_all(bind=create_engine(url))
+    AsyncTestingSession = async_sessionmaker(create_async_engine(async_url(url), poolclass=NullPool), autoflush=False)
+
+    async def override_get_db():
+        async with AsyncTestingSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+
+def test_async_catalogo_y_precios(async_client):
+    client = async_client
+    assert async_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+    cat = client.post("/catalog/categorias", json={"nombre": "Bebidas"}).json()
+    marca = client.post("/catalog/marcas", json={"nombre": "Font Vella"}).json()
+    sup = client.post("/catalog/supermercados", json={"nombre": "Eroski"}).json()
+    prod = client.post("/catalog/productos", json={"nombre": "Agua mineral", "categoria_ids": [cat["id"]], "marca_ids": [marca["id"]]}).json()
+    assert prod["categorias"] == [cat]
+    client.post(f"/catalog/productos/{prod['id']}/categorias/{cat['id']}")
+
+    precio = {"producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": sup["id"], "cantidad": 6, "unidad": "L", "precio_total": 3.0}
+    assert client.post("/precios", json=precio).status_code == 201
+    assert client.post("/precios/bulk", json=[precio, precio]).json()["insertados"] == 2
+
+    response = client.get("/precios")
+    precios = response.json()
+    assert len(precios) == 3 and precios[0]["categoria"] == "Bebidas"
+    assert client.get("/precios", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get(f"/precios/{precios[0]['id']}").json()["precio_unidad"] == 0.5
+    assert client.get(f"/precios/producto/{prod['id']}/stats").json()["count"] == 3
+    assert client.get(f"/precios/producto/{prod['id']}/serie").json()[0]["count"] == 3
+
+    client.put(f"/precios/{precios[0]['id']}", json={"precio_total": 6.0})
+    client.delete(f"/precios/{precios[1]['id']}")
+    assert client.get(f"/precios/producto/{prod['id']}/stats").json()["count"] == 2
+
+    assert client.get("/catalog/productos").json()[0]["marcas"] == [marca]
+    assert client.get("/catalog/bootstrap").json()["productos"][0]["marca_ids"] == [marca["id"]]
+    assert client.get("/catalog/productos/search", params={"q": "agua"}).json()[0]["id"] == prod["id"]
+    assert len(client.get("/precios/export").text.splitlines()) == 3
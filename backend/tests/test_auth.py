@@ -0,0 +1,64 @@
+import time
+
+import jwt
+
+from backend import auth, models
+from backend.auth import ALGORITHM, SECRET_KEY, ClaimsCache, claims_cache, create_access_token
+
+
+def _token(**claims):
+    return create_access_token({"sub": "ana@example.com", "id": 7, "name": "Ana", "picture": None, "role": "user", **claims})
+
+
+def test_users_me_from_claims_without_queries(client, query_counter):
+    token = _token()
+    query_counter["count"] = 0
+    response = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json() == {"id": 7, "email": "ana@example.com", "name": "Ana", "picture": None, "role": "user"}
+    assert query_counter["count"] == 0
+
+
+def test_claims_cached_per_token(client, monkeypatch):
+    llamadas = []
+    decode = auth.decode_token
+    monkeypatch.setattr(auth, "decode_token", lambda t: llamadas.append(t) or decode(t))
+    headers = {"Authorization": f"Bearer {_token()}"}
+    for _ in range(3):
+        assert client.get("/users/me", headers=headers).status_code == 200
+    assert len(llamadas) == 1
+
+
+def test_invalid_and_expired_tokens(client):
+    assert client.get("/users/me", headers={"Authorization": "Bearer basura"}).status_code == 401
+    caducado = jwt.encode({"sub": "ana@example.com", "exp": int(time.time()) - 10}, SECRET_KEY, algorithm=ALGORITHM)
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {caducado}"}).status_code == 401
+    assert len(claims_cache) == 0
+
+
+def test_cache_lru_and_expiry():
+    cache = ClaimsCache(max_size=2, ttl=60)
+    cache.set("a", {"sub": "a"})
+    cache.set("b", {"sub": "b"})
+    cache.get("a")
+    cache.set("c", {"sub": "c"})
+    assert cache.get("b") is None and cache.get("a") == {"sub": "a"}
+    # La entrada no sobrevive al exp del token
+    cache.set("d", {"sub": "d", "exp": time.time() - 1})
+    assert cache.get("d") is None
+
+
+def test_writes_require_token_when_enabled(client, db_session, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_WRITES", True)
+    assert client.post("/catalog/marcas", json={"nombre": "Sin token"}).status_code == 401
+    headers = {"Authorization": f"Bearer {_token()}"}
+    assert client.post("/catalog/marcas", json={"nombre": "Con token"}, headers=headers).status_code == 200
+    assert client.delete("/precios/1").status_code == 401
+    # Las lecturas siguen abiertas
+    assert client.get("/catalog/marcas").status_code == 200
+    assert db_session.query(models.Marca).count() == 1
+
+
+def test_writes_reject_invalid_token_even_if_optional(client):
+    assert client.post("/catalog/marcas", json={"nombre": "X"}).status_code == 200
+    assert client.post("/catalog/marcas", json={"nombre": "Y"}, headers={"Authorization": "Bearer basura"}).status_code == 401
@@ -53,3 +53,137 @@ def test_link_unlink_categoria(client):
     # Unlink
     response = client.delete(f"/catalog/productos/{prod['id']}/categorias/{cat['id']}")
     assert response.status_code == 200
+
+def test_catalog_cache_hits_e_invalidacion(client):
+    client.post("/catalog/marcas", json={"nombre": "Danone"})
+    assert [m["nombre"] for m in client.get("/catalog/marcas").json()] == ["Danone"]
+    assert [m["nombre"] for m in client.get("/catalog/marcas").json()] == ["Danone"]
+    stats = client.get("/catalog/cache/stats").json()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    # Crear una marca invalida la lista de marcas y la de productos (que las anida)
+    client.get("/catalog/productos")
+    marca = client.post("/catalog/marcas", json={"nombre": "Asturiana"}).json()
+    assert len(client.get("/catalog/marcas").json()) == 2
+    prod = client.post("/catalog/productos", json={"nombre": "Leche", "marca_ids": [marca["id"]]}).json()
+    client.get("/catalog/productos")
+    client.post(f"/catalog/productos/{prod['id']}/marcas/{marca['id']}")
+    client.delete(f"/catalog/marcas/{marca['id']}")
+    assert [m["nombre"] for m in client.get("/catalog/marcas").json()] == ["Danone"]
+    stats = client.get("/catalog/cache/stats").json()
+    assert stats["misses"] == 5
+
+def test_catalog_cache_sqlite_compartida(tmp_path):
+    from backend.cache import CatalogCache, SQLiteBackend
+    path = str(tmp_path / "cache.db")
+    worker_a = CatalogCache(SQLiteBackend(path), ttl=60)
+    worker_b = CatalogCache(SQLiteBackend(path), ttl=60)
+
+    assert worker_a.get_or_set("productos:compact", lambda: b"[1]") == b"[1]"
+    assert worker_b.get_or_set("productos:compact", lambda: b"[2]") == b"[1]"
+    assert (worker_b.hits, worker_b.misses) == (1, 0)
+
+    worker_a.invalidate("productos")
+    assert worker_b.get_or_set("productos:compact", lambda: b"[2]") == b"[2]"
+
+    # TTL <= 0 desactiva la caché
+    desactivada = CatalogCache(SQLiteBackend(path), ttl=0)
+    assert desactivada.get_or_set("marcas", lambda: b"[]") == b"[]"
+    assert desactivada.misses == 0
+
+def test_catalog_cache_memoria_acotada(monkeypatch):
+    from backend.cache import MemoryBackend
+    backend = MemoryBackend(max_entries=3)
+    # Una clave por ETag: las de versiones anteriores caducan y el siguiente set las barre
+    backend.set('marcas:"v1"', b"[]", ttl=-1)
+    backend.set('marcas:"v2"', b"[]", ttl=60)
+    assert len(backend) == 1
+
+    for i in range(3):
+        backend.get('marcas:"v2"')
+        backend.set(f"productos:{i}", b"[]", ttl=60)
+    # Lleno: sale la menos usada, no la última leída
+    assert len(backend) == 3 and backend.get("productos:0") is None
+    assert backend.get('marcas:"v2"') == b"[]"
+
+def test_catalog_etag_304(client, query_counter):
+    client.post("/catalog/supermercados", json={"nombre": "Lidl"})
+    response = client.get("/catalog/supermercados")
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+
+    # Revalidación: 304 sin cuerpo y sin ejecutar el listado (solo la lectura de versiones)
+    query_counter["count"] = 0
+    response = client.get("/catalog/supermercados", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert query_counter["count"] == 1
+
+    # Una escritura cambia el ETag
+    client.post("/catalog/supermercados", json={"nombre": "Aldi"})
+    response = client.get("/catalog/supermercados", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()) == 2
+
+    # Los productos dependen también de las marcas que anidan
+    etag_productos = client.get("/catalog/productos").headers["ETag"]
+    client.post("/catalog/marcas", json={"nombre": "Bimbo"})
+    assert client.get("/catalog/productos", headers={"If-None-Match": etag_productos}).status_code == 200
+
+def test_catalog_bootstrap(client, query_counter):
+    cat = client.post("/catalog/categorias", json={"nombre": "Lácteos"}).json()
+    marca = client.post("/catalog/marcas", json={"nombre": "Danone"}).json()
+    uni = client.post("/catalog/unidades", json={"nombre": "ud"}).json()
+    client.post("/catalog/supermercados", json={"nombre": "Dia"})
+    for nombre in ("Yogur", "Natillas", "Flan"):
+        client.post("/catalog/productos", json={
+            "nombre": nombre, "categoria_ids": [cat["id"]], "marca_ids": [marca["id"]], "unidad_ids": [uni["id"]],
+        })
+    client.post("/catalog/productos", json={"nombre": "Agua"})
+
+    query_counter["count"] = 0
+    data = client.get("/catalog/bootstrap").json()
+    # versiones + 4 tablas simples + productos + relaciones (UNION ALL)
+    assert query_counter["count"] == 7
+    assert [p["nombre"] for p in data["productos"]] == ["Agua", "Flan", "Natillas", "Yogur"]
+    assert data["productos"][0] == {"id": data["productos"][0]["id"], "nombre": "Agua", "categoria_ids": [], "unidad_ids": [], "marca_ids": []}
+    assert data["productos"][1]["categoria_ids"] == [cat["id"]]
+    assert data["productos"][1]["marca_ids"] == [marca["id"]]
+    assert data["productos"][1]["unidad_ids"] == [uni["id"]]
+    assert [s["nombre"] for s in data["supermercados"]] == ["Dia"]
+
+    # Cualquier escritura del catálogo se refleja en el bootstrap
+    client.delete(f"/catalog/productos/{data['productos'][0]['id']}")
+    assert len(client.get("/catalog/bootstrap").json()["productos"]) == 3
+
+def test_productos_selectin_paginacion_y_busqueda(client, query_counter):
+    cat = client.post("/catalog/categorias", json={"nombre": "Despensa"}).json()
+    marca = client.post("/catalog/marcas", json={"nombre": "Gallo"}).json()
+    nombres = ["Pasta Fideos", "Pasta Macarrones", "Pasta_Especial", "Pastel", "Arroz", "Harina"]
+    for nombre in nombres:
+        client.post("/catalog/productos", json={"nombre": nombre, "categoria_ids": [cat["id"]], "marca_ids": [marca["id"]]})
+
+    # Número de consultas constante: versiones + productos + una por relación
+    query_counter["count"] = 0
+    prods = client.get("/catalog/productos").json()
+    assert len(prods) == 6
+    assert prods[0]["categorias"] == [cat]
+    assert query_counter["count"] == 5
+
+    # Búsqueda por prefijo (insensible a mayúsculas y escapando comodines)
+    assert [p["nombre"] for p in client.get("/catalog/productos", params={"q": "pasta"}).json()] == nombres[:3]
+    assert [p["nombre"] for p in client.get("/catalog/productos", params={"q": "Pasta_"}).json()] == ["Pasta_Especial"]
+
+    # Paginación por cursor
+    response = client.get("/catalog/productos", params={"limit": 4, "compact": True})
+    page = response.json()
+    assert [p["nombre"] for p in page] == nombres[:4]
+    assert page[0]["categoria_ids"] == [cat["id"]] and page[0]["marca_ids"] == [marca["id"]]
+    response = client.get("/catalog/productos", params={"limit": 4, "compact": True, "cursor": response.headers["X-Next-Cursor"]})
+    assert [p["nombre"] for p in response.json()] == nombres[4:]
+    assert "X-Next-Cursor" not in response.headers
+
+    compact = client.get("/catalog/productos", params={"compact": True}).json()
+    assert len(compact) == 6 and "categorias" not in compact[0]
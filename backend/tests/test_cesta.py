@@ -0,0 +1,95 @@
+import itertools
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from backend import archivo, cesta, models
+from backend.tests.helpers import engine, precio
+
+
+def test_optimizar_un_supermercado_y_reparto(client, catalogo):
+    (p1, p2, p3), (s1, s2, s3) = catalogo.productos, catalogo.supermercados
+    # s1 lo tiene todo; s2 es más barato en p1 y p2; s3 solo vende p3, muy barato
+    for p, s, total in ((p1, s1, 2.0), (p2, s1, 3.0), (p3, s1, 4.0), (p1, s2, 1.0), (p2, s2, 1.5), (p3, s3, 0.5)):
+        client.post("/precios", json=precio(p, s, total, unidad="ud"))
+    # Solo cuenta el último precio: p3 en s1 baja a 3.5
+    client.post("/precios", json=precio(p3, s1, 3.5, unidad="ud"))
+
+    r = client.post("/baskets/optimize", json={"items": [
+        {"producto_id": p1, "cantidad": 2}, {"producto_id": p2}, {"producto_id": p3},
+    ]}).json()
+    assert r["un_supermercado"]["supermercado_ids"] == [s1]
+    assert (r["un_supermercado"]["total"], r["un_supermercado"]["faltan"]) == (10.5, [])
+    assert r["reparto"]["supermercado_ids"] == [s2, s3]
+    assert r["reparto"]["total"] == 4.0 and r["exacto"]
+    assert {(l["producto_id"], l["supermercado_id"], l["subtotal"]) for l in r["reparto"]["lineas"]} == {
+        (p1, s2, 2.0), (p2, s2, 1.5), (p3, s3, 0.5)}
+
+    solo_uno = client.post("/baskets/optimize", json={"items": [{"producto_id": p1}], "max_supermercados": 1}).json()
+    assert solo_uno["reparto"]["supermercado_ids"] == [s2]
+    assert client.post("/baskets/optimize", json={"items": []}).status_code == 422
+
+
+def test_cesta_usa_precio_base_y_sigue_ediciones(client, db_session, catalogo):
+    (p1, p2, _), (s1, s2, _) = catalogo.productos, catalogo.supermercados
+    client.post("/precios", json=precio(p1, s1, 1.0, cantidad=250, unidad="g"))   # 4 €/kg
+    client.post("/precios", json=precio(p1, s2, 3.0, cantidad=1, unidad="kg"))    # 3 €/kg
+    r = client.post("/baskets/optimize", json={"items": [{"producto_id": p1, "cantidad": 0.5}, {"producto_id": p2}]}).json()
+    assert r["un_supermercado"]["supermercado_ids"] == [s2] and r["un_supermercado"]["total"] == 1.5
+    assert r["faltan"] == [p2] and r["reparto"]["faltan"] == [p2]
+
+    # Editar o borrar el último precio recalcula la clave
+    ultimo = db_session.query(models.Precio).filter_by(supermercado_id=s2).one()
+    client.put(f"/precios/{ultimo.id}", json={"precio_total": 5.0})
+    r = client.post("/baskets/optimize", json={"items": [{"producto_id": p1}]}).json()
+    assert r["un_supermercado"]["supermercado_ids"] == [s1]
+    client.delete(f"/precios/{ultimo.id}")
+    assert db_session.query(models.PrecioUltimo).count() == 1
+
+    client.post("/precios/bulk", json=[precio(p1, s2, t, unidad="kg") for t in (9.0, 2.0)])
+    r = client.post("/baskets/optimize", json={"items": [{"producto_id": p1}]}).json()
+    assert (r["un_supermercado"]["supermercado_ids"], r["un_supermercado"]["total"]) == ([s2], 2.0)
+    assert cesta.reconstruir(db_session) == 2
+
+
+def test_borrar_el_ultimo_vuelve_al_archivado(client, db_session, catalogo):
+    for total in (2.0, 3.0):
+        client.post("/precios", json=precio(total=total, unidad="ud"))
+    db_session.execute(update(models.Precio).where(models.Precio.id == 1).values(fecha=datetime.now() - timedelta(days=200)))
+    db_session.commit()
+    assert archivo.archivar(engine, dias=90) == 1
+
+    # Sin precios en la tabla caliente, el último de la clave es el archivado
+    client.delete("/precios/2")
+    db_session.expire_all()
+    assert db_session.query(models.PrecioUltimo.precio_total).one() == (2.0,)
+    assert cesta.reconstruir(db_session) == 1
+
+
+def test_precio_base_cero_no_gana(client, db_session, catalogo):
+    client.post("/precios", json=precio(1, 1, 2.0, unidad="ud"))
+    # Fila antigua con precio_base 0 (cantidad 0 antes de validarla) en otro supermercado
+    db_session.add(models.Precio(producto_id=1, marca_id=1, supermercado_id=2, cantidad=0, unidad="ud", precio_total=1.0,
+                                 precio_unidad=0, unidad_base="ud", precio_base=0, fecha=datetime.now()))
+    db_session.commit()
+    assert cesta.reconstruir(db_session) == 1
+    r = client.post("/baskets/optimize", json={"items": [{"producto_id": 1}]}).json()
+    assert (r["un_supermercado"]["supermercado_ids"], r["un_supermercado"]["total"]) == ([1], 2.0)
+
+
+def test_reparto_aproximado_cerca_del_exacto(monkeypatch):
+    rnd = random.Random(3)
+    supermercados = list(range(12))
+    costes = {s: {i: rnd.uniform(1, 10) for i in range(40) if rnd.random() < 0.3} for s in supermercados}
+    exacto, es_exacto = cesta._mejor_grupo(supermercados, costes, 40, 3)
+    assert es_exacto
+    # El recorrido en profundidad da lo mismo que puntuar cada grupo por separado
+    todos = [g for k in (1, 2, 3) for g in itertools.combinations(supermercados, k)]
+    puntuar = lambda grupo: sum(cesta._minimos(grupo, costes, 40))
+    assert puntuar(exacto) == min(puntuar(g) for g in todos)
+
+    monkeypatch.setattr(cesta, "REPARTO_EXHAUSTIVO", 0)
+    aproximado, es_exacto = cesta._mejor_grupo(supermercados, costes, 40, 3)
+    assert not es_exacto
+    assert puntuar(aproximado) <= puntuar(exacto) * 1.05
@@ -0,0 +1,17 @@
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.pool import StaticPool
+
+from backend import models
+from benchmarks.datos import generar
+
+
+def test_generador_sintetico():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    fichas = generar(engine, productos=50, supermercados=5, marcas=10, precios=2000, dias=30)
+    assert len(fichas) == 50
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(models.Precio)) == 2000
+        # El agregado diario cuadra con el histórico
+        assert conn.scalar(select(func.sum(models.PrecioDiario.num_registros))) == 2000
+        assert conn.scalar(select(func.max(models.Precio.supermercado_id))) <= 5
+        assert conn.scalar(select(func.min(models.Precio.precio_unidad))) > 0
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import time
+
+from backend import feed
+from backend.main import stream_precios
+from backend.tests.helpers import precio
+
+
+def test_hub_filtros_y_resync():
+    async def escenario():
+        hub = feed.Hub()
+        todos = hub.suscribir()
+        leche = hub.suscribir(productos=[1])
+        super2 = hub.suscribir(productos=[1, 2], supermercados=[2])
+        hub.publicar({"op": "c", "id": 1, "producto_id": 1, "supermercado_id": 1})
+        hub.publicar({"op": "c", "id": 2, "producto_id": 2, "supermercado_id": 2})
+        await asyncio.sleep(0)
+        assert [e["id"] for e in (await todos.siguiente(0.1), await todos.siguiente(0.1))] == [1, 2]
+        assert (await leche.siguiente(0.1))["id"] == 1 and await leche.siguiente(0.01) is None
+        assert (await super2.siguiente(0.1))["id"] == 2 and await super2.siguiente(0.01) is None
+
+        # Una cola llena se vacía y recibe la orden de resincronizar
+        for i in range(feed.FEED_COLA + 1):
+            hub.publicar({"op": "c", "id": i, "producto_id": 1, "supermercado_id": 1})
+        await asyncio.sleep(0)
+        assert await leche.siguiente(0.1) == feed.RESYNC
+
+        for s in (todos, leche, super2):
+            hub.cancelar(s)
+        assert len(hub) == 0 and not hub._por_producto
+
+    asyncio.run(escenario())
+
+
+def test_websocket_recibe_deltas_filtrados(client, catalogo):
+    with client.websocket_connect("/precios/ws?producto_id=1") as ws:
+        assert client.post("/precios", json=precio(producto_id=2)).status_code == 201
+        assert client.post("/precios", json=precio(producto_id=1, total=3.0)).status_code == 201
+        creado = ws.receive_json()
+        assert creado["op"] == "c" and creado["producto_id"] == 1 and creado["precio_total"] == 3.0
+        assert (creado["unidad_base"], creado["precio_base"]) == ("L", 3.0)
+
+        assert client.put(f"/precios/{creado['id']}", json={"precio_total": 4.0}).status_code == 200
+        assert ws.receive_json()["precio_unidad"] == 4.0
+        # Cambiar de producto: quien sigue el anterior ve un borrado
+        assert client.put(f"/precios/{creado['id']}", json={"producto_id": 2}).status_code == 200
+        assert ws.receive_json() == {"op": "d", "id": creado["id"], "producto_id": 1, "supermercado_id": 1}
+
+        # Al desconectarse el cliente la suscripción se da de baja
+        ws.close()
+        for _ in range(100):
+            if len(feed.hub) == 0:
+                break
+            time.sleep(0.01)
+        assert len(feed.hub) == 0
+
+
+def test_sse_formato(client, db_session):
+    async def escenario():
+        # Una respuesta que nunca empieza a enviarse no deja suscripción
+        await stream_precios(producto_id=[1], supermercado_id=[])
+        assert len(feed.hub) == 0
+
+        respuesta = await stream_precios(producto_id=[1], supermercado_id=[])
+        assert respuesta.media_type == "text/event-stream"
+        eventos = respuesta.body_iterator
+        assert (await anext(eventos)).startswith("retry:")
+        feed.hub.publicar({"op": "d", "id": 5, "producto_id": 1, "supermercado_id": 1})
+        linea = await anext(eventos)
+        assert linea.startswith("data: ") and linea.endswith("\n\n")
+        assert json.loads(linea[6:]) == {"op": "d", "id": 5, "producto_id": 1, "supermercado_id": 1}
+        await eventos.aclose()
+        assert len(feed.hub) == 0
+
+    asyncio.run(escenario())
@@ -0,0 +1,32 @@
+import json
+import logging
+import re
+
+from backend import metrics
+from backend.logs import JsonFormatter
+
+
+def test_server_timing_y_metrics(client, query_counter):
+    metrics.reiniciar()
+    client.post("/catalog/categorias", json={"nombre": "Bebidas"})
+
+    query_counter["count"] = 0
+    response = client.get("/precios/999")
+    assert response.status_code == 404
+    timing = response.headers["Server-Timing"]
+    assert re.match(r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"', timing)
+    assert f'"{query_counter["count"]} queries"' in timing
+
+    texto = client.get("/metrics").text
+    # Las series van por plantilla de ruta, no por URL
+    assert 'http_request_duration_seconds_count{method="GET",route="/precios/{id}",status="404"} 1' in texto
+    assert 'http_request_duration_seconds_count{method="POST",route="/catalog/categorias",status="200"} 1' in texto
+    assert f'db_queries_per_request_sum{{method="GET",route="/precios/{{id}}"}} {query_counter["count"]}' in texto
+    assert "# TYPE db_time_per_request_seconds histogram" in texto
+
+def test_log_json_con_campos_extra():
+    record = logging.LogRecord("backend.main", logging.INFO, __file__, 1, "Usuario creado", (), None)
+    record.user_id = 7
+    assert json.loads(JsonFormatter().format(record)) | {"ts": None} == {
+        "ts": None, "level": "INFO", "logger": "backend.main", "msg": "Usuario creado", "user_id": 7,
+    }
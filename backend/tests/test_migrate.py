@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from backend import models
+from backend.migrate import SEMILLAS, migrar
+from backend.tests.helpers import engine
+
+
+def test_migrar_idempotente():
+    insertadas = migrar(engine)
+    assert insertadas["unidades"] == len(SEMILLAS[models.Unidad])
+    assert set(insertadas) == {"unidades", "categorias", "supermercados", "marcas"}
+
+    # Segunda ejecución: no duplica nada
+    assert migrar(engine) == {}
+    with engine.connect() as conn:
+        assert len(conn.execute(models.Marca.__table__.select()).all()) == len(SEMILLAS[models.Marca])
+    models.Base.metadata.drop_all(bind=engine)
+
+def test_migrar_fecha_texto_a_timestamp():
+    # Esquema anterior: fecha como texto isoformat(), sin el índice compuesto por fecha
+    # y con uno ya retirado del modelo
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_precios_producto_supermercado_fecha"))
+        conn.execute(text("CREATE INDEX ix_precios_producto_fecha ON precios (producto_id, fecha)"))
+        conn.execute(text(
+            "INSERT INTO precios (producto_id, marca_id, supermercado_id, cantidad, unidad, precio_total, precio_unidad, es_oferta, fecha)"
+            " VALUES (1, 1, 1, 1, 'kg', 2.5, 2.5, 0, '2024-03-05T18:30:15.123456')"
+        ))
+
+    migrar(engine)
+    with engine.connect() as conn:
+        assert conn.scalar(models.Precio.__table__.select().with_only_columns(models.Precio.fecha)) == datetime(2024, 3, 5, 18, 30, 15, 123456)
+        indices = {i["name"] for i in inspect(conn).get_indexes("precios")}
+        assert "ix_precios_producto_supermercado_fecha" in indices and "ix_precios_producto_fecha" not in indices
+    models.Base.metadata.drop_all(bind=engine)
@@ -60,3 +60,202 @@ def test_precio_unidad_calculo(client):
     response = client.get("/precios")
     p = response.json()[0]
     assert p["precio_unidad"] == 2.50
+
+def test_listar_precios_query_count_constante(client, query_counter):
+    cats = [client.post("/catalog/categorias", json={"nombre": f"Cat {i}"}).json() for i in range(3)]
+    marca = client.post("/catalog/marcas", json={"nombre": "Pascual"}).json()
+    supers = [client.post("/catalog/supermercados", json={"nombre": f"Super {i}"}).json() for i in range(3)]
+
+    def crear_productos(n, offset):
+        for i in range(n):
+            prod = client.post("/catalog/productos", json={
+                "nombre": f"Producto {offset + i}",
+                "categoria_ids": [c["id"] for c in cats[: (i % 3) + 1]],
+            }).json()
+            for sup in supers:
+                client.post("/precios", json={
+                    "producto_id": prod["id"],
+                    "marca_id": marca["id"],
+                    "supermercado_id": sup["id"],
+                    "cantidad": 1,
+                    "unidad": "L",
+                    "precio_total": 1.0 + i,
+                })
+            yield prod
+
+    prods = list(crear_productos(1, 0))
+    query_counter["count"] = 0
+    assert len(client.get("/precios").json()) == 3
+    pocas = query_counter["count"]
+
+    prods += list(crear_productos(10, 1))
+    query_counter["count"] = 0
+    precios = client.get("/precios").json()
+    assert len(precios) == 33
+    assert query_counter["count"] == pocas <= 2
+
+    # Las categorías agregadas siguen presentes y el historial usa la misma ruta
+    con_tres = [p for p in precios if p["producto_id"] == prods[3]["id"]]
+    assert sorted(con_tres[0]["categoria"].split(", ")) == ["Cat 0", "Cat 1", "Cat 2"]
+    query_counter["count"] = 0
+    assert len(client.get(f"/precios/producto/{prods[5]['id']}").json()) == 3
+    query_counter["count"] = 0
+    assert client.get(f"/precios/{precios[0]['id']}").status_code == 200
+    assert query_counter["count"] <= 2
+
+def test_precio_sin_categoria(client):
+    marca = client.post("/catalog/marcas", json={"nombre": "Danone"}).json()
+    sup = client.post("/catalog/supermercados", json={"nombre": "Dia"}).json()
+    prod = client.post("/catalog/productos", json={"nombre": "Yogur"}).json()
+    client.post("/precios", json={
+        "producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": sup["id"],
+        "cantidad": 4, "unidad": "ud", "precio_total": 2.0,
+    })
+    p = client.get("/precios").json()[0]
+    assert p["categoria"] == "Sin categoría"
+    assert client.get("/precios/999").status_code == 404
+
+def test_precios_paginacion_cursor_y_filtros(client):
+    cat = client.post("/catalog/categorias", json={"nombre": "Bio"}).json()
+    marca = client.post("/catalog/marcas", json={"nombre": "Nestlé"}).json()
+    s1 = client.post("/catalog/supermercados", json={"nombre": "Aldi"}).json()
+    s2 = client.post("/catalog/supermercados", json={"nombre": "Eroski"}).json()
+    bio = client.post("/catalog/productos", json={"nombre": "Leche Bio", "categoria_ids": [cat["id"]]}).json()
+    otro = client.post("/catalog/productos", json={"nombre": "Cacao"}).json()
+    for i in range(5):
+        for prod, sup in ((bio, s1), (otro, s2)):
+            client.post("/precios", json={
+                "producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": sup["id"],
+                "cantidad": 1, "unidad": "L", "precio_total": 1.0 + i, "es_oferta": i % 2 == 0,
+            })
+
+    # Recorrido completo por páginas sin repetir ni perder registros
+    vistos, cursor = [], None
+    while True:
+        params = {"limit": 3}
+        if cursor: params["cursor"] = cursor
+        response = client.get("/precios", params=params)
+        page = response.json()
+        assert len(page) <= 3
+        vistos += [p["id"] for p in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor: break
+    assert len(vistos) == 10
+    assert vistos == sorted(vistos, reverse=True)
+
+    assert {p["supermercado"] for p in client.get("/precios", params={"supermercado_id": s1["id"]}).json()} == {"Aldi"}
+    assert {p["producto"] for p in client.get("/precios", params={"categoria_id": cat["id"]}).json()} == {"Leche Bio"}
+    assert len(client.get("/precios", params={"es_oferta": True}).json()) == 6
+    assert client.get("/precios", params={"desde": "2100-01-01T00:00:00"}).json() == []
+
+    historial = client.get(f"/precios/producto/{bio['id']}", params={"limit": 2, "es_oferta": False})
+    assert len(historial.json()) == 2
+    assert "X-Next-Cursor" not in historial.headers
+
+def test_stats_producto(client):
+    marca = client.post("/catalog/marcas", json={"nombre": "Carrefour"}).json()
+    s1 = client.post("/catalog/supermercados", json={"nombre": "Carrefour"}).json()
+    s2 = client.post("/catalog/supermercados", json={"nombre": "Alcampo"}).json()
+    prod = client.post("/catalog/productos", json={"nombre": "Aceite"}).json()
+    for sup, total in ((s1, 4.0), (s1, 6.0), (s2, 5.0), (s1, 3.0), (s2, 5.5)):
+        client.post("/precios", json={
+            "producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": sup["id"],
+            "cantidad": 1, "unidad": "L", "precio_total": total,
+        })
+
+    stats = client.get(f"/precios/producto/{prod['id']}/stats").json()
+    assert stats["count"] == 5
+    assert stats["min"] == 3.0 and stats["min_supermercado"] == "Carrefour"
+    assert stats["avg"] == 4.7
+    assert stats["last"] == 5.5 and stats["last_supermercado"] == "Alcampo"
+    assert stats["mejor_opcion"] == "Carrefour"
+    por_super = {s["supermercado"]: s for s in stats["supermercados"]}
+    assert por_super["Carrefour"] == {
+        "supermercado_id": s1["id"], "supermercado": "Carrefour",
+        "count": 3, "min": 3.0, "max": 6.0, "avg": 13.0 / 3, "last": 3.0,
+    }
+    assert por_super["Alcampo"]["last"] == 5.5
+
+    vacio = client.get("/precios/producto/999/stats").json()
+    assert vacio["count"] == 0 and vacio["supermercados"] == []
+
+def test_precios_bulk_json_y_ndjson(client):
+    import json
+    marca = client.post("/catalog/marcas", json={"nombre": "Ariel"}).json()
+    sup = client.post("/catalog/supermercados", json={"nombre": "Hipercor"}).json()
+    prod = client.post("/catalog/productos", json={"nombre": "Detergente"}).json()
+    base = {"producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": sup["id"], "unidad": "L"}
+
+    filas = [{**base, "cantidad": 2, "precio_total": 10.0}, {**base, "producto_id": 999, "cantidad": 1, "precio_total": 1.0}, {**base, "cantidad": "x"}]
+    response = client.post("/precios/bulk", json=filas)
+    assert response.status_code == 200
+    resultado = response.json()
+    assert resultado["insertados"] == 1
+    assert [e["fila"] for e in resultado["errores"]] == [1, 2]
+    assert "producto_id" in resultado["errores"][0]["error"]
+
+    ndjson = "\n".join(json.dumps({**base, "cantidad": 1, "precio_total": 1.0 + i}) for i in range(2500)) + "\n{malformado\n"
+    response = client.post("/precios/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    resultado = response.json()
+    assert resultado["insertados"] == 2500
+    assert [e["fila"] for e in resultado["errores"]] == [2500]
+
+    precios = client.get("/precios", params={"limit": 1}).json()
+    assert precios[0]["precio_unidad"] == 2500.0
+    assert client.get(f"/precios/producto/{prod['id']}/stats").json()["count"] == 2501
+    serie = client.get(f"/precios/producto/{prod['id']}/serie").json()
+    assert serie[0]["count"] == 2501
+
+    assert client.post("/precios/bulk", json={"no": "lista"}).status_code == 400
+
+def _crear_precios_export(client, n):
+    marca = client.post("/catalog/marcas", json={"nombre": "Hacendado"}).json()
+    s1 = client.post("/catalog/supermercados", json={"nombre": "Mercadona"}).json()
+    s2 = client.post("/catalog/supermercados", json={"nombre": "Dia"}).json()
+    prod = client.post("/catalog/productos", json={"nombre": "Pan, integral"}).json()
+    filas = [{
+        "producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": (s1 if i % 2 else s2)["id"],
+        "cantidad": 1, "unidad": "ud", "precio_total": 1.0 + i,
+    } for i in range(n)]
+    client.post("/precios/bulk", json=filas)
+    return prod, s1
+
+def test_exportar_precios_csv(client):
+    import csv, io
+    prod, s1 = _crear_precios_export(client, 12000)
+    response = client.get("/precios/export", params={"producto_id": prod["id"], "supermercado_id": s1["id"]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    filas = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(filas) == 6000
+    assert filas[0]["producto"] == "Pan, integral"
+    assert {f["supermercado"] for f in filas} == {"Mercadona"}
+
+def test_exportar_precios_parquet(client):
+    import io
+    import pytest
+    pq = pytest.importorskip("pyarrow.parquet")
+    _crear_precios_export(client, 7000)
+    response = client.get("/precios/export", params={"formato": "parquet"})
+    assert response.status_code == 200
+    tabla = pq.read_table(io.BytesIO(response.content))
+    assert tabla.num_rows == 7000
+    assert tabla.column("precio_unidad").to_pylist()[:2] == [1.0, 2.0]
+
+def test_precios_etag(client):
+    marca = client.post("/catalog/marcas", json={"nombre": "Puleva"}).json()
+    sup = client.post("/catalog/supermercados", json={"nombre": "Lidl"}).json()
+    prod = client.post("/catalog/productos", json={"nombre": "Leche"}).json()
+    precio = {"producto_id": prod["id"], "marca_id": marca["id"], "supermercado_id": sup["id"], "cantidad": 1, "unidad": "L", "precio_total": 1.0}
+    client.post("/precios", json=precio)
+
+    response = client.get("/precios")
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    assert client.get("/precios", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/precios", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(f"/precios/producto/{prod['id']}/stats", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/precios", json=precio)
+    response = client.get("/precios", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
@@ -0,0 +1,45 @@
+from datetime import date, datetime
+
+from backend import models, rollup
+from backend.tests.helpers import precio
+
+
+def test_rollup_incremental(client, db_session, catalogo):
+    for total in (1.0, 3.0, 2.0):
+        client.post("/precios", json=precio(total=total))
+
+    fila = db_session.query(models.PrecioDiario).one()
+    assert (fila.precio_min, fila.precio_max, fila.precio_sum, fila.num_registros) == (1.0, 3.0, 6.0, 3)
+
+    # Modificar y borrar recalculan la clave afectada
+    ids = [p["id"] for p in client.get("/precios").json()]
+    client.put(f"/precios/{ids[1]}", json={"precio_total": 0.5})
+    client.delete(f"/precios/{ids[0]}")
+    db_session.expire_all()
+    fila = db_session.query(models.PrecioDiario).one()
+    assert (fila.precio_min, fila.precio_max, fila.num_registros) == (0.5, 1.0, 2)
+
+    serie = client.get("/precios/producto/1/serie").json()
+    assert serie == [{
+        "fecha": date.today().isoformat(), "supermercado_id": 1, "supermercado": "Mercadona",
+        "min": 0.5, "max": 1.0, "avg": 0.75, "count": 2,
+    }]
+
+def test_serie_agrupada_por_mes(client, db_session, catalogo):
+    for fecha, precio in ((datetime(2024, 1, 3, 10), 2.0), (datetime(2024, 1, 28, 10), 4.0), (datetime(2024, 2, 1, 9), 5.0)):
+        db_session.add(models.Precio(
+            producto_id=1, marca_id=1, supermercado_id=1,
+            cantidad=1, unidad="L", precio_total=precio, precio_unidad=precio, unidad_base="L", precio_base=precio, fecha=fecha,
+        ))
+    db_session.commit()
+    antes = client.get("/precios/producto/1/serie", params={"agrupacion": "mes"})
+    assert rollup.reconstruir(db_session) == 3
+    # El ETag anterior ya no vale tras reconstruir el agregado
+    assert client.get("/precios/producto/1/serie", params={"agrupacion": "mes"},
+                      headers={"If-None-Match": antes.headers["ETag"]}).status_code == 200
+
+    mensual = client.get("/precios/producto/1/serie", params={"agrupacion": "mes"}).json()
+    assert [(p["fecha"], p["avg"], p["count"]) for p in mensual] == [("2024-01-01", 3.0, 2), ("2024-02-01", 5.0, 1)]
+
+    semanal = client.get("/precios/producto/1/serie", params={"agrupacion": "semana"}).json()
+    assert [p["fecha"] for p in semanal] == ["2024-01-01", "2024-01-22", "2024-01-29"]
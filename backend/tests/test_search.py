@@ -0,0 +1,45 @@
+from backend.search import ProductoIndex, normalizar
+
+
+def test_normalizar_sin_acentos():
+    assert normalizar("  Café  con LECHE Ñ ") == "cafe con leche n"
+
+def test_indice_contiene_ranking_y_erratas():
+    indice = ProductoIndex()
+    indice.construir([
+        (1, "Leche entera"), (2, "Café con leche"), (3, "Lechuga iceberg"),
+        (4, "Leche semidesnatada sin lactosa"), (5, "Yogur natural"),
+    ], version=1)
+
+    # Prefijo primero, luego inicio de palabra; alfabético dentro de cada nivel
+    assert [r[0] for r in indice.buscar("LECHE")] == [1, 4, 2]
+    assert [r[0] for r in indice.buscar("cafe")] == [2]
+    assert [r[0] for r in indice.buscar("le", k=2)] == [1, 4]
+    assert indice.buscar("lactosa")[0][0] == 4
+    # Erratas: búsqueda aproximada por trigramas
+    assert indice.buscar("yogurt natual")[0][0] == 5
+    assert indice.buscar("xyz") == []
+
+def test_indice_aplica_cambios_solo_si_esta_al_dia():
+    indice = ProductoIndex()
+    indice.construir([(1, "Arroz")], version=3)
+    indice.aplicar(4, add=[(2, "Arroz integral")])
+    assert indice.version == 4 and len(indice) == 2
+    indice.aplicar(5, remove=[1])
+    assert [r[0] for r in indice.buscar("arroz")] == [2]
+    # Salto de versión: otro worker escribió; queda marcado para reconstruir
+    indice.aplicar(7, add=[(3, "Arroz bomba")])
+    assert indice.version is None
+
+def test_search_endpoint(client):
+    for nombre in ("Aceite de oliva", "Aceitunas rellenas", "Vinagre de Módena"):
+        client.post("/catalog/productos", json={"nombre": nombre})
+    resultados = client.get("/catalog/productos/search", params={"q": "aceit"}).json()
+    assert [r["nombre"] for r in resultados] == ["Aceite de oliva", "Aceitunas rellenas"]
+    assert client.get("/catalog/productos/search", params={"q": "modena"}).json()[0]["nombre"] == "Vinagre de Módena"
+
+    # Alta y baja se reflejan sin reconstruir desde cero
+    nuevo = client.post("/catalog/productos", json={"nombre": "Aceite de girasol"}).json()
+    assert len(client.get("/catalog/productos/search", params={"q": "aceite de"}).json()) == 2
+    client.delete(f"/catalog/productos/{nuevo['id']}")
+    assert [r["nombre"] for r in client.get("/catalog/productos/search", params={"q": "aceite de"}).json()] == ["Aceite de oliva"]
@@ -0,0 +1,47 @@
+import importlib.util
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from backend import database
+
+CONF = Path(__file__).resolve().parents[2] / "gunicorn.conf.py"
+
+
+def _cargar_conf():
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", CONF)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def test_gunicorn_workers(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert _cargar_conf().workers == 3
+
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: {0, 1, 2, 3}, raising=False)
+    assert _cargar_conf().workers == 9
+
+    # Limitado por las conexiones de Postgres: 40 // (5 + 10) = 2 workers
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 5)
+    monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 10)
+    monkeypatch.setenv("DB_MAX_CONNECTIONS", "40")
+    conf = _cargar_conf()
+    assert conf.workers == 2
+    assert conf.worker_class == "uvicorn_worker.UvicornWorker"
+
+def test_reiniciar_pools_tras_fork(monkeypatch, tmp_path):
+    # Engine desechable: el de database.py crearía ./precios.db
+    engine = create_engine(f"sqlite:///{tmp_path / 'fork.db'}", poolclass=QueuePool)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "async_engine", None)
+    with engine.connect():
+        pass
+    pool = engine.pool
+    assert pool.checkedin() == 1
+
+    database.reiniciar_pools()
+    assert engine.pool is not pool
+    assert engine.pool.checkedin() == engine.pool.checkedout() == 0
+    engine.dispose()
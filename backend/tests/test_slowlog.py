@@ -0,0 +1,66 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from backend.main import create_access_token
+from backend.slowlog import _plan, slow_queries
+from backend.tests.helpers import engine
+
+
+@pytest.fixture
+def slowlog(tmp_path):
+    # Umbral 0: se registran todas las consultas del engine de test
+    slow_queries.umbral_ms, slow_queries.fichero = 0, str(tmp_path / "lentas.jsonl")
+    slow_queries.limpiar()
+    slow_queries.activar(engine)
+    yield slow_queries
+    slow_queries.desactivar(engine)
+    slow_queries.umbral_ms, slow_queries.fichero = 100, None
+    slow_queries.limpiar()
+
+def test_slow_queries_con_plan_y_ruta(client, slowlog, monkeypatch, tmp_path):
+    client.get("/precios", params={"supermercado_id": 1})
+
+    admin = {"Authorization": f"Bearer {create_access_token({'sub': 'admin@example.com', 'role': 'admin'})}"}
+    user = {"Authorization": f"Bearer {create_access_token({'sub': 'user@example.com', 'role': 'user'})}"}
+    assert client.get("/admin/slow-queries").status_code == 401
+    assert client.get("/admin/slow-queries", headers=user).status_code == 403
+
+    entradas = client.get("/admin/slow-queries", params={"route": "/precios"}, headers=admin).json()["entradas"]
+    select = next(e for e in entradas if "FROM precios" in e["statement"])
+    assert select["route"] == "/precios"
+    assert "1" in select["parameters"]
+    assert any("precios" in linea for linea in select["plan"])
+
+    # Cada consulta se añade también al fichero JSONL
+    with open(slowlog.fichero) as f:
+        assert any(json.loads(linea)["route"] == "/precios" for linea in f)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("DB_SLOW_QUERY_FILE", raising=False)
+    volcado = client.post("/admin/slow-queries/dump", headers=admin).json()
+    assert volcado["entradas"] == len(slowlog.entradas())
+    assert (tmp_path / volcado["fichero"]).exists()
+
+    assert client.delete("/admin/slow-queries", headers=admin).json() == {"status": "ok"}
+
+
+def test_plan_fallido_no_aborta_la_transaccion_en_postgres():
+    # Cursor DBAPI simulado: el EXPLAIN falla como lo haría en Postgres
+    ejecutadas = []
+
+    class Cursor:
+        def execute(self, sql, parameters=None):
+            ejecutadas.append(sql)
+            if sql.startswith("EXPLAIN"):
+                raise RuntimeError("syntax error")
+
+        def close(self):
+            pass
+
+    conn = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"),
+                           connection=SimpleNamespace(cursor=Cursor))
+    with pytest.raises(RuntimeError):
+        _plan(conn, "SELECT 1", {})
+    assert ejecutadas == ["SAVEPOINT slowlog_explain", "EXPLAIN SELECT 1", "ROLLBACK TO SAVEPOINT slowlog_explain"]
@@ -0,0 +1,21 @@
+import os
+
+from benchmarks.bench_startup import medir
+
+# Presupuesto holgado para no fallar en máquinas lentas; se ajusta con STARTUP_BUDGET_S
+PRESUPUESTO_S = float(os.getenv("STARTUP_BUDGET_S", "5"))
+
+
+def test_arranque_en_frio():
+    medida = medir()
+    # Las dependencias pesadas se cargan en su primer uso, no al importar la app
+    assert medida["cargados"] == []
+    assert medida["import_s"] < PRESUPUESTO_S
+    assert medida["primera_respuesta_s"] < PRESUPUESTO_S
+
+
+def test_oauth_se_configura_en_el_primer_uso():
+    from backend.main import get_oauth
+
+    assert get_oauth() is get_oauth()
+    assert get_oauth().google.client_kwargs == {"scope": "openid email profile"}
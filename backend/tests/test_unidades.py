@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import inspect, insert, text
+
+from backend import models, unidades
+from backend.tests.helpers import engine, precio
+
+
+def _crear(client, **campos):
+    assert client.post("/precios", json=precio(**campos)).status_code == 201
+    return client.get("/precios", params={"limit": 1}).json()[0]
+
+
+def test_precio_base_por_unidad(client, catalogo):
+    gramos = _crear(client, supermercado_id=1, cantidad=500, unidad="g", total=4.0)
+    assert (gramos["unidad_base"], gramos["precio_base"]) == ("kg", 8.0)
+    assert gramos["precio_unidad"] == 0.008
+    kilo = _crear(client, supermercado_id=2, cantidad=1, unidad="kg", total=6.0)
+    assert (kilo["unidad_base"], kilo["precio_base"]) == ("kg", 6.0)
+
+    # Las estadísticas comparan por kg: 1 kg a 6 € es mejor que 500 g a 4 €
+    stats = client.get("/precios/producto/1/stats").json()
+    assert (stats["min"], stats["mejor_opcion"]) == (6.0, "Lidl")
+    assert {p["avg"] for p in client.get("/precios/producto/1/serie").json()} == {6.0, 8.0}
+
+
+def test_packs_y_unidades_del_catalogo(client, catalogo):
+    pack = _crear(client, cantidad=330, unidad="ml", total=3.96, tamano_pack=6)
+    assert pack["unidad_base"] == "L" and pack["precio_base"] == pytest.approx(2.0)
+    assert _crear(client, cantidad=1, unidad="pack", total=3.0, tamano_pack=6)["precio_base"] == 0.5
+
+    docena = client.post("/catalog/unidades", json={"nombre": "docena"}).json()
+    assert (docena["base"], docena["factor"]) == ("ud", 12.0)
+    client.post("/catalog/unidades", json={"nombre": "saco", "base": "kg", "factor": 25})
+    saco = _crear(client, cantidad=2, unidad="saco", total=100.0)
+    assert (saco["unidad_base"], saco["precio_base"]) == ("kg", 2.0)
+
+    # Al editar se vuelve a normalizar
+    client.put(f"/precios/{saco['id']}", json={"unidad": "kg"})
+    assert client.get(f"/precios/{saco['id']}").json()["precio_base"] == 50.0
+
+
+def test_cantidad_no_positiva(client, catalogo):
+    # Un precio_base 0 sería el más barato en todas partes: la API rechaza la fila
+    assert client.post("/precios", json=precio(cantidad=0)).status_code == 422
+    assert client.post("/precios/bulk", json=[precio(cantidad=-1)]).json()["insertados"] == 0
+    creado = _crear(client, total=2.0)
+    assert client.put(f"/precios/{creado['id']}", json={"cantidad": 0}).status_code == 422
+    assert unidades.precio_base(2.0, 0, 1.0) is None
+
+
+def test_rellenar_filas_antiguas(client, db_session, catalogo):
+    fila = {"producto_id": 1, "marca_id": 1, "supermercado_id": 1, "es_oferta": False,
+            "fecha": datetime(2024, 5, 1, 10)}
+    db_session.execute(insert(models.Precio), [
+        {**fila, "cantidad": 250, "unidad": "g", "precio_total": 3.0, "precio_unidad": 0.012},
+        {**fila, "cantidad": 2, "unidad": "L", "precio_total": 3.0, "precio_unidad": 1.5},
+    ])
+    db_session.execute(insert(models.PrecioArchivo), [
+        {**fila, "id": 100, "cantidad": 1, "unidad": "kg", "precio_total": 10.0, "precio_unidad": 10.0},
+    ])
+    db_session.commit()
+
+    assert unidades.rellenar(engine, lote=1) == 3
+    db_session.expire_all()
+    assert [(p.unidad_base, p.precio_base) for p in db_session.query(models.Precio).order_by(models.Precio.id)] == [
+        ("kg", 12.0), ("L", 1.5)]
+    assert db_session.query(models.PrecioArchivo.precio_base).scalar() == 10.0
+    assert db_session.query(models.PrecioDiario).count() == 1
+    assert unidades.rellenar(engine) == 0
+
+
+def test_stats_con_filas_sin_precio_base(client, db_session, catalogo):
+    # Filas escritas antes de la normalización y aún sin rellenar: no cuentan ni rompen las estadísticas
+    fila = {"producto_id": 1, "marca_id": 1, "cantidad": 1, "unidad": "kg", "precio_total": 1.0,
+            "precio_unidad": 1.0, "es_oferta": False, "fecha": datetime(2024, 5, 1, 10)}
+    db_session.execute(insert(models.Precio), [{**fila, "supermercado_id": 1}, {**fila, "supermercado_id": 2}])
+    db_session.commit()
+    vacio = client.get("/precios/producto/1/stats")
+    assert vacio.status_code == 200 and vacio.json()["count"] == 0
+
+    _crear(client, supermercado_id=1, unidad="kg", total=3.0)
+    stats = client.get("/precios/producto/1/stats")
+    assert stats.status_code == 200
+    assert (stats.json()["count"], stats.json()["avg"], stats.json()["last"]) == (1, 3.0, 3.0)
+
+
+def test_migrar_anade_columnas():
+    from backend.migrate import migrar
+
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for columna in ("precio_base", "unidad_base", "tamano_pack"):
+            conn.execute(text(f"ALTER TABLE precios DROP COLUMN {columna}"))
+        conn.execute(text("ALTER TABLE unidades DROP COLUMN factor"))
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO precios (producto_id, marca_id, supermercado_id, cantidad, unidad, precio_total, precio_unidad, es_oferta, fecha)"
+            " VALUES (1, 1, 1, 500, 'g', 2.0, 0.004, 0, '2024-05-01 10:00:00')"
+        ))
+
+    migrar(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT unidad_base, precio_base FROM precios")).one() == ("kg", 4.0)
+        assert {"precio_base", "unidad_base", "tamano_pack"} <= {c["name"] for c in inspect(conn).get_columns("precios")}
+        assert conn.execute(text("SELECT base, factor FROM unidades WHERE nombre = 'g'")).one() == ("kg", 0.001)
+    models.Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,150 @@
+"""Normalización de unidades: precio por unidad base comparable.
+
+Cada unidad del catálogo se expresa como `factor` veces una unidad base (kg, L o
+ud): 500 g son 0,5 kg y un pack de 6 son 6 ud. Al escribir un precio se guardan
+unidad_base y precio_base = precio_total / (cantidad * factor * tamano_pack), así
+estadísticas, series y comparaciones trabajan en SQL sobre una sola columna.
+
+Las unidades sin base en el catálogo usan la tabla UNIDADES_BASE; una unidad
+desconocida es su propia base (factor 1). El mapa se cachea en memoria con la
+versión de la tabla unidades, como el índice de búsqueda.
+
+Sin cantidad positiva no hay precio comparable y precio_base queda a NULL: un 0 sería
+el más barato en estadísticas, series y cestas.
+
+Para las filas anteriores a esta columna, python -m backend.migrate (o por separado
+python -m backend.unidades [--lote 10000]) completa el catálogo, rellena precio_base
+en precios y precios_archivo por lotes y reconstruye precios_diarios y
+precios_ultimos, que dependen de precio_base.
+"""
+import argparse
+import threading
+from typing import Optional
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import cesta, models, rollup, versiones
+
+# nombre normalizado -> (unidad base, factor)
+UNIDADES_BASE = {
+    "kg": ("kg", 1.0), "g": ("kg", 0.001), "mg": ("kg", 0.000001),
+    "l": ("L", 1.0), "ml": ("L", 0.001), "cl": ("L", 0.01),
+    "ud": ("ud", 1.0), "pack": ("ud", 1.0), "docena": ("ud", 12.0),
+}
+LOTE = 10000
+
+
+def _clave(nombre: str) -> str:
+    return (nombre or "").strip().lower()
+
+
+def por_defecto(nombre: str) -> tuple:
+    return UNIDADES_BASE.get(_clave(nombre), (nombre, 1.0))
+
+
+def precio_base(precio_total: float, cantidad: float, factor: float, tamano_pack: Optional[int] = None) -> Optional[float]:
+    cantidad_base = (cantidad or 0) * factor * (tamano_pack or 1)
+    return precio_total / cantidad_base if cantidad_base > 0 else None
+
+
+class Conversor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._unidades = {}
+        self.version = None
+
+    def construir(self, filas, version):
+        unidades = {_clave(n): (b, f) for n, b, f in filas if b and f}
+        with self._lock:
+            self._unidades = unidades
+            self.version = version
+
+    def actualizar(self, db: Session):
+        version = versiones.leida(db, "unidades")
+        if version != self.version:
+            u = models.Unidad
+            self.construir(db.query(u.nombre, u.base, u.factor).all(), version)
+
+    def base(self, nombre: str) -> tuple:
+        return self._unidades.get(_clave(nombre)) or por_defecto(nombre)
+
+
+conversor = Conversor()
+
+
+def normalizar(db: Session, filas):
+    """Rellena unidad_base y precio_base en las filas (dicts o models.Precio) a escribir."""
+    conversor.actualizar(db)
+    for f in filas:
+        es_dict = isinstance(f, dict)
+        leer = f.get if es_dict else lambda c: getattr(f, c)
+        base, factor = conversor.base(leer("unidad"))
+        valores = {
+            "unidad_base": base,
+            "precio_base": precio_base(leer("precio_total"), leer("cantidad"), factor, leer("tamano_pack")),
+        }
+        if es_dict:
+            f.update(valores)
+        else:
+            for c, v in valores.items():
+                setattr(f, c, v)
+
+
+# --- Backfill ---
+def completar_catalogo(db: Session) -> int:
+    """Pone base y factor a las unidades del catálogo que no los tienen. Devuelve cuántas."""
+    pendientes = db.query(models.Unidad).filter(models.Unidad.base.is_(None)).all()
+    for unidad in pendientes:
+        unidad.base, unidad.factor = por_defecto(unidad.nombre)
+    if pendientes:
+        versiones.bump(db, "unidades")
+    db.commit()
+    return len(pendientes)
+
+
+def rellenar(engine: Engine, lote: int = LOTE) -> int:
+    """Calcula precio_base de las filas que no lo tienen, por lotes. Devuelve cuántas."""
+    rellenadas = 0
+    with Session(engine) as db:
+        completar_catalogo(db)
+        conversor.actualizar(db)
+        for modelo in (models.Precio, models.PrecioArchivo):
+            tabla, ultimo = modelo.__table__, 0
+            # executemany de UPDATE por clave primaria: un viaje por lote
+            stmt = (update(tabla).where(tabla.c.id == bindparam("_id"))
+                    .values(unidad_base=bindparam("unidad_base"), precio_base=bindparam("precio_base")))
+            while True:
+                # Avanza por id: cada lote arranca donde acabó el anterior en vez de volver a recorrer lo hecho
+                filas = db.execute(
+                    select(modelo.id, modelo.unidad, modelo.cantidad, modelo.precio_total, modelo.tamano_pack)
+                    .where(modelo.id > ultimo, modelo.precio_base.is_(None)).order_by(modelo.id).limit(lote)
+                ).all()
+                if not filas:
+                    break
+                cambios = []
+                for f in filas:
+                    base, factor = conversor.base(f.unidad)
+                    cambios.append({"_id": f.id, "unidad_base": base,
+                                    "precio_base": precio_base(f.precio_total or 0, f.cantidad, factor, f.tamano_pack)})
+                db.connection().execute(stmt, cambios)
+                db.commit()
+                ultimo = filas[-1].id
+                rellenadas += len(cambios)
+        if rellenadas:
+            versiones.bump(db, "precios")
+            db.commit()
+            rollup.reconstruir(db)
+            cesta.reconstruir(db)
+    return rellenadas
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lote", type=int, default=LOTE)
+    args = parser.parse_args()
+
+    print(f"precio_base: {rellenar(engine, args.lote)} filas normalizadas")
@@ -0,0 +1,79 @@
+"""Versionado por tabla para GET condicionales (ETag / Last-Modified).
+
+Cada escritura llama a bump() dentro de su transacción; los GET leen las versiones
+de las tablas de las que depende su respuesta (una consulta por clave primaria) y
+responden 304 si el cliente ya tiene esa versión.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def bump(db: Session, *tablas: str) -> dict:
+    """Incrementa la versión de cada tabla y devuelve {tabla: nueva versión}."""
+    ahora = datetime.now(timezone.utc).isoformat()
+    for tabla in tablas:
+        actualizadas = (
+            db.query(models.TablaVersion)
+            .filter(models.TablaVersion.tabla == tabla)
+            .update({
+                models.TablaVersion.version: models.TablaVersion.version + 1,
+                models.TablaVersion.actualizado: ahora,
+            }, synchronize_session=False)
+        )
+        if not actualizadas:
+            db.add(models.TablaVersion(tabla=tabla, version=1, actualizado=ahora))
+            db.flush()
+    # Dentro de la transacción la fila está bloqueada: leemos nuestra propia versión
+    return dict(
+        db.query(models.TablaVersion.tabla, models.TablaVersion.version)
+        .filter(models.TablaVersion.tabla.in_(tablas))
+        .all()
+    )
+
+
+def version(db: Session, tabla: str) -> int:
+    return db.query(models.TablaVersion.version).filter(models.TablaVersion.tabla == tabla).scalar() or 0
+
+
+def leida(db: Session, tabla: str) -> int:
+    """Versión ya leída en esta sesión por cabeceras(); si no, se consulta."""
+    leidas = db.info.get("versiones", {})
+    return leidas[tabla] if tabla in leidas else version(db, tabla)
+
+
+def cabeceras(db: Session, tablas) -> dict:
+    filas = db.query(models.TablaVersion).filter(models.TablaVersion.tabla.in_(tablas)).all()
+    versiones = {f.tabla: f for f in filas}
+    # El handler puede reutilizarlas sin otra consulta (ver leida)
+    db.info.setdefault("versiones", {}).update({t: versiones[t].version if t in versiones else 0 for t in tablas})
+    firma = ";".join(f"{t}:{versiones[t].version if t in versiones else 0}" for t in sorted(tablas))
+    headers = {
+        "ETag": '"%s"' % hashlib.sha1(firma.encode()).hexdigest()[:20],
+        # Obliga al navegador a revalidar siempre; la revalidación cuesta un 304 sin cuerpo
+        "Cache-Control": "no-cache",
+    }
+    if filas:
+        ultima = max(datetime.fromisoformat(f.actualizado) for f in filas)
+        headers["Last-Modified"] = format_datetime(ultima.replace(microsecond=0), usegmt=True)
+    return headers
+
+
+def no_modificado(request: Request, headers: dict) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+        return "*" in etags or headers["ETag"] in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
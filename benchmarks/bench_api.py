@@ -0,0 +1,151 @@
+"""Banco de pruebas de la API sobre datos sintéticos.
+
+Uso: python -m benchmarks.bench_api [--database-url sqlite:///bench.db] [--productos 10000]
+         [--supermercados 50] [--precios 500000] [--modo testclient|http|ambos]
+         [--peticiones 500] [--concurrencia 10]
+
+Sin --database-url genera una base SQLite temporal con benchmarks.datos (para
+la escala completa, 5M de precios, conviene generarla una vez con
+`python -m benchmarks.datos` y reutilizarla). Mide GET /precios,
+GET /precios/producto/{id}, GET /catalog/productos y POST /precios en proceso
+(TestClient, secuencial) y por HTTP contra uvicorn (httpx, concurrente), e informa
+de throughput, percentiles de latencia y memoria residente del proceso servidor.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import tempfile
+import time
+
+CASOS = ["GET /precios", "GET /precios/producto/{id}", "GET /catalog/productos", "POST /precios"]
+
+
+def peticiones(n: int, productos: int, supermercados: int, semilla: int = 1):
+    """Lista de (caso, método, ruta, cuerpo) con ids aleatorios pero reproducibles."""
+    rnd = random.Random(semilla)
+    por_caso = {caso: [] for caso in CASOS}
+    for _ in range(n):
+        producto_id = rnd.randint(1, productos)
+        por_caso["GET /precios"].append(("GET", "/precios?limit=100", None))
+        por_caso["GET /precios/producto/{id}"].append(("GET", f"/precios/producto/{producto_id}", None))
+        por_caso["GET /catalog/productos"].append(("GET", f"/catalog/productos?limit=100&cursor={rnd.randint(0, productos)}", None))
+        por_caso["POST /precios"].append(("POST", "/precios", {
+            "producto_id": producto_id, "marca_id": 1, "supermercado_id": rnd.randint(1, supermercados),
+            "cantidad": 1, "unidad": "kg", "precio_total": round(rnd.uniform(0.5, 20), 2),
+        }))
+    return por_caso
+
+
+def percentil(valores, p: float) -> float:
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def rss_mb(pid: str = "self") -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    # Sin /proc (macOS): pico de memoria del propio proceso
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def informe(modo: str, caso: str, latencias: list, total_s: float, memoria: float):
+    latencias.sort()
+    print(f"{modo:<10} {caso:<28} {len(latencias) / total_s:>9.1f} "
+          f"{percentil(latencias, 0.5):>8.1f} {percentil(latencias, 0.95):>8.1f} {percentil(latencias, 0.99):>8.1f} "
+          f"{memoria:>8.1f}")
+
+
+def bench_testclient(lotes: dict):
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    with TestClient(app) as client:
+        for caso, reqs in lotes.items():
+            latencias = []
+            inicio = time.perf_counter()
+            for metodo, ruta, cuerpo in reqs:
+                t = time.perf_counter()
+                r = client.request(metodo, ruta, json=cuerpo)
+                latencias.append((time.perf_counter() - t) * 1000)
+                assert r.status_code < 400, (ruta, r.status_code)
+            informe("testclient", caso, latencias, time.perf_counter() - inicio, rss_mb())
+
+
+async def carga(base_url: str, reqs: list, concurrencia: int):
+    import httpx
+
+    latencias = []
+    cola = asyncio.Queue()
+    for req in reqs:
+        cola.put_nowait(req)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def worker():
+            while not cola.empty():
+                metodo, ruta, cuerpo = cola.get_nowait()
+                t = time.perf_counter()
+                r = await client.request(metodo, ruta, json=cuerpo)
+                latencias.append((time.perf_counter() - t) * 1000)
+                r.raise_for_status()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrencia)))
+    return latencias, time.perf_counter() - inicio
+
+
+def bench_http(lotes: dict, database_url: str, concurrencia: int, puerto: int):
+    from benchmarks.bench_async import arrancar
+
+    proc = arrancar(database_url, os.getenv("DB_ASYNC", "0") == "1", puerto)
+    try:
+        for caso, reqs in lotes.items():
+            latencias, total = asyncio.run(carga(f"http://127.0.0.1:{puerto}", reqs, concurrencia))
+            informe(f"http x{concurrencia}", caso, latencias, total, rss_mb(str(proc.pid)))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url")
+    parser.add_argument("--productos", type=int, default=10000)
+    parser.add_argument("--supermercados", type=int, default=50)
+    parser.add_argument("--precios", type=int, default=500000)
+    parser.add_argument("--modo", choices=["testclient", "http", "ambos"], default="ambos")
+    parser.add_argument("--peticiones", type=int, default=500)
+    parser.add_argument("--concurrencia", type=int, default=10)
+    parser.add_argument("--puerto", type=int, default=8766)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url or f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    # backend.database lee DATABASE_URL al importarse: se fija antes de cargar la app
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.database_url:
+        from sqlalchemy import create_engine
+        from benchmarks.datos import generar
+
+        print(f"Generando datos sintéticos en {database_url}...")
+        generar(create_engine(database_url), productos=args.productos, supermercados=args.supermercados,
+                precios=args.precios, verbose=True)
+
+    lotes = peticiones(args.peticiones, args.productos, args.supermercados)
+    print(f"\n{'modo':<10} {'caso':<28} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>8}")
+    if args.modo in ("testclient", "ambos"):
+        bench_testclient(lotes)
+    if args.modo in ("http", "ambos"):
+        # Mismas rutas pero otros precios nuevos: los POST no repiten los de la pasada anterior
+        bench_http(peticiones(args.peticiones, args.productos, args.supermercados, semilla=2),
+                   database_url, args.concurrencia, args.puerto)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
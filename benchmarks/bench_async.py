@@ -0,0 +1,112 @@
+"""Prueba de carga: escalado con la concurrencia en modo síncrono y asíncrono.
+
+Uso: python -m benchmarks.bench_async [--database-url postgresql://...] [--concurrencia 1 10 50 100]
+
+Arranca uvicorn dos veces (DB_ASYNC=0 y DB_ASYNC=1) contra la misma base de datos
+y lanza peticiones concurrentes con httpx a GET /precios y GET /catalog/productos.
+Con SQLite local la espera de E/S es mínima; el efecto del modo asíncrono se
+aprecia con un Postgres remoto, donde cada consulta espera la red.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+from backend import models
+from backend.database import Base
+
+RUTAS = ["/precios?limit=50", "/catalog/productos?limit=50&compact=true"]
+
+
+def preparar_sqlite(path: str, n_precios: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Marca), [{"nombre": f"Marca {i}"} for i in range(20)])
+        conn.execute(insert(models.Supermercado), [{"nombre": f"Super {i}"} for i in range(10)])
+        conn.execute(insert(models.Producto), [{"nombre": f"Producto {i}"} for i in range(500)])
+        conn.execute(insert(models.Precio), [{
+            "producto_id": i % 500 + 1, "marca_id": i % 20 + 1, "supermercado_id": i % 10 + 1,
+            "cantidad": 1, "unidad": "ud", "precio_total": 1.0 + i % 7, "precio_unidad": 1.0 + i % 7,
+            "unidad_base": "ud", "precio_base": 1.0 + i % 7,
+            "es_oferta": False, "fecha": datetime(2024, 1, i % 28 + 1, 10),
+        } for i in range(n_precios)])
+
+
+async def carga(base_url: str, concurrencia: int, peticiones: int):
+    latencias = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        cola = asyncio.Queue()
+        for i in range(peticiones):
+            cola.put_nowait(RUTAS[i % len(RUTAS)])
+
+        async def worker():
+            while not cola.empty():
+                ruta = cola.get_nowait()
+                t = time.perf_counter()
+                r = await client.get(ruta)
+                r.raise_for_status()
+                latencias.append((time.perf_counter() - t) * 1000)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrencia)))
+        total = time.perf_counter() - inicio
+    latencias.sort()
+    return peticiones / total, statistics.median(latencias), latencias[int(len(latencias) * 0.95) - 1]
+
+
+def arrancar(database_url: str, db_async: bool, puerto: int):
+    env = {**os.environ, "DATABASE_URL": database_url, "DB_ASYNC": "1" if db_async else "0"}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(puerto), "--log-level", "warning"],
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{puerto}/health")
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("uvicorn no arrancó")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url")
+    parser.add_argument("--concurrencia", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--peticiones", type=int, default=1000)
+    parser.add_argument("--precios", type=int, default=20000)
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = args.database_url
+    if not database_url:
+        path = os.path.join(tmp.name, "bench.db")
+        preparar_sqlite(path, args.precios)
+        database_url = f"sqlite:///{path}"
+
+    print(f"{'modo':<8} {'concurrencia':>12} {'req/s':>10} {'p50':>10} {'p95':>10}")
+    for db_async in (False, True):
+        proc = arrancar(database_url, db_async, args.puerto)
+        try:
+            for c in args.concurrencia:
+                rps, p50, p95 = asyncio.run(carga(f"http://127.0.0.1:{args.puerto}", c, args.peticiones))
+                print(f"{'async' if db_async else 'sync':<8} {c:>12} {rps:>10.1f} {p50:>7.1f} ms {p95:>7.1f} ms")
+        finally:
+            proc.terminate()
+            proc.wait()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
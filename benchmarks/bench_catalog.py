@@ -0,0 +1,92 @@
+"""Latencia de GET /catalog/productos con un catálogo grande.
+
+Uso: python -m benchmarks.bench_catalog [--productos 10000] [--repeticiones 5]
+
+Compara la carga perezosa original (una consulta por relación y producto) con el
+listado actual (selectinload), el modo compacto y una página de 100 productos.
+La caché del catálogo se desactiva para medir siempre la consulta.
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend import models, schemas
+from backend.cache import catalog_cache
+from backend.database import Base
+from backend.main import app, get_db
+
+
+def crear_catalogo(session, n_productos: int):
+    session.execute(insert(models.Categoria), [{"nombre": f"Categoria {i}"} for i in range(30)])
+    session.execute(insert(models.Marca), [{"nombre": f"Marca {i}"} for i in range(200)])
+    session.execute(insert(models.Unidad), [{"nombre": u} for u in ("kg", "g", "L", "ml", "ud", "pack")])
+    session.execute(insert(models.Producto), [{"nombre": f"Producto {i:05d}"} for i in range(n_productos)])
+    ids = range(1, n_productos + 1)
+    session.execute(insert(models.producto_categoria), [{"producto_id": i, "categoria_id": i % 30 + 1} for i in ids])
+    session.execute(insert(models.producto_unidad), [{"producto_id": i, "unidad_id": i % 6 + 1} for i in ids])
+    session.execute(insert(models.producto_marca), [
+        {"producto_id": i, "marca_id": m} for i in ids for m in {i % 200 + 1, (i * 7) % 200 + 1}
+    ])
+    session.commit()
+
+
+def medir(nombre, fn, repeticiones, contador):
+    tiempos = []
+    for _ in range(repeticiones):
+        contador["count"] = 0
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    print(f"{nombre:<38} {statistics.median(tiempos):>9.1f} ms {min(tiempos):>9.1f} ms {contador['count']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = Session()
+    crear_catalogo(session, args.productos)
+
+    contador = {"count": 0}
+    event.listen(engine, "before_cursor_execute", lambda *a: contador.__setitem__("count", contador["count"] + 1))
+    app.dependency_overrides[get_db] = lambda: session
+    catalog_cache.ttl = 0
+    client = TestClient(app)
+
+    def perezoso():
+        # Ruta anterior: query(Producto).all() + serialización con cargas perezosas
+        session.expunge_all()
+        TypeAdapter(List[schemas.Producto]).dump_json(
+            TypeAdapter(List[schemas.Producto]).validate_python(session.query(models.Producto).all(), from_attributes=True)
+        )
+
+    def http(params):
+        def fn():
+            session.expunge_all()
+            assert client.get("/catalog/productos", params=params).status_code == 200
+        return fn
+
+    print(f"{args.productos} productos, {args.repeticiones} repeticiones")
+    print(f"{'caso':<38} {'mediana':>12} {'mínimo':>12} {'consultas':>8}")
+    medir("lazy load (anterior, sin HTTP)", perezoso, args.repeticiones, contador)
+    medir("GET /catalog/productos", http({}), args.repeticiones, contador)
+    medir("GET /catalog/productos?compact=true", http({"compact": True}), args.repeticiones, contador)
+    medir("GET /catalog/productos?limit=100", http({"limit": 100}), args.repeticiones, contador)
+    medir("GET /catalog/productos?q=Producto 099", http({"q": "Producto 099", "compact": True}), args.repeticiones, contador)
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
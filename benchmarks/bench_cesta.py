@@ -0,0 +1,66 @@
+"""Latencia de POST /baskets/optimize con cestas grandes.
+
+Uso: python -m benchmarks.bench_cesta [--productos 2000] [--supermercados 50] [--precios 300000]
+         [--items 100] [--repeticiones 50]
+
+Genera datos sintéticos en una SQLite temporal (benchmarks.datos, que también llena
+precios_ultimos) y lanza por TestClient cestas aleatorias de --items productos
+con distintos máximos de supermercados, midiendo la petición completa y solo el
+optimizador (cesta.optimizar).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=2000)
+    parser.add_argument("--supermercados", type=int, default=50)
+    parser.add_argument("--precios", type=int, default=300000)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'cesta.db')}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from fastapi.testclient import TestClient
+
+    from backend import cesta
+    from backend.database import SessionLocal, engine
+    from backend.main import app
+    from benchmarks.datos import generar
+
+    generar(engine, productos=args.productos, supermercados=args.supermercados, precios=args.precios, verbose=True)
+    rnd = random.Random(11)
+    client = TestClient(app)
+
+    print(f"\n{'max supermercados':<18} {'petición p50':>13} {'p95':>8} {'optimizar p50':>14} {'exacto':>7}")
+    for n in (1, 2, 3):
+        peticion, optimizador, exacto = [], [], True
+        for _ in range(args.repeticiones):
+            items = [{"producto_id": p, "cantidad": rnd.choice((0.5, 1, 2))}
+                     for p in rnd.sample(range(1, args.productos + 1), args.items)]
+            t = time.perf_counter()
+            r = client.post("/baskets/optimize", json={"items": items, "max_supermercados": n})
+            peticion.append((time.perf_counter() - t) * 1000)
+            assert r.status_code == 200
+            exacto = exacto and r.json()["exacto"]
+
+            with SessionLocal() as db:
+                t = time.perf_counter()
+                cesta.optimizar(db, [(i["producto_id"], i["cantidad"]) for i in items], n)
+                optimizador.append((time.perf_counter() - t) * 1000)
+        peticion.sort()
+        print(f"{n:<18} {statistics.median(peticion):>10.1f} ms {peticion[int(len(peticion) * 0.95) - 1]:>5.1f} ms "
+              f"{statistics.median(optimizador):>11.1f} ms {str(exacto):>7}")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Planes y latencia de las consultas por fecha con y sin el índice compuesto.
+
+Uso: python -m benchmarks.bench_indices [--productos 2000] [--precios 500000] [--repeticiones 20]
+
+Genera datos sintéticos en una SQLite temporal y lanza por TestClient las rutas
+que filtran por rango de fechas (histórico de un producto, listado de un
+supermercado, producto + supermercado). Mide primero sin el índice
+(producto, supermercado, fecha) y luego con él, mostrando el plan que usa SQLite
+(capturado con el slow-query log). Los rangos de un producto o de un supermercado
+sin el otro filtro usan (producto_id, id) y (supermercado_id, id).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+INDICES = ["ix_precios_producto_supermercado_fecha"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=2000)
+    parser.add_argument("--supermercados", type=int, default=50)
+    parser.add_argument("--precios", type=int, default=500000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    database_url = f"sqlite:///{os.path.join(tmp.name, 'indices.db')}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    from backend import models
+    from backend.database import engine
+    from backend.main import app
+    from backend.slowlog import slow_queries
+    from benchmarks.datos import generar
+
+    fichas = generar(engine, productos=args.productos, supermercados=args.supermercados,
+                     precios=args.precios, verbose=True)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    rnd = random.Random(7)
+    hasta = datetime.now()
+    desde = hasta - timedelta(days=30)
+    rango = {"desde": desde.isoformat(), "hasta": hasta.isoformat()}
+
+    def casos():
+        producto_id = rnd.randint(1, args.productos)
+        supermercado_id = rnd.choice(fichas[producto_id - 1]["supermercados"])
+        return {
+            "histórico producto + fechas": (f"/precios/producto/{producto_id}", rango),
+            "supermercado + fechas": ("/precios", {"supermercado_id": supermercado_id, **rango}),
+            "producto + supermercado + fechas": (f"/precios/producto/{producto_id}", {"supermercado_id": supermercado_id, **rango}),
+        }
+
+    slow_queries.umbral_ms = 0
+    slow_queries.activar(engine)
+    client = TestClient(app)
+
+    def medir(etiqueta):
+        print(f"\n== {etiqueta} ==")
+        muestras = [casos() for _ in range(args.repeticiones)]
+        for nombre in muestras[0]:
+            tiempos = []
+            for muestra in muestras:
+                ruta, params = muestra[nombre]
+                slow_queries.limpiar()
+                t = time.perf_counter()
+                assert client.get(ruta, params=params).status_code == 200
+                tiempos.append((time.perf_counter() - t) * 1000)
+            consulta = max((e for e in slow_queries.entradas() if "FROM precios" in e["statement"]),
+                           key=lambda e: e["ms"])
+            print(f"{nombre:<34} mediana {statistics.median(tiempos):8.2f} ms  p95 "
+                  f"{sorted(tiempos)[int(len(tiempos) * 0.95) - 1]:8.2f} ms")
+            for linea in consulta["plan"]:
+                print(f"    {linea}")
+
+    with engine.begin() as conn:
+        for nombre in INDICES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {nombre}"))
+    medir("sin índice compuesto por fecha")
+
+    with engine.begin() as conn:
+        for indice in models.Precio.__table__.indexes:
+            indice.create(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+    medir("con índice compuesto por fecha")
+    slow_queries.desactivar(engine)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Latencia del índice de búsqueda de productos.
+
+Uso: python -m benchmarks.bench_search [--productos 100000]
+
+Genera nombres sintéticos combinando tipos, variedades y marcas, construye el
+índice y mide búsquedas exactas, prefijos cortos y búsquedas con erratas.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.search import ProductoIndex
+
+TIPOS = ["Leche", "Yogur", "Café", "Té", "Arroz", "Pasta", "Aceite", "Galletas", "Zumo", "Queso",
+         "Jamón", "Pan", "Cerveza", "Agua", "Detergente", "Champú", "Chocolate", "Atún", "Tomate", "Harina"]
+VARIEDADES = ["entera", "desnatada", "ecológico", "integral", "de oliva", "natural", "sin azúcar",
+              "descafeinado", "curado", "tostado", "sin gluten", "con frutas", "familiar", "extra", "light"]
+MARCAS = ["Hacendado", "Carrefour", "Nestlé", "Danone", "Pascual", "Gallo", "Dia", "Eroski", "Auchan", "Bonpreu"]
+
+CONSULTAS = ["leche entera", "cafe", "pa", "sin gluten", "aceite de oliva hacendado", "choclate", "yogur natual", "xq"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--productos", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    nombres = [
+        (i, f"{rnd.choice(TIPOS)} {rnd.choice(VARIEDADES)} {rnd.choice(MARCAS)} {rnd.randint(1, 2000)}")
+        for i in range(1, args.productos + 1)
+    ]
+    indice = ProductoIndex()
+    inicio = time.perf_counter()
+    indice.construir(nombres, version=1)
+    print(f"{args.productos} productos, construcción del índice: {time.perf_counter() - inicio:.2f} s")
+    print(f"{'consulta':<28} {'mediana':>10} {'p95':>10} {'resultados':>10}")
+    for consulta in CONSULTAS:
+        tiempos = []
+        for _ in range(args.repeticiones):
+            t = time.perf_counter()
+            resultados = indice.buscar(consulta, k=10)
+            tiempos.append((time.perf_counter() - t) * 1000)
+        tiempos.sort()
+        p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+        print(f"{consulta:<28} {statistics.median(tiempos):>7.2f} ms {p95:>7.2f} ms {len(resultados):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Arranque en frío: tiempo de importación de backend.main y hasta la primera respuesta.
+
+Uso: python -m benchmarks.bench_startup [--repeticiones 5]
+
+Cada medición se hace en un intérprete nuevo (como un worker recién lanzado) y
+responde GET /health con TestClient. También informa de qué módulos pesados se
+han cargado sin necesitarlos; backend/tests/test_startup.py vigila ambas cosas.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Módulos que solo deben cargarse en su primer uso (login, exportación, Postgres, modo async)
+PEREZOSOS = ["authlib", "jwt", "pyarrow", "sqlalchemy.dialects.postgresql", "asyncpg", "aiosqlite"]
+
+SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import backend.main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(backend.main.app) as client:
+    client.get("/health").raise_for_status()
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "primera_respuesta_s": t2 - t0,
+    "cargados": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def medir(database_url: str = None) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "DATABASE_URL": database_url or f"sqlite:///{tmp}/arranque.db"}
+        env.pop("DB_ASYNC", None)
+        salida = subprocess.run(
+            [sys.executable, "-c", SCRIPT % PEREZOSOS],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    medidas = [medir(args.database_url) for _ in range(args.repeticiones)]
+    importacion = statistics.median(m["import_s"] for m in medidas) * 1000
+    primera = statistics.median(m["primera_respuesta_s"] for m in medidas) * 1000
+    print(f"import backend.main      {importacion:8.1f} ms (mediana de {args.repeticiones})")
+    print(f"primera respuesta        {primera:8.1f} ms")
+    print(f"módulos perezosos cargados: {medidas[-1]['cargados'] or 'ninguno'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Generador de datos sintéticos: catálogo y un histórico de precios realista.
+
+Uso: python -m benchmarks.datos --database-url sqlite:///bench.db [--productos 10000]
+         [--supermercados 50] [--marcas 300] [--precios 5000000] [--dias 365]
+
+Cada producto tiene un precio base según su tipo y se vende en un subconjunto de
+supermercados con varias marcas; los precios siguen un paseo aleatorio por día
+con ofertas ocasionales. Las filas se generan e insertan por lotes (executemany)
+para que 5M de precios no necesiten tenerlos todos en memoria. Al final se
+reconstruyen el agregado diario (precios_diarios) y el último precio por producto y
+supermercado (precios_ultimos).
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend import cesta, models, rollup
+from backend.database import Base
+
+LOTE = 50000
+
+# (tipo, precio base por unidad, unidad, cantidades habituales)
+TIPOS = [
+    ("Leche", 0.95, "L", (1, 1.5, 6)), ("Yogur", 2.4, "kg", (0.125, 0.5, 1)), ("Café", 11.0, "kg", (0.25, 0.5, 1)),
+    ("Arroz", 1.6, "kg", (0.5, 1, 5)), ("Pasta", 1.8, "kg", (0.5, 1)), ("Aceite", 8.5, "L", (0.75, 1, 5)),
+    ("Galletas", 4.2, "kg", (0.2, 0.5, 0.8)), ("Zumo", 1.5, "L", (1, 1.5)), ("Queso", 12.0, "kg", (0.15, 0.25, 1)),
+    ("Cerveza", 1.9, "L", (0.33, 1, 6)), ("Agua", 0.3, "L", (0.5, 1.5, 6)), ("Detergente", 0.18, "ud", (20, 40, 60)),
+    ("Champú", 9.0, "L", (0.4, 0.75)), ("Chocolate", 9.5, "kg", (0.1, 0.2)), ("Atún", 14.0, "kg", (0.08, 0.24)),
+    ("Huevos", 0.28, "ud", (6, 12, 24)), ("Pan de molde", 3.2, "kg", (0.45, 0.7)), ("Tomate", 2.2, "kg", (0.4, 1)),
+]
+VARIEDADES = ["", "entera", "desnatada", "ecológico", "integral", "natural", "sin azúcar", "sin gluten",
+              "familiar", "extra", "light", "clásico", "premium", "bio"]
+CATEGORIAS = ["Bebidas", "Lácteos", "Despensa", "Carnicería", "Frutería", "Limpieza", "Higiene", "Ofertas", "Bio"]
+UNIDADES = ["kg", "g", "L", "ml", "ud", "pack"]
+
+
+def _lotes(filas, tamano=LOTE):
+    filas = iter(filas)
+    while lote := list(itertools.islice(filas, tamano)):
+        yield lote
+
+
+def generar(engine: Engine, productos=10000, supermercados=50, marcas=300, precios=100000, dias=365,
+            semilla=42, verbose=False) -> list:
+    """Crea el esquema y carga datos sintéticos. Devuelve la ficha de cada producto."""
+    rnd = random.Random(semilla)
+    Base.metadata.create_all(bind=engine)
+    inicio = time.perf_counter()
+
+    fichas = []
+    for i in range(productos):
+        tipo, base, unidad, cantidades = TIPOS[i % len(TIPOS)]
+        variedad = VARIEDADES[(i // len(TIPOS)) % len(VARIEDADES)]
+        fichas.append({
+            "nombre": " ".join(p for p in (tipo, variedad, f"#{i}") if p),
+            "base": base * rnd.uniform(0.7, 1.6), "unidad": unidad, "cantidades": cantidades,
+            "marcas": rnd.sample(range(1, marcas + 1), k=min(marcas, rnd.randint(1, 4))),
+            "supermercados": rnd.sample(range(1, supermercados + 1), k=min(supermercados, rnd.randint(3, 15))),
+            "categoria": (i % len(TIPOS)) % len(CATEGORIAS) + 1,
+        })
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.Categoria), [{"nombre": c} for c in CATEGORIAS])
+        conn.execute(insert(models.Unidad), [{"nombre": u} for u in UNIDADES])
+        conn.execute(insert(models.Marca), [{"nombre": f"Marca {i}"} for i in range(marcas)])
+        conn.execute(insert(models.Supermercado), [{"nombre": f"Supermercado {i}"} for i in range(supermercados)])
+        for lote in _lotes({"nombre": f["nombre"]} for f in fichas):
+            conn.execute(insert(models.Producto), lote)
+        for lote in _lotes({"producto_id": i, "categoria_id": f["categoria"]} for i, f in enumerate(fichas, 1)):
+            conn.execute(insert(models.producto_categoria), lote)
+        for lote in _lotes({"producto_id": i, "unidad_id": UNIDADES.index(f["unidad"]) + 1} for i, f in enumerate(fichas, 1)):
+            conn.execute(insert(models.producto_unidad), lote)
+        for lote in _lotes({"producto_id": i, "marca_id": m} for i, f in enumerate(fichas, 1) for m in f["marcas"]):
+            conn.execute(insert(models.producto_marca), lote)
+
+    def filas_precios():
+        hoy = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        niveles = {}  # (producto, supermercado) -> factor actual del paseo aleatorio
+        for n in range(precios):
+            # Orden cronológico, como llegarían los registros reales
+            fecha = hoy - timedelta(days=dias) + timedelta(seconds=n * dias * 86400 // max(precios, 1))
+            producto_id = rnd.randint(1, productos)
+            ficha = fichas[producto_id - 1]
+            supermercado_id = rnd.choice(ficha["supermercados"])
+            clave = (producto_id, supermercado_id)
+            nivel = niveles.get(clave, 1.0) * rnd.uniform(0.98, 1.025)
+            niveles[clave] = nivel = min(max(nivel, 0.6), 1.8)
+            oferta = rnd.random() < 0.1
+            cantidad = rnd.choice(ficha["cantidades"])
+            precio_unidad = round(ficha["base"] * nivel * (0.75 if oferta else 1.0), 4)
+            yield {
+                "producto_id": producto_id, "marca_id": rnd.choice(ficha["marcas"]),
+                "supermercado_id": supermercado_id, "cantidad": cantidad, "unidad": ficha["unidad"],
+                "precio_total": round(precio_unidad * cantidad, 2), "precio_unidad": precio_unidad,
+                # Las unidades de TIPOS ya son base (kg, L, ud)
+                "unidad_base": ficha["unidad"], "precio_base": precio_unidad,
+                "es_oferta": oferta, "tipo_oferta": "2x1" if oferta and rnd.random() < 0.3 else None,
+                "fecha": fecha,
+            }
+
+    insertados = 0
+    for lote in _lotes(filas_precios()):
+        with engine.begin() as conn:
+            conn.execute(insert(models.Precio), lote)
+        insertados += len(lote)
+        if verbose:
+            print(f"  precios: {insertados}/{precios} ({time.perf_counter() - inicio:.0f} s)", flush=True)
+
+    with Session(engine) as db:
+        diarios = rollup.reconstruir(db)
+        cesta.reconstruir(db)
+    if verbose:
+        print(f"{productos} productos, {supermercados} supermercados, {insertados} precios, "
+              f"{diarios} filas diarias en {time.perf_counter() - inicio:.1f} s")
+    return fichas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--productos", type=int, default=10000)
+    parser.add_argument("--supermercados", type=int, default=50)
+    parser.add_argument("--marcas", type=int, default=300)
+    parser.add_argument("--precios", type=int, default=5000000)
+    parser.add_argument("--dias", type=int, default=365)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    generar(create_engine(args.database_url), args.productos, args.supermercados, args.marcas,
+            args.precios, args.dias, args.semilla, verbose=True)
+
+
+if __name__ == "__main__":
+    main()
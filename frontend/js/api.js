@@ -1,26 +1,69 @@
 // Prioridad: 1. Variable de entorno (via /config.js), 2. Desarrollo local, 3. Rutas relativas
 const API_URL = window.BACKEND_URL || ((window.location.port === "5500" || window.location.port === "5501") ? "http://127.0.0.1:8000" : "");
 
+// Construye la query string ignorando filtros vacíos
+function toQuery(params) {
+    const qs = new URLSearchParams();
+    Object.entries(params || {}).forEach(([k, v]) => {
+        if (v !== undefined && v !== null && v !== "") qs.append(k, v);
+    });
+    const str = qs.toString();
+    return str ? `?${str}` : "";
+}
+
+// Token de sesión para las escrituras (el invitado de la demo no tiene uno válido)
+function authHeaders(headers = {}) {
+    const token = localStorage.getItem("auth_token");
+    if (token && token !== "demo_guest_token") headers.Authorization = `Bearer ${token}`;
+    return headers;
+}
+
 const ApiService = {
-    async getPrecios() {
-        const res = await fetch(`${API_URL}/precios`);
+    // params: limit, cursor, supermercado_id, marca_id, categoria_id, es_oferta, desde, hasta
+    async getPrecios(params) {
+        const res = await fetch(`${API_URL}/precios${toQuery(params)}`);
         return await res.json();
     },
 
+    // Devuelve una página y el cursor para pedir la siguiente (null si no hay más)
+    async getPreciosPage(params) {
+        const res = await fetch(`${API_URL}/precios${toQuery(params)}`);
+        return { items: await res.json(), nextCursor: res.headers.get("X-Next-Cursor") };
+    },
+
     async getPrecio(id) {
         const res = await fetch(`${API_URL}/precios/${id}`);
         return await res.json();
     },
 
-    async getPrecioHistorial(prodId) {
-        const res = await fetch(`${API_URL}/precios/producto/${prodId}`);
+    async getPrecioHistorial(prodId, params) {
+        const res = await fetch(`${API_URL}/precios/producto/${prodId}${toQuery(params)}`);
+        return await res.json();
+    },
+
+    async getPrecioStats(prodId) {
+        const res = await fetch(`${API_URL}/precios/producto/${prodId}/stats`);
         return await res.json();
     },
 
+    // agrupacion: "dia" | "semana" | "mes"
+    async getPrecioSerie(prodId, params) {
+        const res = await fetch(`${API_URL}/precios/producto/${prodId}/serie${toQuery(params)}`);
+        return await res.json();
+    },
+
+    // Feed en vivo (SSE): onEvent recibe cada delta {op: "c"|"u"|"d"|"resync", ...}.
+    // params: producto_id, supermercado_id. Devuelve el EventSource (close() para cortar)
+    subscribePrecios(params, onEvent) {
+        const source = new EventSource(`${API_URL}/precios/stream${toQuery(params)}`);
+        source.onmessage = (e) => onEvent(JSON.parse(e.data));
+        return source;
+    },
+
     async createPrecio(datos) {
         const res = await fetch(`${API_URL}/precios`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify(datos)
         });
         return await res.json();
@@ -29,22 +72,45 @@ const ApiService = {
     async updatePrecio(id, datos) {
         const res = await fetch(`${API_URL}/precios/${id}`, {
             method: "PUT",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify(datos)
         });
         return await res.json();
     },
 
     async deletePrecio(id) {
-        return fetch(`${API_URL}/precios/${id}`, { method: "DELETE" });
+        return fetch(`${API_URL}/precios/${id}`, { method: "DELETE", headers: authHeaders() });
     },
 
     // Catálogo
+    // Todo el catálogo en una petición. Los productos llegan con listas de ids; se
+    // resuelven aquí a objetos para que las páginas sigan usando p.marcas, p.unidades...
+    async getCatalogBootstrap() {
+        const res = await fetch(`${API_URL}/catalog/bootstrap`);
+        const data = await res.json();
+        const byId = (list) => Object.fromEntries(list.map(x => [x.id, x]));
+        const cats = byId(data.categorias), marcas = byId(data.marcas), units = byId(data.unidades);
+        data.productos = data.productos.map(p => ({
+            id: p.id,
+            nombre: p.nombre,
+            categorias: p.categoria_ids.map(id => cats[id]).filter(Boolean),
+            unidades: p.unidad_ids.map(id => units[id]).filter(Boolean),
+            marcas: p.marca_ids.map(id => marcas[id]).filter(Boolean)
+        }));
+        return data;
+    },
+
     async getCatalogProductos() {
         const res = await fetch(`${API_URL}/catalog/productos`);
         return await res.json();
     },
 
+    // Búsqueda insensible a acentos, ordenada por relevancia
+    async searchProductos(q, k = 10) {
+        const res = await fetch(`${API_URL}/catalog/productos/search${toQuery({ q, k })}`);
+        return await res.json();
+    },
+
     async getCatalogSupermercados() {
         const res = await fetch(`${API_URL}/catalog/supermercados`);
         return await res.json();
@@ -69,7 +135,7 @@ const ApiService = {
     async createCategoria(nombre) {
         return fetch(`${API_URL}/catalog/categorias`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify({ nombre })
         }).then(res => res.json());
     },
@@ -77,7 +143,7 @@ const ApiService = {
     async createMarca(nombre) {
         return fetch(`${API_URL}/catalog/marcas`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify({ nombre })
         }).then(res => res.json());
     },
@@ -85,7 +151,7 @@ const ApiService = {
     async createSupermercado(nombre) {
         return fetch(`${API_URL}/catalog/supermercados`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify({ nombre })
         }).then(res => res.json());
     },
@@ -93,7 +159,7 @@ const ApiService = {
     async createUnidad(nombre) {
         return fetch(`${API_URL}/catalog/unidades`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify({ nombre })
         }).then(res => res.json());
     },
@@ -101,7 +167,7 @@ const ApiService = {
     async createProducto(nombre, categoria_ids, unidad_ids, marca_ids) {
         const response = await fetch(`${API_URL}/catalog/productos`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify({
                 nombre,
                 categoria_ids: (categoria_ids || []).map(id => parseInt(id)),
@@ -118,61 +184,68 @@ const ApiService = {
         return await response.json();
     },
 
-    async deleteCategoria(id) { return fetch(`${API_URL}/catalog/categorias/${id}`, { method: "DELETE" }); },
-    async deleteMarca(id) { return fetch(`${API_URL}/catalog/marcas/${id}`, { method: "DELETE" }); },
-    async deleteSupermercado(id) { return fetch(`${API_URL}/catalog/supermercados/${id}`, { method: "DELETE" }); },
-    async deleteUnidad(id) { return fetch(`${API_URL}/catalog/unidades/${id}`, { method: "DELETE" }); },
-    async deleteProducto(id) { return fetch(`${API_URL}/catalog/productos/${id}`, { method: "DELETE" }); },
+    async deleteCategoria(id) { return fetch(`${API_URL}/catalog/categorias/${id}`, { method: "DELETE", headers: authHeaders() }); },
+    async deleteMarca(id) { return fetch(`${API_URL}/catalog/marcas/${id}`, { method: "DELETE", headers: authHeaders() }); },
+    async deleteSupermercado(id) { return fetch(`${API_URL}/catalog/supermercados/${id}`, { method: "DELETE", headers: authHeaders() }); },
+    async deleteUnidad(id) { return fetch(`${API_URL}/catalog/unidades/${id}`, { method: "DELETE", headers: authHeaders() }); },
+    async deleteProducto(id) { return fetch(`${API_URL}/catalog/productos/${id}`, { method: "DELETE", headers: authHeaders() }); },
 
     // Relaciones (obsoletas para creación pero se mantienen por compatibilidad si fuese necesario)
     async linkProductoMarca(producto_id, marca_id) {
         return fetch(`${API_URL}/catalog/relacionar-producto-marca`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: authHeaders({ "Content-Type": "application/json" }),
             body: JSON.stringify({ producto_id: parseInt(producto_id), marca_id: parseInt(marca_id) })
         }).then(res => res.json());
     },
 
     async unlinkProductoMarca(producto_id, marca_id) {
         return fetch(`${API_URL}/catalog/desvincular-producto-marca?producto_id=${producto_id}&marca_id=${marca_id}`, {
-            method: "DELETE"
+            method: "DELETE",
+            headers: authHeaders()
         }).then(res => res.json());
     },
 
     // Relaciones específicas (nuevas)
     async linkCategoria(producto_id, categoria_id) {
         return fetch(`${API_URL}/catalog/productos/${producto_id}/categorias/${categoria_id}`, {
-            method: "POST"
+            method: "POST",
+            headers: authHeaders()
         }).then(res => res.json());
     },
 
     async unlinkCategoria(producto_id, categoria_id) {
         return fetch(`${API_URL}/catalog/productos/${producto_id}/categorias/${categoria_id}`, {
-            method: "DELETE"
+            method: "DELETE",
+            headers: authHeaders()
         }).then(res => res.json());
     },
 
     async linkUnidad(producto_id, unidad_id) {
         return fetch(`${API_URL}/catalog/productos/${producto_id}/unidades/${unidad_id}`, {
-            method: "POST"
+            method: "POST",
+            headers: authHeaders()
         }).then(res => res.json());
     },
 
     async unlinkUnidad(producto_id, unidad_id) {
         return fetch(`${API_URL}/catalog/productos/${producto_id}/unidades/${unidad_id}`, {
-            method: "DELETE"
+            method: "DELETE",
+            headers: authHeaders()
         }).then(res => res.json());
     },
 
     async linkMarca(producto_id, marca_id) {
         return fetch(`${API_URL}/catalog/productos/${producto_id}/marcas/${marca_id}`, {
-            method: "POST"
+            method: "POST",
+            headers: authHeaders()
         }).then(res => res.json());
     },
 
     async unlinkMarca(producto_id, marca_id) {
         return fetch(`${API_URL}/catalog/productos/${producto_id}/marcas/${marca_id}`, {
-            method: "DELETE"
+            method: "DELETE",
+            headers: authHeaders()
         }).then(res => res.json());
     }
 };
@@ -0,0 +1,39 @@
+# Configuración de gunicorn con workers de uvicorn (start.sh, APP_SERVER=gunicorn)
+import os
+
+from backend import database
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+
+
+def _cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def calcular_workers() -> int:
+    # WEB_CONCURRENCY manda; si no, 2 x núcleos + 1 limitado por las conexiones que
+    # admite Postgres (DB_MAX_CONNECTIONS) y las que puede abrir cada worker
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    workers = 2 * _cores() + 1
+    max_conexiones = os.getenv("DB_MAX_CONNECTIONS")
+    if max_conexiones:
+        por_worker = database.DB_POOL_SIZE + database.DB_MAX_OVERFLOW
+        workers = min(workers, max(1, int(max_conexiones) // por_worker))
+    return workers
+
+
+workers = calcular_workers()
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+# Con preload la app (y sus engines) se importa una vez en el master antes del fork
+preload_app = os.getenv("GUNICORN_PRELOAD", "0").lower() in ("1", "true", "yes")
+
+
+def post_fork(server, worker):
+    database.reiniciar_pools()
@@ -1,3 +1,13 @@
 #!/usr/bin/env bash
-# Aseguramos que las tablas existan y lanzamos la app
-uvicorn backend.main:app --host 0.0.0.0 --port 10000
+set -e
+# Aseguramos que las tablas existan (una sola vez, antes de arrancar los workers).
+# Con DB_MIGRATE_ON_START=0 se delega en un paso de release: python -m backend.migrate
+if [ "${DB_MIGRATE_ON_START:-1}" = "1" ]; then
+    python -m backend.migrate
+fi
+# APP_SERVER=gunicorn arranca varios workers de uvicorn (ver gunicorn.conf.py)
+if [ "${APP_SERVER:-uvicorn}" = "gunicorn" ]; then
+    exec gunicorn backend.main:app -c gunicorn.conf.py
+else
+    exec uvicorn backend.main:app --host 0.0.0.0 --port "${PORT:-10000}"
+fi